@@ -0,0 +1,98 @@
+"""
+Logging do Placebo.
+
+- Um logger por subsistema ('placebo.backend', 'placebo.inbox', 'placebo.db', ...),
+  obtido com get_logger().
+- Formatação preguiçosa: use logger.debug("Mensagem %s", valor); o texto só é
+  montado se o registro passar pelo nível e pelos filtros.
+- Mensagens DEBUG repetidas são limitadas por DebugRateLimiter (no máximo
+  'burst' por mensagem a cada 'interval' segundos; as descartadas são contadas
+  e informadas na próxima que passar).
+- A escrita no terminal é feita por uma QueueListener em outra thread: quem loga
+  (a thread principal do Kivy, que também roda o backend) só coloca o registro numa fila.
+
+Sem configure_logging() (ex: replay_engine, load_generator), os loggers não têm
+handler e só avisos e erros aparecem, pelo handler padrão do Python.
+O nível pode ser definido pela variável de ambiente PLACEBO_LOG_LEVEL (ex: DEBUG).
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+
+ROOT_LOGGER = 'placebo'
+LOG_FORMAT = '%(asctime)s %(levelname)-7s %(name)s: %(message)s'
+
+_listener = None
+
+
+def get_logger(subsystem: str) -> logging.Logger:
+    """Retorna o logger de um subsistema (ex: 'backend', 'inbox', 'db')."""
+    return logging.getLogger(f"{ROOT_LOGGER}.{subsystem}")
+
+
+class DebugRateLimiter(logging.Filter):
+    """Deixa passar no máximo 'burst' registros DEBUG por (logger, mensagem) a cada 'interval' segundos."""
+
+    def __init__(self, burst: int = 5, interval: float = 10.0):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows = {} # (logger, mensagem sem formatar) -> [início da janela, aceitos, descartados]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        key = (record.name, record.msg) # O texto ainda não formatado: a chave não depende dos valores
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                dropped = window[2] if window else 0
+                self._windows[key] = [now, 1, 0]
+                if dropped:
+                    record.msg = f"{record.msg} (+{dropped} mensagens iguais suprimidas)"
+                return True
+            if window[1] < self.burst:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+
+def configure_logging(level: int | str | None = None, stream=None) -> logging.handlers.QueueListener:
+    """
+    Liga os loggers do Placebo a uma fila escrita por uma thread separada.
+    Chamado uma vez na inicialização do app; chamadas seguintes só ajustam o nível.
+    """
+    global _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    level = level or os.environ.get('PLACEBO_LOG_LEVEL', 'INFO')
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    if _listener is not None:
+        return _listener
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(DebugRateLimiter())
+    root.addHandler(queue_handler)
+    # O Kivy pode registrar handlers no logger raiz do Python; os registros do Placebo não passam por eles.
+    root.propagate = False
+
+    stream_handler = logging.StreamHandler(stream or sys.stdout)
+    stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    _listener.start()
+    atexit.register(_stop_listener)
+    return _listener
+
+
+def _stop_listener():
+    """Escreve os registros ainda na fila e encerra a thread de escrita."""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
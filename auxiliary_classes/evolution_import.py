@@ -0,0 +1,214 @@
+import csv
+import json
+import os
+import re
+from datetime import date
+from itertools import islice
+from typing import Dict, Any, Iterator, List, Tuple
+
+from auxiliary_classes.id_generator import new_id
+
+# Limites aceitos para cada métrica numérica (inclusive).
+METRIC_RANGES = {
+    'weight': (1.0, 400.0),            # kg
+    'blood_glucose': (10.0, 1000.0),   # mg/dL
+    'heart_rate': (20.0, 300.0),       # bpm
+    'temperature': (30.0, 45.0),       # °C
+    'oxygen_saturation': (50.0, 100.0) # %
+}
+SYSTOLIC_RANGE = (50, 300)
+DIASTOLIC_RANGE = (30, 200)
+KNOWN_METRICS = set(METRIC_RANGES) | {'blood_pressure'}
+
+_ISO_DATE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')
+_BR_DATE = re.compile(r'^(\d{2})/(\d{2})/(\d{4})$')
+_BLOOD_PRESSURE = re.compile(r'^\s*(\d{2,3})\s*/\s*(\d{2,3})\s*$')
+
+DEFAULT_BATCH_SIZE = 500
+MAX_REPORTED_REJECTIONS = 20
+
+
+def _parse_date(value: str) -> str | None:
+    """Normaliza 'AAAA-MM-DD' ou 'DD/MM/AAAA' para 'AAAA-MM-DD'. Retorna None se inválida."""
+    value = (value or '').strip()
+    match = _ISO_DATE.match(value)
+    if match:
+        year, month, day = match.groups()
+    else:
+        match = _BR_DATE.match(value)
+        if not match:
+            return None
+        day, month, year = match.groups()
+    try:
+        return date(int(year), int(month), int(day)).isoformat()
+    except ValueError:
+        return None
+
+
+def _numeric_column(values: List[Any], low: float, high: float) -> List[Tuple[str | None, str | None]]:
+    """Valida uma coluna numérica inteira de uma vez. Retorna (valor normalizado, erro) por linha."""
+    results = []
+    for raw in values:
+        if raw is None or raw == '':
+            results.append((None, None)) # Célula vazia: a métrica simplesmente não foi medida
+            continue
+        try:
+            number = float(str(raw).replace(',', '.'))
+        except ValueError:
+            results.append((None, f"valor não numérico '{raw}'"))
+            continue
+        if not low <= number <= high:
+            results.append((None, f"valor {raw} fora do intervalo [{low:g}, {high:g}]"))
+        else:
+            results.append((f"{number:g}", None))
+    return results
+
+
+def _blood_pressure_column(values: List[Any]) -> List[Tuple[str | None, str | None]]:
+    """Valida uma coluna de pressão arterial no formato 'sistólica/diastólica'."""
+    results = []
+    for raw in values:
+        if raw is None or raw == '':
+            results.append((None, None))
+            continue
+        match = _BLOOD_PRESSURE.match(str(raw))
+        if not match:
+            results.append((None, f"pressão arterial '{raw}' fora do formato 'sist/diast'"))
+            continue
+        systolic, diastolic = int(match.group(1)), int(match.group(2))
+        if not (SYSTOLIC_RANGE[0] <= systolic <= SYSTOLIC_RANGE[1] and DIASTOLIC_RANGE[0] <= diastolic <= DIASTOLIC_RANGE[1]):
+            results.append((None, f"pressão arterial '{raw}' fora dos limites"))
+        elif systolic <= diastolic:
+            results.append((None, f"pressão arterial '{raw}' com sistólica menor ou igual à diastólica"))
+        else:
+            results.append((f"{systolic}/{diastolic}", None))
+    return results
+
+
+def validate_readings(rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Valida um lote de leituras coluna a coluna.
+
+    Cada linha é um dicionário {'row': n, 'date': ..., <métrica>: valor, ...}; colunas
+    desconhecidas são ignoradas. Uma linha é rejeitada se a data for inválida, se algum
+    valor for inválido ou se não tiver nenhuma métrica.
+
+    Returns:
+        (aceitas, rejeitadas): aceitas no formato {'row', 'date', 'metrics'} e
+        rejeitadas no formato {'row', 'reason'}.
+    """
+    if not rows:
+        return [], []
+
+    dates = [_parse_date(str(row.get('date', ''))) for row in rows]
+    errors: List[List[str]] = [[] if parsed else [f"data inválida '{row.get('date', '')}'"]
+                               for row, parsed in zip(rows, dates)]
+    metrics: List[Dict[str, str]] = [{} for _ in rows]
+
+    columns = {key for row in rows for key in row if key in KNOWN_METRICS}
+    for column in columns:
+        values = [row.get(column) for row in rows]
+        if column == 'blood_pressure':
+            results = _blood_pressure_column(values)
+        else:
+            results = _numeric_column(values, *METRIC_RANGES[column])
+        for i, (value, error) in enumerate(results):
+            if error:
+                errors[i].append(error)
+            elif value is not None:
+                metrics[i][column] = value
+
+    accepted, rejected = [], []
+    for row, parsed_date, row_errors, row_metrics in zip(rows, dates, errors, metrics):
+        if not row_errors and not row_metrics:
+            row_errors.append("nenhuma métrica informada")
+        if row_errors:
+            rejected.append({"row": row.get('row'), "reason": "; ".join(row_errors)})
+        else:
+            accepted.append({"row": row.get('row'), "date": parsed_date, "metrics": row_metrics})
+    return accepted, rejected
+
+
+def _normalize_row(row: Dict[str, Any], row_number: int) -> Dict[str, Any]:
+    """Converte as colunas de pressão separadas (como na tela de evolução) em 'sist/diast'."""
+    row = {str(k).strip(): (v.strip() if isinstance(v, str) else v) for k, v in row.items() if k is not None}
+    systolic = row.pop('blood_pressure_systolic', None)
+    diastolic = row.pop('blood_pressure_diastolic', None)
+    if systolic not in (None, '') or diastolic not in (None, ''):
+        row.setdefault('blood_pressure', f"{systolic or ''}/{diastolic or ''}")
+    row['row'] = row_number
+    return row
+
+
+def iter_rows(file_path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Lê um arquivo CSV (com cabeçalho) ou NDJSON linha a linha, sem carregá-lo inteiro.
+    Linhas NDJSON malformadas geram uma linha com a chave '_error'.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+        if extension == '.csv':
+            sample = f.read(2048)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+            for row_number, row in enumerate(csv.DictReader(f, dialect=dialect), start=2): # Linha 1 é o cabeçalho
+                yield _normalize_row(row, row_number)
+        else:
+            for row_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    if not isinstance(record, dict):
+                        raise ValueError
+                except ValueError:
+                    yield {"row": row_number, "_error": "linha JSON inválida"}
+                    continue
+                yield _normalize_row(record, row_number)
+
+
+def iter_validated_batches(file_path: str, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Gera tuplas (aceitas, rejeitadas) para cada lote de 'batch_size' linhas do arquivo."""
+    rows = iter_rows(file_path)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        malformed = [{"row": row['row'], "reason": row['_error']} for row in batch if '_error' in row]
+        accepted, rejected = validate_readings([row for row in batch if '_error' not in row])
+        yield accepted, sorted(malformed + rejected, key=lambda r: r['row'])
+
+
+def build_bulk_fill_payloads(patient_id: str, file_path: str, batch_size: int = DEFAULT_BATCH_SIZE) -> List[Dict[str, Any]]:
+    """
+    Lê e valida o arquivo e monta um payload de 'evolution/bulk_fill' por lote validado,
+    todos com o mesmo 'import_id', para que nenhuma mensagem passe de 'batch_size' leituras.
+    Cada payload leva 'batch' (1, 2, ...) e o total de lotes ('batches'); o backend acumula
+    o resumo da importação e responde uma única vez, no último lote. As linhas rejeitadas
+    no cliente seguem no payload do seu lote para entrarem no resumo.
+    """
+    import_id = new_id("imp_")
+    payloads = []
+    for accepted_batch, rejected_batch in iter_validated_batches(file_path, batch_size):
+        payloads.append({
+            "patient_id": patient_id,
+            "import_id": import_id,
+            "batch": len(payloads) + 1,
+            "readings": accepted_batch,
+            "rejected_count": len(rejected_batch),
+            "rejected_rows": rejected_batch[:MAX_REPORTED_REJECTIONS] # Apenas as primeiras, para o resumo
+        })
+    for payload in payloads:
+        payload["batches"] = len(payloads)
+    return payloads
+
+
+def revalidate_readings(readings: List[Dict[str, Any]], batch_size: int = DEFAULT_BATCH_SIZE):
+    """Revalida, em lotes, leituras já no formato {'row', 'date', 'metrics'} (usado pelo backend)."""
+    for start in range(0, len(readings), batch_size):
+        rows = [{**(reading.get('metrics') or {}), "row": reading.get('row'), "date": reading.get('date')}
+                for reading in readings[start:start + batch_size]]
+        yield validate_readings(rows)
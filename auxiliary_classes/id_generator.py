@@ -0,0 +1,58 @@
+import os
+import threading
+import time
+
+# Alfabeto Base32 de Crockford (sem I, L, O, U), preserva a ordem lexicográfica.
+_ENCODING = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_TIME_LENGTH = 10    # 48 bits de milissegundos
+_RANDOM_LENGTH = 16  # 80 bits aleatórios
+_RANDOM_MAX = (1 << 80) - 1
+
+_lock = threading.Lock()
+_last_ms = -1
+_last_random = 0
+
+
+def _encode(value, length):
+    """Codifica um inteiro em Base32 de Crockford com tamanho fixo."""
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 32)
+        chars.append(_ENCODING[index])
+    return ''.join(reversed(chars))
+
+
+def new_id(prefix=""):
+    """
+    Gera um identificador no estilo ULID, ordenável lexicograficamente pelo tempo.
+
+    IDs gerados no mesmo processo são estritamente crescentes, mesmo quando
+    criados no mesmo milissegundo (a parte aleatória é incrementada) ou quando
+    o relógio do sistema volta no tempo.
+
+    Args:
+        prefix: Prefixo legível opcional (ex: 'msg_', 'med'). IDs com o mesmo
+            prefixo continuam comparáveis entre si.
+    """
+    global _last_ms, _last_random
+
+    with _lock:
+        now_ms = int(time.time() * 1000)
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            _last_random = int.from_bytes(os.urandom(10), 'big') >> 1 # Deixa folga para incrementos
+        elif _last_random < _RANDOM_MAX:
+            _last_random += 1
+        else:
+            _last_ms += 1
+            _last_random = 0
+        return f"{prefix}{_encode(_last_ms, _TIME_LENGTH)}{_encode(_last_random, _RANDOM_LENGTH)}"
+
+
+def id_timestamp_ms(value, prefix=""):
+    """Retorna o instante (em milissegundos desde a época) embutido em um ID gerado por new_id."""
+    time_part = value[len(prefix):len(prefix) + _TIME_LENGTH].upper()
+    timestamp = 0
+    for char in time_part:
+        timestamp = timestamp * 32 + _ENCODING.index(char)
+    return timestamp
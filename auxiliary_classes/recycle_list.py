@@ -0,0 +1,37 @@
+"""
+Lista virtualizada para as telas com listas longas (medicações, eventos, diagnósticos, vínculos).
+
+A RecycleList é uma RecycleView vertical: só as linhas visíveis na tela são
+instanciadas, e elas são reaproveitadas ao rolar. Cada linha é um dicionário em
+'data' com as propriedades do template (definido no .kv da tela) e a sua altura
+('height'); a chave 'viewclass' escolhe o template da linha, o que permite misturar
+cabeçalhos, mensagens e itens numa mesma lista.
+"""
+from kivy.lang import Builder
+from kivy.metrics import dp
+from kivy.properties import NumericProperty, ListProperty
+from kivy.uix.recycleview import RecycleView
+
+Builder.load_file('auxiliary_classes/recycle_list.kv', encoding='utf-8')
+
+MESSAGE_ROW_HEIGHT = dp(48)
+HEADER_ROW_HEIGHT = dp(40)
+DETAIL_LINE_HEIGHT = dp(22) # Uma linha de detalhe (ListRowLabel)
+DETAIL_BLOCK_HEIGHT = dp(36) # Um bloco de detalhe com até duas linhas
+
+
+class RecycleList(RecycleView):
+    """RecycleView vertical com linhas de alturas dadas em 'data'."""
+    row_spacing = NumericProperty(dp(5))
+    row_padding = ListProperty([dp(10), dp(5)])
+    content_height = NumericProperty(0) # Altura de todas as linhas (para listas dentro de um ScrollView)
+
+
+def message_row(text: str) -> dict:
+    """Linha com uma mensagem centralizada (ex: 'Nenhuma medicação cadastrada.')."""
+    return {'viewclass': 'ListMessage', 'text': text, 'height': MESSAGE_ROW_HEIGHT}
+
+
+def header_row(text: str) -> dict:
+    """Linha de título de uma seção da lista."""
+    return {'viewclass': 'ListHeader', 'text': text, 'height': HEADER_ROW_HEIGHT}
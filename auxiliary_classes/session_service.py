@@ -0,0 +1,88 @@
+import json
+import os
+from typing import Callable, Dict, Any, List
+from auxiliary_classes.app_logging import get_logger
+
+logger = get_logger('session')
+
+
+class SessionService:
+    """
+    Sessão do usuário logado, mantida em memória.
+
+    O 'session.json' é lido uma única vez, na criação do serviço (para restaurar a
+    sessão ao reabrir o app), e só é escrito no login e removido no logout. Todos os
+    módulos consultam a sessão por aqui, sem abrir o arquivo. Quem precisa reagir a
+    uma troca de sessão se inscreve com subscribe().
+    """
+
+    def __init__(self, base_path: str):
+        """
+        Args:
+            base_path: O caminho raiz do projeto (onde 'session.json' fica).
+        """
+        self.session_path = os.path.join(base_path, 'session.json')
+        self._session: Dict[str, Any] = self._load()
+        self._subscribers: List[Callable[[Dict[str, Any]], None]] = []
+
+    def _load(self) -> Dict[str, Any]:
+        if not os.path.exists(self.session_path):
+            return {}
+        try:
+            with open(self.session_path, 'r', encoding='utf-8') as f:
+                session = json.load(f)
+            return session if isinstance(session, dict) and session.get('logged_in') else {}
+        except json.JSONDecodeError:
+            return {}
+
+    # --- Consulta ---
+
+    @property
+    def logged_in(self) -> bool:
+        return bool(self._session.get('logged_in'))
+
+    @property
+    def user(self) -> str | None:
+        return self._session.get('user')
+
+    @property
+    def profile_type(self) -> str | None:
+        return self._session.get('profile_type')
+
+    def get(self) -> Dict[str, Any]:
+        """Retorna uma cópia dos dados da sessão ({} se ninguém estiver logado)."""
+        return dict(self._session)
+
+    # --- Alteração ---
+
+    def login(self, user: str, profile_type: str):
+        """Cria a sessão, grava 'session.json' e notifica os inscritos."""
+        self._session = {'logged_in': True, 'user': user, 'profile_type': profile_type}
+        with open(self.session_path, 'w', encoding='utf-8') as f:
+            json.dump(self._session, f, indent=4)
+        logger.info("Sessão criada para o usuário %s.", user)
+        self._notify()
+
+    def logout(self):
+        """Encerra a sessão, remove 'session.json' e notifica os inscritos."""
+        self._session = {}
+        if os.path.exists(self.session_path):
+            os.remove(self.session_path)
+        logger.info("Sessão encerrada.")
+        self._notify()
+
+    # --- Inscrições ---
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]):
+        """Registra uma função chamada com os novos dados da sessão a cada login ou logout."""
+        if callback not in self._subscribers:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Dict[str, Any]], None]):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def _notify(self):
+        session = self.get()
+        for callback in list(self._subscribers):
+            callback(session)
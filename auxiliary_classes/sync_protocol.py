@@ -0,0 +1,37 @@
+"""
+Formato dos dados sincronizados por patches ('sync/patch') e snapshots ('sync/snapshot').
+
+Compartilhado pelo backend, que emite os patches, e pelo cliente, que os aplica
+no seu cache: nenhum dos dois precisa importar o outro para saber como uma
+coleção é identificada ou como um registro é representado.
+"""
+from typing import Dict, Any
+
+# coleção -> (arquivo de origem, campo da conta usado como chave: 'user' ou 'id')
+SYNC_COLLECTIONS = {
+    "medication": ('patient_medications.json', 'user'),
+    "event": ('patient_events.json', 'user'),
+    "diagnostic": ('patient_diagnostics.json', 'user'),
+    "evolution": ('patient_evolution.json', 'id'),
+    "tracked_metrics": ('account.json', 'id'),
+}
+
+
+def collection_key(collection: str, patient_id: str, patient_user: str) -> str:
+    """Retorna a chave do paciente usada pela coleção (usuário ou ID, como no arquivo de origem)."""
+    return patient_user if SYNC_COLLECTIONS[collection][1] == 'user' else patient_id
+
+
+def to_records(entries: Any) -> Dict[str, Any]:
+    """Converte as entradas de um paciente no arquivo de origem em {id do registro: registro}."""
+    if isinstance(entries, dict): # Evolução: {data: métricas}
+        return dict(entries)
+    return {item.get('id'): item for item in entries or []}
+
+
+def upsert_change(record_id: str, record: Any) -> Dict[str, Any]:
+    return {"op": "upsert", "id": record_id, "record": record}
+
+
+def delete_change(record_id: str) -> Dict[str, Any]:
+    return {"op": "delete", "id": record_id}
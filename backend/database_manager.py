@@ -1,6 +1,12 @@
+import copy
 import json
 import os
-from typing import Dict, List, Any
+import threading
+from typing import Dict, List, Any, Iterator
+
+from auxiliary_classes.app_logging import get_logger
+
+logger = get_logger('db')
 
 class PersistenceService:
     """
@@ -17,13 +23,83 @@ class PersistenceService:
         """
         self.db_path = base_path
 
+        # Modo em lote: arquivos lidos ficam em memória e os alterados são
+        # gravados uma única vez em end_batch(), em vez de a cada operação.
+        self._batch_cache = None
+        self._batch_dirty = None
+        self._batch_lock = threading.RLock()
+        # Ponto de salvamento dentro do lote: caminho -> (cópia do conteúdo, estava alterado)
+        # ou None se o arquivo ainda não estava no cache. A cópia é feita no primeiro acesso.
+        self._savepoint = None
+
+    def begin_batch(self):
+        """Inicia o modo em lote (usado pelo backend durante um ciclo de processamento)."""
+        with self._batch_lock:
+            self._batch_cache = {}
+            self._batch_dirty = {} # dict para manter a ordem em que os arquivos foram alterados
+
+    def end_batch(self):
+        """Grava os arquivos alterados durante o lote e volta ao modo de escrita direta."""
+        with self._batch_lock:
+            cache, dirty = self._batch_cache, self._batch_dirty
+            self._batch_cache = None
+            self._batch_dirty = None
+            self._savepoint = None
+            if cache is None:
+                return
+            for filepath in dirty:
+                self._dump(filepath, cache[filepath])
+
+    def begin_savepoint(self):
+        """
+        Marca um ponto de salvamento no lote atual. Só os arquivos acessados depois
+        dele são copiados, e rollback_savepoint() os devolve ao estado marcado.
+        Arquivos removidos do disco com delete_file() não são restaurados.
+        """
+        with self._batch_lock:
+            if self._batch_cache is None:
+                raise RuntimeError("Pontos de salvamento só existem no modo em lote.")
+            self._savepoint = {}
+
+    def release_savepoint(self):
+        """Mantém as alterações feitas desde o ponto de salvamento."""
+        with self._batch_lock:
+            self._savepoint = None
+
+    def rollback_savepoint(self):
+        """Desfaz, no cache do lote, as alterações feitas desde o ponto de salvamento."""
+        with self._batch_lock:
+            savepoint, self._savepoint = self._savepoint, None
+            for filepath, saved in (savepoint or {}).items():
+                if saved is None:
+                    self._batch_cache.pop(filepath, None)
+                    self._batch_dirty.pop(filepath, None)
+                    continue
+                content, was_dirty = saved
+                self._batch_cache[filepath] = content
+                if was_dirty:
+                    self._batch_dirty[filepath] = True
+                else:
+                    self._batch_dirty.pop(filepath, None)
+
+    def _remember(self, filepath: str):
+        """Guarda o estado do arquivo no ponto de salvamento antes do primeiro acesso a ele."""
+        if self._savepoint is not None and filepath not in self._savepoint:
+            if filepath in self._batch_cache:
+                self._savepoint[filepath] = (copy.deepcopy(self._batch_cache[filepath]), filepath in self._batch_dirty)
+            else:
+                self._savepoint[filepath] = None
+
     def _get_filepath(self, filename: str) -> str:
         """Constrói o caminho do arquivo, tratando os arquivos do backend como um caso especial."""
         backend_files = [
             'doctor_ids.json',
             'patient_ids.json',
+            'id_allocator_state.json',
             'placebo_transactions.json',
-            'processed_transaction_ids.json'
+            'processed_transaction_ids.json',
+            'sequence_state.json',
+            'sync_versions.json'
         ]
         
         base_name = os.path.basename(filename)
@@ -46,29 +122,104 @@ class PersistenceService:
             'patient_events.json'
         ]
 
+        default_value = {} if os.path.basename(filename) in dict_files else []
+
+        if self._batch_cache is not None:
+            # No lote, todos os leitores compartilham o mesmo objeto em memória.
+            with self._batch_lock:
+                if self._batch_cache is not None:
+                    self._remember(filepath)
+                    if filepath not in self._batch_cache:
+                        self._batch_cache[filepath] = self._load(filepath, default_value)
+                    return self._batch_cache[filepath]
+
+        return self._load(filepath, default_value)
+
+    def _load(self, filepath: str, default_value: List | Dict) -> List | Dict:
         if not os.path.exists(filepath):
-            return {} if os.path.basename(filename) in dict_files else []
+            return default_value
         try:
             with open(filepath, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except (json.JSONDecodeError, FileNotFoundError):
-            return {} if os.path.basename(filename) in dict_files else []
+            return default_value
+
+    def iter_list(self, filename: str, chunk_size: int = 64 * 1024) -> Iterator[Any]:
+        """
+        Gera os elementos de um arquivo JSON com uma lista, lendo-o em blocos de 'chunk_size'
+        caracteres, sem carregá-lo inteiro (ex: o log de transações). Um arquivo ausente,
+        vazio ou que não seja uma lista não gera nada; um final truncado é ignorado.
+        """
+        filepath = self._get_filepath(filename)
+        with self._batch_lock:
+            cached = self._batch_cache.get(filepath) if self._batch_cache is not None else None
+        if cached is not None:
+            yield from list(cached) # No lote, o conteúdo atual está em memória
+            return
+        if not os.path.exists(filepath):
+            return
+
+        decoder = json.JSONDecoder()
+        with open(filepath, 'r', encoding='utf-8') as f:
+            buffer, eof, opened = '', False, False
+            while True:
+                buffer = buffer.lstrip()
+                if opened and buffer.startswith(','):
+                    buffer = buffer[1:]
+                    continue
+                if buffer and not opened:
+                    if not buffer.startswith('['):
+                        return
+                    buffer, opened = buffer[1:], True
+                    continue
+                if opened and buffer.startswith(']'):
+                    return
+                if buffer:
+                    try:
+                        item, end = decoder.raw_decode(buffer)
+                    except json.JSONDecodeError:
+                        end = None
+                    # Um elemento que termina no fim do bloco pode continuar no próximo (ex: um número).
+                    if end is not None and (end < len(buffer) or eof):
+                        yield item
+                        buffer = buffer[end:]
+                        continue
+                if eof:
+                    return
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
 
     def _write_db(self, filename: str, data: List | Dict):
-        """Escreve dados em um arquivo JSON."""
+        """Escreve dados em um arquivo JSON (ou, no modo em lote, apenas em memória)."""
         filepath = self._get_filepath(filename)
+        if self._batch_cache is not None:
+            with self._batch_lock:
+                if self._batch_cache is not None:
+                    self._remember(filepath)
+                    self._batch_cache[filepath] = data
+                    self._batch_dirty[filepath] = True
+                    return
+        self._dump(filepath, data)
+
+    def _dump(self, filepath: str, data: List | Dict):
         with open(filepath, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=4)
 
     def delete_file(self, filename: str):
         """Deleta um arquivo JSON de forma segura."""
         filepath = self._get_filepath(filename)
+        with self._batch_lock:
+            if self._batch_cache is not None:
+                self._remember(filepath)
+                self._batch_cache.pop(filepath, None)
+                self._batch_dirty.pop(filepath, None)
         if os.path.exists(filepath):
             try:
                 os.remove(filepath)
-                print(f"[DB] Arquivo {filename} deletado com sucesso.")
+                logger.debug("Arquivo %s deletado com sucesso.", filename)
             except OSError as e:
-                print(f"[DB] Erro ao deletar o arquivo {filename}: {e}")
+                logger.error("Erro ao deletar o arquivo %s: %s", filename, e)
 
     def get_accounts(self) -> List[Dict[str, Any]]:
         """Retorna todas as contas de usuário."""
@@ -78,11 +229,6 @@ class PersistenceService:
         """Salva a lista de contas de usuário."""
         self._write_db('account.json', accounts)
 
-    def save_session(self, session_data: Dict[str, Any]):
-        """Salva os dados da sessão do usuário."""
-        self._write_db('session.json', session_data)
-        print(f"[DB] Arquivo session.json salvo para o usuário {session_data.get('user')}.")
-
     def get_patient_data(self, filename: str) -> Dict[str, Any]:
         """Retorna dados específicos de pacientes (diagnósticos, eventos, etc.)."""
         return self._read_db(filename)
@@ -100,7 +246,7 @@ class PersistenceService:
         patient_list.append(item_data)
         all_data[patient_user] = patient_list
         self.save_patient_data(filename, all_data)
-        print(f"[DB] Item adicionado para {patient_user} em {filename}.")
+        logger.debug("Item adicionado para %s em %s.", patient_user, filename)
 
     def edit_item_in_patient_list(self, filename: str, patient_user: str, item_id: str, updated_data: Dict):
         """Edita um item na lista de um paciente."""
@@ -120,9 +266,9 @@ class PersistenceService:
         if item_found:
             all_data[patient_user] = patient_list
             self.save_patient_data(filename, all_data)
-            print(f"[DB] Item {item_id} editado para {patient_user} em {filename}.")
+            logger.debug("Item %s editado para %s em %s.", item_id, patient_user, filename)
         else:
-            print(f"[DB] Aviso: Item {item_id} não encontrado para edição em {filename}.")
+            logger.warning("Item %s não encontrado para edição em %s.", item_id, filename)
 
     def delete_item_from_patient_list(self, filename: str, patient_user: str, item_id: str):
         """Deleta um item da lista de um paciente."""
@@ -135,9 +281,9 @@ class PersistenceService:
         if len(patient_list) < original_len:
             all_data[patient_user] = patient_list
             self.save_patient_data(filename, all_data)
-            print(f"[DB] Item {item_id} deletado para {patient_user} em {filename}.")
+            logger.debug("Item %s deletado para %s em %s.", item_id, patient_user, filename)
         else:
-            print(f"[DB] Aviso: Item {item_id} não encontrado para deleção em {filename}.")
+            logger.warning("Item %s não encontrado para deleção em %s.", item_id, filename)
 
     def fill_evolution_metric(self, patient_id: str, date: str, metrics: Dict):
         """Salva ou atualiza as métricas de evolução para um paciente em uma data."""
@@ -150,7 +296,25 @@ class PersistenceService:
         patient_evolution[date].update(metrics)
         all_evolutions[patient_id] = patient_evolution
         self.save_patient_data('patient_evolution.json', all_evolutions)
-        print(f"[DB] Métricas de evolução salvas para {patient_id} em {date}.")
+        logger.debug("Métricas de evolução salvas para %s em %s.", patient_id, date)
+
+    def bulk_fill_evolution(self, patient_id: str, readings: List[Dict[str, Any]]) -> int:
+        """
+        Aplica várias leituras de evolução ({'date', 'metrics'}) em uma única leitura e escrita do arquivo.
+        Leituras da mesma data são mescladas na ordem recebida. Retorna quantas foram aplicadas.
+        """
+        if not readings:
+            return 0
+        all_evolutions = self.get_patient_data('patient_evolution.json')
+        patient_evolution = all_evolutions.get(patient_id, {})
+
+        for reading in readings:
+            patient_evolution.setdefault(reading['date'], {}).update(reading['metrics'])
+
+        all_evolutions[patient_id] = patient_evolution
+        self.save_patient_data('patient_evolution.json', all_evolutions)
+        logger.info("%d leituras de evolução importadas para %s.", len(readings), patient_id)
+        return len(readings)
 
     def update_tracked_metrics(self, patient_id: str, tracked_metrics: List[str]):
         """Atualiza a lista de métricas rastreadas para um paciente."""
@@ -164,7 +328,7 @@ class PersistenceService:
                     accounts[i]['patient_info'] = {}
                 accounts[i]['patient_info']['tracked_metrics'] = tracked_metrics
                 self.save_accounts(accounts)
-                print(f"[DB] Métricas rastreadas atualizadas para o paciente {patient_id}.")
+                logger.debug("Métricas rastreadas atualizadas para o paciente %s.", patient_id)
                 break
         
         # Remove dados de métricas não selecionadas do histórico de evolução
@@ -179,7 +343,7 @@ class PersistenceService:
                             del date_record[metric_key]
                 all_evolutions[patient_id] = patient_evolution
                 self.save_patient_data('patient_evolution.json', all_evolutions)
-                print(f"[DB] Dados de métricas antigas removidos para {patient_id}.")
+                logger.debug("Dados de métricas antigas removidos para %s.", patient_id)
 
     def change_password(self, user: str, current_pass: str, new_pass: str) -> bool:
         """Altera a senha de um usuário se a senha atual estiver correta."""
@@ -189,7 +353,7 @@ class PersistenceService:
                 if acc.get('password') == current_pass:
                     accounts[i]['password'] = new_pass
                     self.save_accounts(accounts)
-                    print(f"[DB] Senha alterada para o usuário {user}.")
+                    logger.info("Senha alterada para o usuário %s.", user)
                     return True
                 else:
                     return False # Senha atual incorreta
@@ -201,7 +365,7 @@ class PersistenceService:
         account_to_delete = next((acc for acc in accounts if acc.get('user') == user_to_delete), None)
         
         if not account_to_delete:
-            print(f"[DB] Conta {user_to_delete} não encontrada para deleção.")
+            logger.warning("Conta %s não encontrada para deleção.", user_to_delete)
             return False
 
         user_id_to_delete = account_to_delete.get('id')
@@ -246,7 +410,7 @@ class PersistenceService:
                     self.save_patient_data(filename, data)
 
         self.save_accounts(accounts)
-        print(f"[DB] Conta {user_to_delete} e todos os dados associados foram deletados.")
+        logger.info("Conta %s e todos os dados associados foram deletados.", user_to_delete)
         return True
 
     def add_invitation(self, doctor_user: str, patient_user_to_invite: str) -> str:
@@ -294,7 +458,7 @@ class PersistenceService:
                                 accounts[j]['linked_patients'].append(patient_id)
                                 break
         self.save_accounts(accounts)
-        print(f"[DB] Resposta ao convite de {doctor_id} por {patient_user} processada.")
+        logger.debug("Resposta ao convite de %s por %s processada.", doctor_id, patient_user)
 
     def unlink_account(self, user_unlinking: str, target_user_id: str):
         """Desvincula um paciente de um médico (ou vice-versa)."""
@@ -315,4 +479,4 @@ class PersistenceService:
                 if target_user_id in acc.get('linked_patients', []):
                     accounts[i]['linked_patients'].remove(target_user_id)
         self.save_accounts(accounts)
-        print(f"[DB] Desvinculação entre {user_id} e {target_user_id} processada.")
\ No newline at end of file
+        logger.debug("Desvinculação entre %s e %s processada.", user_id, target_user_id)
\ No newline at end of file
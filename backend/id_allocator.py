@@ -0,0 +1,68 @@
+from backend.database_manager import PersistenceService
+
+
+class IdAllocator:
+    """
+    Aloca IDs numéricos de 8 dígitos para novas contas, sem colisões e em O(1).
+
+    - Um contador persistido em 'id_allocator_state.json' reserva blocos de IDs;
+      o arquivo só é reescrito uma vez por bloco, antes de qualquer ID do bloco ser entregue.
+    - Cada valor do contador passa por uma permutação afim do espaço de 8 dígitos,
+      então IDs consecutivos não são sequenciais e dois contadores distintos nunca
+      geram o mesmo ID.
+    - Os IDs já existentes (contas e listas antigas 'doctor_ids.json'/'patient_ids.json')
+      são carregados uma única vez e pulados caso a permutação caia sobre eles.
+    """
+
+    STATE_FILE = 'id_allocator_state.json'
+    LEGACY_ID_FILES = ('doctor_ids.json', 'patient_ids.json')
+
+    ID_SPACE_START = 10000000
+    ID_SPACE_SIZE = 90000000
+    # Coprimo com ID_SPACE_SIZE (2^7 * 3^2 * 5^7), o que garante uma bijeção.
+    MULTIPLIER = 73939133
+    OFFSET = 31415926
+
+    def __init__(self, db: PersistenceService, block_size: int = 64):
+        """
+        Inicializa o alocador.
+
+        Args:
+            db: Instância do PersistenceService usada para ler e persistir o contador.
+            block_size: Quantidade de IDs reservados a cada escrita do contador.
+        """
+        self.db = db
+        self.block_size = block_size
+
+        state = self.db._read_db(self.STATE_FILE)
+        self._next_block_start = state.get('next_block_start', 0) if isinstance(state, dict) else 0
+        self._cursor = self._next_block_start
+        self._block_end = self._next_block_start # Nenhum bloco reservado ainda
+
+        self._legacy_ids = {acc.get('id') for acc in self.db.get_accounts()}
+        for filename in self.LEGACY_ID_FILES:
+            self._legacy_ids.update(self.db._read_db(filename))
+
+    def _reserve_block(self):
+        """Reserva o próximo bloco de contadores e persiste o novo início antes de usá-lo."""
+        if self._next_block_start >= self.ID_SPACE_SIZE:
+            raise RuntimeError("Espaço de IDs de 8 dígitos esgotado.")
+
+        self._cursor = self._next_block_start
+        self._block_end = min(self._cursor + self.block_size, self.ID_SPACE_SIZE)
+        self._next_block_start = self._block_end
+        self.db._write_db(self.STATE_FILE, {'next_block_start': self._next_block_start})
+
+    def _counter_to_id(self, counter: int) -> str:
+        """Mapeia um valor do contador para um ID de 8 dígitos (permutação afim)."""
+        return str(self.ID_SPACE_START + (counter * self.MULTIPLIER + self.OFFSET) % self.ID_SPACE_SIZE)
+
+    def next_id(self) -> str:
+        """Retorna um novo ID único."""
+        while True:
+            if self._cursor >= self._block_end:
+                self._reserve_block()
+            new_id = self._counter_to_id(self._cursor)
+            self._cursor += 1
+            if new_id not in self._legacy_ids:
+                return new_id
@@ -0,0 +1,448 @@
+"""
+Gerador de carga para o LocalBackend.
+
+Simula N médicos e M pacientes escrevendo no outbox uma mistura realista de
+mensagens (login, CRUD de medicações/eventos/diagnósticos, evolução, convites...)
+e mede o 'run_processing_cycle':
+
+- mensagens/segundo;
+- distribuição da latência de cada ciclo (p50/p95/p99/máx);
+- atraso do inbox (tempo entre a escrita no outbox e a resposta ficar visível);
+- crescimento dos arquivos JSON.
+
+O teste roda em um diretório temporário, nunca nos dados reais do projeto.
+
+Uso:
+    python -m backend.load_generator --doctors 20 --patients 200 --cycles 50 --messages-per-cycle 100
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+
+from backend.local_backend import LocalBackend
+from outbox_handler.outbox_log import OutboxLog
+from auxiliary_classes.id_generator import new_id
+from auxiliary_classes.app_logging import ROOT_LOGGER, configure_logging
+
+# Pesos das ações de cada perfil na fase de carga.
+DOCTOR_MIX = {
+    "add_med": 20, "edit_med": 8, "delete_med": 4,
+    "add_event": 8, "edit_event": 3, "delete_event": 2,
+    "add_diagnostic": 6, "delete_diagnostic": 2,
+    "fill_metric": 10, "update_tracked_metrics": 2,
+    "invite_patient": 3, "unlink_accounts": 1, "try_login": 2,
+}
+PATIENT_MIX = {
+    "fill_metric": 30, "respond_to_invitation": 4, "try_login": 3,
+}
+ACTION_OBJECTS = {
+    "add_med": "medication", "edit_med": "medication", "delete_med": "medication",
+    "add_event": "event", "edit_event": "event", "delete_event": "event",
+    "add_diagnostic": "diagnostic", "delete_diagnostic": "diagnostic",
+    "fill_metric": "evolution", "update_tracked_metrics": "evolution",
+    "invite_patient": "linking_accounts", "respond_to_invitation": "linking_accounts",
+    "unlink_accounts": "linking_accounts",
+    "try_login": "account", "create_account": "account",
+}
+METRICS = ["weight", "blood_pressure", "heart_rate", "blood_glucose", "temperature"]
+BASE_FILES = ['account.json', 'patient_medications.json', 'patient_events.json',
+              'patient_diagnostics.json', 'patient_evolution.json']
+
+
+class SimulatedClient:
+    """Um cliente (dispositivo) simulado, com identidade e sequência próprias."""
+
+    def __init__(self, user, profile_type):
+        self.user = user
+        self.password = "senha123"
+        self.profile_type = profile_type
+        self.device_id = new_id("dev_")
+        self.next_sequence = 1
+        self.id = None # Preenchido após a criação da conta
+
+        # Estado conhecido pelo cliente, usado para gerar ações válidas.
+        self.linked = set()          # médico: usuários dos pacientes vinculados
+        self.pending_invites = set() # paciente: usuários dos médicos que o convidaram
+        self.items = {}              # médico: (patient_user, object) -> ids de itens
+
+    def make_message(self, obj, action, payload):
+        """Cria uma mensagem no mesmo formato do OutboxProcessor."""
+        message = {
+            "message_id": new_id("msg_"),
+            "timestamp": "",
+            "origin_user_id": self.user,
+            "origin_device_id": self.device_id,
+            "sequence": self.next_sequence,
+            "object": obj,
+            "action": action,
+            "payload": payload
+        }
+        self.next_sequence += 1
+        return message
+
+
+class LoadGenerator:
+    """Gera tráfego simulado, executa o backend ciclo a ciclo e coleta as métricas."""
+
+    def __init__(self, workspace, doctors, patients, seed=None, verbose=False):
+        self.workspace = workspace
+        self.rng = random.Random(seed)
+        self.verbose = verbose
+        # O backend registra pelo logger 'placebo'; sem --verbose, só os erros aparecem.
+        if verbose:
+            configure_logging()
+        else:
+            logging.getLogger(ROOT_LOGGER).setLevel(logging.ERROR)
+        self.outbox = OutboxLog(os.path.join(workspace, 'outbox_handler'))
+        self.inbox_path = os.path.join(workspace, 'inbox_handler', 'inbox_messages.json')
+
+        run_tag = new_id()[-6:].lower() # Evita colisão com usuários de dados copiados
+        self.doctors = [SimulatedClient(f"lg_doc_{run_tag}_{i}", "doctor") for i in range(doctors)]
+        self.patients = [SimulatedClient(f"lg_pat_{run_tag}_{i}", "patient") for i in range(patients)]
+        self.clients_by_user = {c.user: c for c in self.doctors + self.patients}
+        self.clients_by_id = {}
+
+        self.backend = LocalBackend(workspace)
+        self._sent_at = {}      # message_id -> instante em que entrou no outbox
+        self.cycle_latencies = []
+        self.inbox_lags = []
+        self.messages_processed = 0
+
+    # --- Infraestrutura ---
+
+    def _read(self, path):
+        if not os.path.exists(path): return []
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write(self, path, data):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4)
+
+    def _enqueue(self, messages):
+        """Anexa mensagens ao outbox, como o OutboxProcessor faria."""
+        now = time.perf_counter()
+        for msg in messages:
+            self._sent_at[msg["message_id"]] = now
+            self.outbox.append(msg)
+
+    def run_cycle(self):
+        """Executa um ciclo do backend, mede a latência e drena o inbox como os clientes fariam."""
+        pending = len(self.outbox)
+        start = time.perf_counter()
+        self.backend.run_processing_cycle()
+        end = time.perf_counter()
+        self.cycle_latencies.append(end - start)
+        self._drain_inbox(end)
+        if self.clients_by_id:
+            self._sync_invitations()
+        return pending
+
+    def _drain_inbox(self, now):
+        """Consome o inbox: registra o atraso das respostas e aplica os acks no outbox."""
+        inbox = self._read(self.inbox_path)
+        for msg in inbox:
+            payload = msg.get("payload") or {}
+            if msg.get("action") == "ack_outbox":
+                for entry in payload.get("devices", []):
+                    self.messages_processed += self.outbox.acknowledge_through(
+                        entry.get("origin_device_id"), entry.get("through_sequence", 0), entry.get("exceptions", []))
+                self.messages_processed += self.outbox.acknowledge(payload.get("message_ids", []))
+                continue
+            request_id = payload.get("request_message_id")
+            if request_id in self._sent_at and msg.get("action", "").endswith("_cback"):
+                self.inbox_lags.append(now - self._sent_at.pop(request_id))
+
+        self._write(self.inbox_path, [])
+
+    def _sync_invitations(self):
+        """Atualiza os convites pendentes dos pacientes a partir do account.json, como a tela do paciente faz."""
+        for acc in self.backend.db.get_accounts():
+            patient = self.clients_by_user.get(acc.get('user'))
+            if patient and patient.profile_type == "patient":
+                patient.pending_invites = {self.clients_by_id[doctor_id].user for doctor_id in acc.get('invitations', [])
+                                           if doctor_id in self.clients_by_id}
+
+    # --- Preparação ---
+
+    def setup(self):
+        """Cria as contas e um grafo inicial de vínculos médico-paciente (fora das métricas)."""
+        messages = []
+        for client in self.doctors + self.patients:
+            patient_info = {
+                "height_cm": str(self.rng.randint(150, 195)),
+                "date_of_birth": {"day": 1, "month": self.rng.randint(1, 12), "year": self.rng.randint(1940, 2010)},
+                "sex": self.rng.choice(["Masculino", "Feminino"]),
+                "tracked_metrics": METRICS[:3]
+            } if client.profile_type == "patient" else {}
+            messages.append(client.make_message("account", "create_account", {
+                "profile_type": client.profile_type, "name": client.user.replace('_', ' ').title(),
+                "user": client.user, "password": client.password,
+                "is_also_patient": False, "patient_info": patient_info
+            }))
+        self._enqueue(messages)
+        self._run_until_drained()
+
+        for acc in self.backend.db.get_accounts():
+            client = self.clients_by_user.get(acc.get('user'))
+            if client:
+                client.id = acc.get('id')
+                self.clients_by_id[client.id] = client
+
+        # Cada paciente é convidado por um ou dois médicos e aceita.
+        if self.doctors:
+            invites = []
+            for patient in self.patients:
+                for doctor in self.rng.sample(self.doctors, min(len(self.doctors), self.rng.randint(1, 2))):
+                    invites.append(doctor.make_message("linking_accounts", "invite_patient",
+                                                       {"patient_user_to_invite": patient.user}))
+            self._enqueue(invites)
+            self._run_until_drained()
+            responses = []
+            for patient in self.patients:
+                for doctor_user in list(patient.pending_invites):
+                    responses.append(self._respond(patient, doctor_user, "accept"))
+            self._enqueue(responses)
+            self._run_until_drained()
+
+        self.cycle_latencies.clear()
+        self.inbox_lags.clear()
+        self.messages_processed = 0
+
+    def _run_until_drained(self):
+        """Executa ciclos até o backend confirmar todas as mensagens do outbox (respeitando o orçamento por ciclo)."""
+        while len(self.outbox):
+            self.run_cycle()
+
+    def _respond(self, patient, doctor_user, response):
+        patient.pending_invites.discard(doctor_user)
+        doctor = self.clients_by_user[doctor_user]
+        if response == "accept":
+            doctor.linked.add(patient.user)
+        return patient.make_message("linking_accounts", "respond_to_invitation",
+                                    {"doctor_id": doctor.id, "response": response})
+
+    # --- Geração de tráfego ---
+
+    def _pick_action(self, client):
+        mix = DOCTOR_MIX if client.profile_type == "doctor" else PATIENT_MIX
+        return self.rng.choices(list(mix), weights=list(mix.values()))[0]
+
+    def generate_message(self, client):
+        """Gera uma mensagem válida para o estado atual do cliente (ou None se a ação não se aplica)."""
+        action = self._pick_action(client)
+        obj = ACTION_OBJECTS[action]
+        rng = self.rng
+
+        if action == "try_login":
+            return client.make_message(obj, action, {"user": client.user, "password": client.password})
+
+        if client.profile_type == "patient":
+            if action == "fill_metric":
+                return client.make_message(obj, action, self._metric_payload(client.id))
+            if action == "respond_to_invitation" and client.pending_invites:
+                doctor_user = rng.choice(sorted(client.pending_invites))
+                return self._respond(client, doctor_user, rng.choice(["accept", "accept", "reject"]))
+            return None
+
+        if action == "invite_patient":
+            candidates = [p for p in self.patients if p.user not in client.linked]
+            if not candidates: return None
+            return client.make_message(obj, action, {"patient_user_to_invite": rng.choice(candidates).user})
+
+        if not client.linked:
+            return None
+        patient = self.clients_by_user[rng.choice(sorted(client.linked))]
+
+        if action == "unlink_accounts":
+            client.linked.discard(patient.user)
+            return client.make_message(obj, action, {"target_user_id": patient.id})
+        if action == "fill_metric":
+            return client.make_message(obj, action, self._metric_payload(patient.id))
+        if action == "update_tracked_metrics":
+            tracked = rng.sample(METRICS, rng.randint(2, len(METRICS)))
+            return client.make_message(obj, action, {"patient_id": patient.id, "tracked_metrics": tracked})
+
+        items = client.items.setdefault((patient.user, obj), [])
+        if action.startswith("add_"):
+            payload = self._item_payload(obj)
+            items.append(payload["id"])
+            payload["patient_user"] = patient.user
+            return client.make_message(obj, action, payload)
+        if not items:
+            return None
+        item_id = rng.choice(items)
+        if action.startswith("edit_"):
+            payload = self._item_payload(obj)
+            payload.update({"id": item_id, "patient_user": patient.user})
+            return client.make_message(obj, action, payload)
+        items.remove(item_id)
+        id_key = {"medication": "med_id", "event": "event_id", "diagnostic": "diagnostic_id"}[obj]
+        return client.make_message(obj, action, {id_key: item_id, "patient_user": patient.user})
+
+    def _metric_payload(self, patient_id):
+        day = date.today() - timedelta(days=self.rng.randint(0, 60))
+        metrics = {
+            "weight": str(round(self.rng.uniform(50, 110), 1)),
+            "heart_rate": str(self.rng.randint(55, 110)),
+            "blood_pressure": f"{self.rng.randint(100, 150)}/{self.rng.randint(60, 95)}"
+        }
+        return {"patient_id": patient_id, "date": day.isoformat(), "metrics": metrics}
+
+    def _item_payload(self, obj):
+        rng = self.rng
+        if obj == "medication":
+            return {
+                "id": new_id("med"), "generic_name": rng.choice(["Losartana", "Metformina", "Dipirona", "Sinvastatina"]),
+                "presentation": "Comprimido", "dosage": f"{rng.choice([25, 50, 100, 500])}mg", "quantity": "1",
+                "days_of_week": ["Todos os dias"], "times_of_day": ["08:00"],
+                "start_date": date.today().isoformat(), "end_date": "", "observation": ""
+            }
+        if obj == "event":
+            return {
+                "id": new_id("evt"), "name": rng.choice(["Consulta", "Exame de sangue", "Retorno"]),
+                "description": "", "date": date.today().isoformat(), "time": "09:30"
+            }
+        return {
+            "id": new_id("diag"), "cid_code": rng.choice(["I10", "E11", "J45"]),
+            "name": "Diagnóstico simulado", "description": "",
+            "date_added": date.today().isoformat() + " 10:00:00"
+        }
+
+    def run(self, cycles, messages_per_cycle):
+        """Executa a fase de carga e retorna o relatório."""
+        clients = self.doctors + self.patients
+        files_before = self._file_sizes()
+        generated = 0
+        start = time.perf_counter()
+
+        for _ in range(cycles):
+            batch = []
+            attempts = 0
+            while len(batch) < messages_per_cycle and attempts < messages_per_cycle * 10:
+                attempts += 1
+                msg = self.generate_message(self.rng.choice(clients))
+                if msg: batch.append(msg)
+            generated += len(batch)
+            self._enqueue(batch)
+            self.run_cycle()
+
+        elapsed = time.perf_counter() - start
+        return self._report(generated, elapsed, files_before, self._file_sizes())
+
+    # --- Relatório ---
+
+    def _file_sizes(self):
+        sizes = {}
+        for root, _, files in os.walk(self.workspace):
+            for name in files:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    sizes[os.path.relpath(path, self.workspace)] = os.path.getsize(path)
+        return sizes
+
+    @staticmethod
+    def _percentiles(values):
+        if not values:
+            return {}
+        ordered = sorted(values)
+        def pick(q): return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+        return {
+            "p50_ms": pick(0.50) * 1000, "p95_ms": pick(0.95) * 1000,
+            "p99_ms": pick(0.99) * 1000, "max_ms": ordered[-1] * 1000,
+            "mean_ms": statistics.fmean(ordered) * 1000
+        }
+
+    def _report(self, generated, elapsed, files_before, files_after):
+        backend_time = sum(self.cycle_latencies)
+        growth = {name: (files_before.get(name, 0), size) for name, size in files_after.items()
+                  if size != files_before.get(name, 0)}
+        return {
+            "doctors": len(self.doctors),
+            "patients": len(self.patients),
+            "cycles": len(self.cycle_latencies),
+            "messages_generated": generated,
+            "messages_processed": self.messages_processed,
+            "backlog": len(self.backend.scheduler),
+            "wall_time_s": elapsed,
+            "backend_time_s": backend_time,
+            "messages_per_second": self.messages_processed / backend_time if backend_time else 0.0,
+            "cycle_latency": self._percentiles(self.cycle_latencies),
+            "inbox_lag": self._percentiles(self.inbox_lags),
+            "file_growth_bytes": dict(sorted(growth.items(), key=lambda kv: kv[1][0] - kv[1][1])),
+        }
+
+
+def prepare_workspace(seed_data=None):
+    """Cria um diretório temporário com a estrutura de pastas do projeto (opcionalmente com dados copiados)."""
+    workspace = tempfile.mkdtemp(prefix="placebo_load_")
+    for folder in ('backend', 'inbox_handler', 'outbox_handler'):
+        os.makedirs(os.path.join(workspace, folder), exist_ok=True)
+
+    if seed_data:
+        for name in BASE_FILES:
+            source = os.path.join(seed_data, name)
+            if os.path.exists(source):
+                shutil.copy(source, workspace)
+        backend_source = os.path.join(seed_data, 'backend')
+        if os.path.isdir(backend_source):
+            for name in os.listdir(backend_source):
+                if name.endswith('.json'):
+                    shutil.copy(os.path.join(backend_source, name), os.path.join(workspace, 'backend'))
+    return workspace
+
+
+def print_report(report):
+    print(f"Clientes: {report['doctors']} médicos, {report['patients']} pacientes")
+    print(f"Ciclos: {report['cycles']} | Mensagens geradas: {report['messages_generated']} | "
+          f"processadas: {report['messages_processed']} | na fila: {report['backlog']}")
+    print(f"Tempo total: {report['wall_time_s']:.2f}s (backend: {report['backend_time_s']:.2f}s)")
+    print(f"Vazão: {report['messages_per_second']:.1f} mensagens/s")
+    for title, key in (("Latência do ciclo", "cycle_latency"), ("Atraso do inbox", "inbox_lag")):
+        stats = report[key]
+        if stats:
+            print(f"{title}: p50={stats['p50_ms']:.1f}ms p95={stats['p95_ms']:.1f}ms "
+                  f"p99={stats['p99_ms']:.1f}ms máx={stats['max_ms']:.1f}ms")
+    print("Crescimento dos arquivos:")
+    for name, (before, after) in report['file_growth_bytes'].items():
+        print(f"  {name}: {before / 1024:.1f} KiB -> {after / 1024:.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gerador de carga e benchmark do LocalBackend.")
+    parser.add_argument("--doctors", type=int, default=10)
+    parser.add_argument("--patients", type=int, default=50)
+    parser.add_argument("--cycles", type=int, default=20)
+    parser.add_argument("--messages-per-cycle", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=None, help="Semente do gerador aleatório (execuções reprodutíveis).")
+    parser.add_argument("--seed-data", default=None, help="Pasta do projeto cujos dados são copiados como ponto de partida.")
+    parser.add_argument("--json", action="store_true", help="Imprime o relatório em JSON.")
+    parser.add_argument("--keep", action="store_true", help="Mantém o diretório temporário ao final.")
+    parser.add_argument("--verbose", action="store_true", help="Mostra os logs do backend.")
+    args = parser.parse_args()
+
+    workspace = prepare_workspace(args.seed_data)
+    try:
+        generator = LoadGenerator(workspace, args.doctors, args.patients, seed=args.seed, verbose=args.verbose)
+        generator.setup()
+        report = generator.run(args.cycles, args.messages_per_cycle)
+        if args.json:
+            print(json.dumps(report, indent=4))
+        else:
+            print_report(report)
+    finally:
+        if args.keep:
+            print(f"Diretório de trabalho mantido em: {workspace}")
+        else:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,21 @@
+import copy
+import hashlib
 import json
 import os
 import shutil
-from datetime import datetime
+import time
 from datetime import datetime, timezone, timedelta
-import random
 from backend.database_manager import PersistenceService
+from backend.id_allocator import IdAllocator
+from backend.message_scheduler import MessageScheduler
+from backend.read_models import ReadModelProjector, read_model_path, DOCTOR_ROSTER, PATIENT_LINKS
+from backend.sync_versions import SyncVersions, SYNC_COLLECTIONS, collection_key, to_records, upsert_change, delete_change
+from auxiliary_classes.id_generator import new_id
+from outbox_handler.outbox_log import read_outbox
+from auxiliary_classes.evolution_import import revalidate_readings, MAX_REPORTED_REJECTIONS
+from auxiliary_classes.app_logging import get_logger
+
+logger = get_logger('backend')
 
 class LocalBackend:
     """
@@ -15,22 +26,95 @@ class LocalBackend:
     - Redireciona mensagens para a 'inbox' para serem processadas pelo cliente.
     """
 
-    def __init__(self, base_path: str):
+    # Ações que são apenas de saída (cliente -> servidor) e não devem ser retransmitidas para o inbox.
+    # O backend as processa e gera uma resposta, se necessário.
+    OUT_ONLY_ACTIONS = {
+        ("account", "delete_account"),
+        ("account", "create_account"),
+        ("account", "change_password"),
+        ("account", "try_login"),
+        ("linking_accounts", "invite_patient"),
+        ("linking_accounts", "respond_to_invitation"),
+        ("account", "delete_account"),
+        ("sync", "request_snapshot"),
+        ("account", "change_password"),
+        # Ações de escrita que são retransmitidas para outros clientes
+        # mas não precisam voltar para o remetente original.
+        ("diagnostic", "add_diagnostic"), ("diagnostic", "edit_diagnostic"), ("diagnostic", "delete_diagnostic"),
+        ("event", "add_event"), ("event", "edit_event"), ("event", "delete_event"),
+        ("medication", "add_med"), ("medication", "edit_med"), ("medication", "delete_med"),
+        ("evolution", "fill_metric"), ("evolution", "update_tracked_metrics"), ("evolution", "bulk_fill"),
+        ("envelope", "apply_operations"),
+    }
+
+    # Operações aceitas dentro de um envelope ('envelope/apply_operations'). Ficam de fora as
+    # ações de sessão e de conta, que não fazem sentido em lote ou não podem ser desfeitas.
+    ENVELOPE_OPERATIONS = {
+        ("diagnostic", "add_diagnostic"), ("diagnostic", "edit_diagnostic"), ("diagnostic", "delete_diagnostic"),
+        ("event", "add_event"), ("event", "edit_event"), ("event", "delete_event"),
+        ("medication", "add_med"), ("medication", "edit_med"), ("medication", "delete_med"),
+        ("evolution", "fill_metric"), ("evolution", "update_tracked_metrics"), ("evolution", "bulk_fill"),
+        ("linking_accounts", "invite_patient"), ("linking_accounts", "respond_to_invitation"),
+        ("linking_accounts", "unlink_accounts"),
+    }
+
+    # Mensagens retiradas do escalonador por vez; o orçamento de tempo é verificado entre lotes.
+    SCHEDULER_CHUNK_SIZE = 64
+    # Dados de referência cuja versão (hash do conteúdo) segue no snapshot de login.
+    REFERENCE_FILES = ('cid10.json', 'generic_medications.json')
+
+    def __init__(self, base_path: str, max_messages_per_cycle: int = 500, max_cycle_seconds: float = 2.0):
         """
         Inicializa o backend local.
 
         Args:
             base_path: O caminho raiz do projeto (onde 'account.json' está).
+            max_messages_per_cycle: Orçamento de mensagens por ciclo.
+            max_cycle_seconds: Orçamento de tempo por ciclo; o restante fica para o próximo ciclo.
         """
         self.base_path = base_path
+        self.max_messages_per_cycle = max_messages_per_cycle
+        self.max_cycle_seconds = max_cycle_seconds
+        self.scheduler = MessageScheduler()
+        self._outbox_cursor = None # (geração, posição) da última leitura do log do outbox
         self.inbox_handler_path = os.path.join(self.base_path, 'inbox_handler')
         self.inbox_path = os.path.join(self.inbox_handler_path, 'inbox_messages.json')
         self.outbox_handler_path = os.path.join(self.base_path, 'outbox_handler')
-        self.outbox_path = os.path.join(self.outbox_handler_path, 'outbox_messages.json')
         self.backend_path = os.path.join(self.base_path, 'backend')
         self.processed_ids_path = os.path.join(self.backend_path, 'processed_transaction_ids.json')
         self.transactions_path = os.path.join(self.backend_path, 'placebo_transactions.json')
+        self.sequence_state_path = os.path.join(self.backend_path, 'sequence_state.json')
+        self.bulk_imports_path = os.path.join(self.backend_path, 'bulk_imports.json')
         self.db = PersistenceService(base_path)
+        self.id_allocator = IdAllocator(self.db)
+        self.read_models = ReadModelProjector(base_path, self.db)
+        self.sync_versions = SyncVersions(self.db, os.path.join(self.backend_path, 'sync_versions.json'))
+        self._reference_versions = {} # arquivo -> ((mtime, tamanho), hash)
+
+        # Por dispositivo de origem: a sequência até a qual tudo foi aplicado, sem lacunas
+        # ('applied'), e as sequências acima dela já aplicadas fora de ordem ('applied_above').
+        # O estado é O(dispositivos + lacunas), e não O(mensagens já enviadas).
+        sequence_state = self.db._read_db(self.sequence_state_path)
+        if not isinstance(sequence_state, dict): sequence_state = {}
+        self._applied_sequences = sequence_state.get('applied', {})
+        self._applied_above = {device_id: set(sequences)
+                               for device_id, sequences in sequence_state.get('applied_above', {}).items()}
+        self._server_sequence = sequence_state.get('server_sequence', 0)
+        # Resumos das importações em massa ainda em andamento (import_id -> contagens),
+        # acumulados a cada lote recebido e enviados no último.
+        bulk_imports = self.db._read_db(self.bulk_imports_path)
+        self._bulk_imports = bulk_imports if isinstance(bulk_imports, dict) else {}
+        self._bulk_imports_dirty = False
+        # IDs processados de mensagens antigas, sem sequência (carregado sob demanda).
+        self._legacy_processed_ids = None
+        self._legacy_ids_dirty = False
+
+        # Índice de inscrições: patient_id -> usuários que devem ser notificados
+        # quando os dados desse paciente mudam (o próprio paciente e seus médicos).
+        self._subscribers = {}
+        self._user_by_id = {}
+        self._id_by_user = {}
+        self._build_subscription_index()
 
     def _get_brasilia_timestamp(self) -> str:
         """Retorna o timestamp atual no horário de Brasília (UTC-3), formatado."""
@@ -41,7 +125,8 @@ class LocalBackend:
     def _generate_server_message(self, obj, action, payload, origin_user_id="server"):
         """Cria uma nova mensagem com origem do servidor."""
         timestamp = self._get_brasilia_timestamp()
-        message_id = f"msg_{datetime.now().strftime('%Y%m%d%H%M%S')}_{os.urandom(4).hex()}"
+        message_id = new_id("msg_")
+        # A 'server_sequence' é atribuída ao montar o inbox, na ordem final das mensagens.
         return {
             "message_id": message_id,
             "timestamp": timestamp,
@@ -53,22 +138,88 @@ class LocalBackend:
 
     ## Aqui, o backend diretamente faz adição de mensagens ao outbox
     ## Futuramente, teremos que mudar essa lógica
-    def _ingest_from_outbox(self) -> list:
+    def _ingest_from_outbox(self) -> int:
         """
-        Move mensagens do outbox do cliente para o log de transações principal
-        e retorna apenas as novas mensagens que foram ingeridas.
+        Coloca as novas mensagens do outbox do cliente na fila do escalonador
+        e retorna quantas foram ingeridas.
         """
-        outbox_messages = self.db._read_db(self.outbox_path)
+        # Lê apenas o que foi anexado ao log desde a última leitura.
+        outbox_messages, self._outbox_cursor = read_outbox(self.outbox_handler_path, self._outbox_cursor)
         if not outbox_messages:
-            return []
+            return 0
+
+        # Após uma compactação (ou reinício) o log é relido a partir do ponteiro de confirmação,
+        # então mensagens já aplicadas ou ainda na fila podem reaparecer.
+        new_messages = [msg for msg in outbox_messages
+                        if msg.get("message_id") not in self.scheduler and not self._is_already_applied(msg)]
+        for msg in new_messages:
+            self.scheduler.enqueue(msg)
 
+        if new_messages:
+            logger.info("Ingestão de %d novas mensagens do outbox.", len(new_messages))
+        return len(new_messages)
+
+    def _append_to_transaction_log(self, messages):
+        """Registra as mensagens no log de transações, na ordem em que serão aplicadas."""
         all_transactions = self.db._read_db(self.transactions_path)
-        all_transactions.extend(outbox_messages)
-        
+        all_transactions.extend(messages)
         self.db._write_db(self.transactions_path, all_transactions)
-        # O outbox não é mais limpo diretamente pelo backend.
-        print(f"[Backend] Ingestão de {len(outbox_messages)} novas mensagens do outbox.")
-        return outbox_messages
+
+    def _is_already_applied(self, msg) -> bool:
+        """Verifica se a mensagem já foi aplicada (comparação de sequência por dispositivo)."""
+        sequence = msg.get("sequence")
+        if sequence is None:
+            # Mensagens antigas, anteriores às sequências por dispositivo.
+            return msg.get("message_id") in self._get_legacy_processed_ids()
+        device_id = msg.get("origin_device_id")
+        return (sequence <= self._applied_sequences.get(device_id, 0)
+                or sequence in self._applied_above.get(device_id, ()))
+
+    def _mark_applied(self, msg):
+        """
+        Registra a sequência como aplicada (ou o ID, para mensagens antigas). A marca d'água
+        só avança sobre sequências contíguas; uma sequência aplicada fora de ordem fica em
+        '_applied_above' até que as anteriores sejam aplicadas, para que nunca seja dada
+        como aplicada uma mensagem que ainda não foi.
+        """
+        sequence = msg.get("sequence")
+        if sequence is None:
+            self._get_legacy_processed_ids().add(msg.get("message_id"))
+            self._legacy_ids_dirty = True
+            return
+        device_id = msg.get("origin_device_id")
+        through = self._applied_sequences.get(device_id, 0)
+        if sequence <= through:
+            return
+        above = self._applied_above.setdefault(device_id, set())
+        above.add(sequence)
+        while through + 1 in above:
+            through += 1
+            above.discard(through)
+        self._applied_sequences[device_id] = through
+        if not above:
+            del self._applied_above[device_id]
+
+    def _get_legacy_processed_ids(self) -> set:
+        """Carrega o histórico de IDs processados apenas quando uma mensagem sem sequência aparece."""
+        if self._legacy_processed_ids is None:
+            self._legacy_processed_ids = set(self.db._read_db(self.processed_ids_path))
+            self._legacy_ids_dirty = False
+        return self._legacy_processed_ids
+
+    def _save_sequence_state(self):
+        """Persiste as marcas d'água por dispositivo e o contador de mensagens do servidor."""
+        self.db._write_db(self.sequence_state_path, {
+            "applied": self._applied_sequences,
+            "applied_above": {device_id: sorted(sequences) for device_id, sequences in self._applied_above.items()},
+            "server_sequence": self._server_sequence
+        })
+        if self._legacy_processed_ids is not None and self._legacy_ids_dirty:
+            self.db._write_db(self.processed_ids_path, list(self._legacy_processed_ids))
+            self._legacy_ids_dirty = False
+        if self._bulk_imports_dirty:
+            self.db._write_db(self.bulk_imports_path, self._bulk_imports)
+            self._bulk_imports_dirty = False
 
 
     ## Aqui, o backend diretamente faz adição de mensagens ao inbox
@@ -76,122 +227,48 @@ class LocalBackend:
     def run_processing_cycle(self):
         """
         Executa o ciclo completo de processamento do backend:
-        1. Ingestão de novas mensagens do outbox.
-        2. Processamento das novas transações e escrita das respostas no inbox.
+        1. Ingestão de novas mensagens do outbox para a fila do escalonador.
+        2. Processamento das mensagens escolhidas pelo escalonador, dentro do orçamento
+           do ciclo, em lotes particionados por paciente.
+        3. Escrita das respostas no inbox, na ordem em que as mensagens foram aplicadas,
+           seguidas de uma confirmação cumulativa ('ack_outbox') por usuário.
         """
-        new_transactions = self._ingest_from_outbox()
-        
-        if not new_transactions:
+        self._ingest_from_outbox()
+        # Uma vez por dia, mesmo sem mensagens: as medicações que terminaram saem das listas.
+        self.read_models.refresh_stale()
+
+        if not len(self.scheduler):
             return
 
+        cycle_start = time.perf_counter()
         new_inbox_messages = []
-        processed_ids = set(self.db._read_db(self.processed_ids_path))
-
-        # Ações que são apenas de saída (cliente -> servidor) e não devem ser retransmitidas para o inbox.
-        # O backend as processa e gera uma resposta, se necessário.
-        OUT_ONLY_ACTIONS = {
-            ("account", "delete_account"),
-            ("account", "create_account"),
-            ("account", "change_password"),
-            ("account", "try_login"),
-            ("linking_accounts", "invite_patient"),
-            ("linking_accounts", "respond_to_invitation"),
-            ("account", "delete_account"),
-            ("account", "change_password"),
-            # Ações de escrita que são retransmitidas para outros clientes
-            # mas não precisam voltar para o remetente original.
-            ("diagnostic", "add_diagnostic"), ("diagnostic", "edit_diagnostic"), ("diagnostic", "delete_diagnostic"),
-            ("event", "add_event"), ("event", "edit_event"), ("event", "delete_event"),
-            ("medication", "add_med"), ("medication", "edit_med"), ("medication", "delete_med"),
-            ("evolution", "fill_metric"), ("evolution", "update_tracked_metrics"),
-        }
-
-        for msg in new_transactions:
-            msg_id = msg.get("message_id")
-            if msg_id in processed_ids:
-                continue # Garante que a transação não seja processada duas vezes
-
-            obj = msg.get("object")
-            action = msg.get("action")
-            payload = msg.get("payload")
-            origin_user = msg.get("origin_user_id")
-
-            # Marca como processada antes de executar para evitar reprocessamento em caso de falha
-            processed_ids.add(msg_id)
-
-            print(f"[Backend] Processando: {obj}/{action} de {origin_user}")
-
-            # Adiciona o timestamp de registro do servidor (horário de Brasília)
-            msg["timestamp"] = self._get_brasilia_timestamp()
-
-
-            # 2. Gera respostas específicas do servidor
-            if obj == "account" and action == "try_login":
-                self._handle_login(msg, new_inbox_messages)
-
-            elif obj == "account" and action == "try_logout":
-                self._send_comeback(msg, new_inbox_messages, True)
-
-            elif obj == "account" and action == "create_account":
-                self._handle_create_account(msg, new_inbox_messages)
-
-            elif obj == "account" and action == "delete_account":
-                success = self.db.delete_account(origin_user)
-                self._send_comeback(msg, new_inbox_messages, success)
-
-            elif obj == "account" and action == "change_password":
-                success = self.db.change_password(origin_user, payload.get("current_password"), payload.get("new_password"))
-                reason = "Senha atual incorreta." if not success else ""
-                self._send_comeback(msg, new_inbox_messages, success, reason=reason)
-
-            elif obj == "diagnostic":
-                self._handle_patient_data(msg, "patient_diagnostics.json")
-            
-            elif obj == "event":
-                self._handle_patient_data(msg, "patient_events.json")
-
-            elif obj == "medication":
-                self._handle_patient_data(msg, "patient_medications.json")
-
-            elif obj == "evolution" and action == "fill_metric":
-                self.db.fill_evolution_metric(payload.get("patient_id"), payload.get("date"), payload.get("metrics"))
-                self._send_comeback(msg, new_inbox_messages, True) # Assume success for now
-            elif obj == "evolution" and action == "update_tracked_metrics":
-                self.db.update_tracked_metrics(payload.get("patient_id"), payload.get("tracked_metrics"))
-                self._send_comeback(msg, new_inbox_messages, True) # Assume success for now
-            
-            elif obj == "linking_accounts" and action == "invite_patient":
-                # O origin_user é o médico que está convidando
-                status = self.db.add_invitation(origin_user, payload.get("patient_user_to_invite"))
-                self._send_comeback(msg, new_inbox_messages, "sucesso" in status.lower(), reason=status)
-
-            elif obj == "linking_accounts" and action == "respond_to_invitation": # Paciente responde
-                self.db.respond_to_invitation(origin_user, payload.get("doctor_id"), payload.get("response"))
-                self._send_comeback(msg, new_inbox_messages, True)
-                if payload.get("response") == "accept": # Notifica o médico se aceito
-                    self._handle_accepted_invitation(payload, origin_user, new_inbox_messages)
-            
-            elif obj == "linking_accounts" and action == "unlink_accounts":
-                target_user_id = payload.get("target_user_id")
-                self.db.unlink_account(origin_user, target_user_id)
-                # 1. Envia uma mensagem de confirmação de volta para o cliente que solicitou.
-                self._send_comeback(msg, new_inbox_messages, True)
-                # 2. Notifica o outro usuário envolvido na desvinculação para que sua UI seja atualizada.
-                # A mensagem é enviada para o 'target_user_id', que é o ID do paciente.
-                unlink_notification = self._generate_server_message(obj, action, payload, origin_user_id=target_user_id)
-                new_inbox_messages.append(unlink_notification)
-
-            elif obj == "linking_accounts" and action == "invite_patient":
-                 self._handle_new_invitation(payload, origin_user, new_inbox_messages)
-
-            # 1. Redireciona a mensagem original para o inbox, a menos que seja uma ação "out-only".
-            if (obj, action) not in OUT_ONLY_ACTIONS:
-                new_inbox_messages.append(msg)
-
-            # 3. Envia mensagem para o cliente limpar seu outbox
-            delete_payload = {"message_id_to_delete": msg_id}
-            delete_msg = self._generate_server_message("outbox", "delete_from_outbox", delete_payload, origin_user_id=origin_user)
-            new_inbox_messages.append(delete_msg)
+        handled = [] # Mensagens retiradas da fila neste ciclo (aplicadas ou duplicadas)
+        processed = 0
+        self.db.begin_batch()
+        try:
+            while processed < self.max_messages_per_cycle:
+                batch = self.scheduler.next_batch(min(self.SCHEDULER_CHUNK_SIZE, self.max_messages_per_cycle - processed))
+                if not batch:
+                    break
+                processed += len(batch)
+                handled.extend(batch)
+                new_inbox_messages.extend(self._apply_batch(batch))
+                if time.perf_counter() - cycle_start >= self.max_cycle_seconds:
+                    break
+            self.sync_versions.save()
+        finally:
+            self.db.end_batch()
+
+        if len(self.scheduler):
+            logger.info("%d mensagens aguardando o próximo ciclo.", len(self.scheduler))
+        new_inbox_messages.extend(self._build_outbox_acks(handled))
+
+        for out_msg in new_inbox_messages:
+            self._server_sequence += 1
+            out_msg["server_sequence"] = self._server_sequence
+
+        # Salvo antes do inbox para que nenhuma sequência do servidor seja reutilizada.
+        self._save_sequence_state()
 
         ## Aqui, o backend diretamente faz adição de mensagens ao inbox
         ## Futuramente, teremos que mudar essa lógica
@@ -200,10 +277,233 @@ class LocalBackend:
             current_inbox = self.db._read_db(self.inbox_path)
             current_inbox.extend(new_inbox_messages)
             self.db._write_db(self.inbox_path, current_inbox)
-            print(f"[Backend] {len(new_inbox_messages)} novas mensagens adicionadas ao inbox.")
+            logger.info("%d novas mensagens adicionadas ao inbox.", len(new_inbox_messages))
 
-        self.db._write_db(self.processed_ids_path, list(processed_ids)) # Salva os IDs processados
-        print("[Backend] Ciclo de processamento concluído.")
+        logger.debug("Ciclo de processamento concluído.")
+
+    def _apply_batch(self, batch):
+        """Aplica um lote de mensagens e retorna as respostas, na ordem das mensagens do lote."""
+        # Descarta duplicatas e marca como processadas antes de executar,
+        # para evitar reprocessamento em caso de falha.
+        pending = []
+        for msg in batch:
+            if self._is_already_applied(msg):
+                continue # Garante que a transação não seja processada duas vezes
+            self._mark_applied(msg)
+            pending.append(msg)
+        self._append_to_transaction_log(pending)
+
+        # As respostas de cada mensagem ficam no índice da mensagem original,
+        # então a ordem final do inbox não depende da ordem de execução das partições.
+        outputs = [[] for _ in pending]
+        for segment, barrier in self._split_segments(pending):
+            self._run_segment(segment, outputs)
+            if barrier is not None:
+                index, msg = barrier
+                self._process_message(msg, outputs[index])
+        return [out_msg for output in outputs for out_msg in output]
+
+    # --- Particionamento por paciente ---
+
+    def _partition_key(self, msg):
+        """
+        Retorna a chave de partição da mensagem, ou None se ela precisa rodar isolada.
+
+        Mensagens de dados de um mesmo paciente compartilham a chave (e mantêm a ordem
+        entre si); operações de conta e de vínculo alteram 'account.json' e o índice de
+        inscrições, então funcionam como barreira entre os segmentos. O login
+        também é barreira, porque o snapshot lê os dados de todos os pacientes do usuário.
+        Um envelope pode tocar vários pacientes e contas, então também roda isolado.
+        """
+        obj = msg.get("object")
+        action = msg.get("action")
+        payload = msg.get("payload") or {}
+
+        if obj in ("diagnostic", "event", "medication"):
+            patient_user = payload.get("patient_user")
+            return ("patient", self._id_by_user.get(patient_user, patient_user))
+        if obj == "evolution" and action in ("fill_metric", "bulk_fill"):
+            return ("patient", payload.get("patient_id"))
+        if obj == "account" and action == "try_logout":
+            # Apenas lê 'account.json', que nenhuma mensagem paralela escreve.
+            return ("session", msg.get("origin_user_id"))
+        return None
+
+    def _split_segments(self, messages):
+        """
+        Divide as mensagens em segmentos separados por barreiras.
+        Gera tuplas (segmento, barreira): o segmento é uma lista de (índice, mensagem)
+        e a barreira é um (índice, mensagem) a executar sozinho logo depois, ou None.
+        """
+        segment = []
+        for index, msg in enumerate(messages):
+            if self._partition_key(msg) is None:
+                yield segment, (index, msg)
+                segment = []
+            else:
+                segment.append((index, msg))
+        if segment:
+            yield segment, None
+
+    def _partition_segment(self, segment):
+        """
+        Agrupa um segmento por chave de partição, na ordem em que cada chave aparece.
+        Retorna uma lista de listas de (índice, mensagem), cada uma na ordem original.
+        """
+        partitions = {}
+        for index, msg in segment:
+            partitions.setdefault(self._partition_key(msg), []).append((index, msg))
+        return list(partitions.values())
+
+    def _run_segment(self, segment, outputs):
+        """
+        Executa um segmento, uma partição por vez. As partições não compartilham pacientes,
+        então a ordem entre elas não altera o resultado; dentro de cada uma, a ordem é a do lote.
+        """
+        for items in self._partition_segment(segment):
+            for index, msg in items:
+                self._process_message(msg, outputs[index])
+
+    def _process_message(self, msg, new_inbox_messages):
+        """Aplica uma única transação e anexa as respostas geradas em 'new_inbox_messages'."""
+        msg_id = msg.get("message_id")
+        obj = msg.get("object")
+        action = msg.get("action")
+        payload = msg.get("payload")
+        origin_user = msg.get("origin_user_id")
+
+        logger.debug("Processando: %s/%s de %s", obj, action, origin_user)
+
+        # Adiciona o timestamp de registro do servidor (horário de Brasília)
+        msg["timestamp"] = self._get_brasilia_timestamp()
+
+
+        # 2. Gera respostas específicas do servidor
+        if obj == "account" and action == "try_login":
+            self._handle_login(msg, new_inbox_messages)
+
+        elif obj == "account" and action == "try_logout":
+            self._send_comeback(msg, new_inbox_messages, True)
+
+        elif obj == "account" and action == "create_account":
+            self._handle_create_account(msg, new_inbox_messages)
+
+        elif obj == "account" and action == "delete_account":
+            deleted_account = next((acc for acc in self.db.get_accounts() if acc.get('user') == origin_user), None)
+            success = self.db.delete_account(origin_user)
+            if success:
+                self._unsubscribe_deleted_account(deleted_account)
+                self.read_models.remove_account(deleted_account)
+            self._send_comeback(msg, new_inbox_messages, success)
+
+        elif obj == "account" and action == "change_password":
+            success = self.db.change_password(origin_user, payload.get("current_password"), payload.get("new_password"))
+            reason = "Senha atual incorreta." if not success else ""
+            self._send_comeback(msg, new_inbox_messages, success, reason=reason)
+
+        elif obj == "diagnostic":
+            self._handle_patient_data(msg, "patient_diagnostics.json", new_inbox_messages)
+
+        elif obj == "event":
+            self._handle_patient_data(msg, "patient_events.json", new_inbox_messages)
+
+        elif obj == "medication":
+            self._handle_patient_data(msg, "patient_medications.json", new_inbox_messages)
+
+        elif obj == "evolution" and action == "fill_metric":
+            patient_id, date = payload.get("patient_id"), payload.get("date")
+            self.db.fill_evolution_metric(patient_id, date, payload.get("metrics"))
+            self._send_comeback(msg, new_inbox_messages, True) # Assume success for now
+            day = self.db.get_patient_data('patient_evolution.json').get(patient_id, {}).get(date, {})
+            self._publish_patch(msg, "evolution", patient_id, [upsert_change(date, copy.deepcopy(day))], new_inbox_messages)
+        elif obj == "evolution" and action == "bulk_fill":
+            self._handle_bulk_fill(msg, new_inbox_messages)
+        elif obj == "evolution" and action == "update_tracked_metrics":
+            self._handle_update_tracked_metrics(msg, new_inbox_messages)
+
+        elif obj == "linking_accounts" and action == "invite_patient":
+            # O origin_user é o médico que está convidando
+            status = self.db.add_invitation(origin_user, payload.get("patient_user_to_invite"))
+            self._send_comeback(msg, new_inbox_messages, "sucesso" in status.lower(), reason=status)
+
+        elif obj == "linking_accounts" and action == "respond_to_invitation": # Paciente responde
+            patient_account = next((acc for acc in self.db.get_accounts() if acc.get('user') == origin_user), {})
+            was_invited = payload.get("doctor_id") in patient_account.get('invitations', [])
+            self.db.respond_to_invitation(origin_user, payload.get("doctor_id"), payload.get("response"))
+            self._send_comeback(msg, new_inbox_messages, True)
+            if payload.get("response") == "accept": # Notifica o médico se aceito
+                if was_invited:
+                    self._subscribe(patient_account.get('id'), self._user_by_id.get(payload.get("doctor_id")))
+                self._handle_accepted_invitation(payload, origin_user, new_inbox_messages)
+
+        elif obj == "linking_accounts" and action == "unlink_accounts":
+            target_user_id = payload.get("target_user_id")
+            self.db.unlink_account(origin_user, target_user_id)
+            # O banco só desfaz o vínculo quando o médico desvincula o paciente.
+            if target_user_id in self._subscribers:
+                self._unsubscribe(target_user_id, origin_user)
+            # 1. Envia uma mensagem de confirmação de volta para o cliente que solicitou.
+            self._send_comeback(msg, new_inbox_messages, True)
+            # 2. Notifica o outro usuário envolvido na desvinculação para que sua UI seja atualizada.
+            # A mensagem é enviada para o 'target_user_id', que é o ID do paciente.
+            unlink_notification = self._generate_server_message(obj, action, payload, origin_user_id=target_user_id)
+            new_inbox_messages.append(unlink_notification)
+
+        elif obj == "linking_accounts" and action == "invite_patient":
+             self._handle_new_invitation(payload, origin_user, new_inbox_messages)
+
+        elif obj == "envelope" and action == "apply_operations":
+            self._handle_envelope(msg, new_inbox_messages)
+
+        elif obj == "sync" and action == "request_snapshot":
+            # O cliente perdeu a versão de alguma coleção do cache: reenvia o conjunto de trabalho.
+            accounts = self.db.get_accounts()
+            account = next((acc for acc in accounts if acc.get('user') == origin_user), None)
+            if account:
+                new_inbox_messages.append(self._generate_server_message("sync", "snapshot", self._build_login_snapshot(account, accounts),
+                                                                        origin_user_id=origin_user))
+
+        # Atualiza os modelos de leitura afetados pela mensagem.
+        self.read_models.apply(msg)
+
+        # 1. Redireciona a mensagem original para o inbox, a menos que seja uma ação "out-only".
+        if (obj, action) not in self.OUT_ONLY_ACTIONS:
+            new_inbox_messages.append(msg)
+        # O outbox do cliente é limpo pela confirmação cumulativa do fim do ciclo ('ack_outbox').
+
+    def _build_outbox_acks(self, handled):
+        """
+        Gera uma confirmação cumulativa por usuário para as mensagens retiradas da fila no ciclo:
+        por dispositivo, "tudo até a sequência N foi aplicado", exceto as sequências em
+        'exceptions'. N é a maior sequência aplicada e as exceções são as lacunas abaixo dela
+        (mensagens na fila do escalonador ou ainda não recebidas), então só é confirmado o
+        que de fato foi aplicado. Mensagens antigas, sem sequência, vão pelo ID.
+        """
+        devices_by_user, ids_by_user = {}, {}
+        for msg in handled:
+            user = msg.get("origin_user_id")
+            if msg.get("sequence") is None:
+                ids_by_user.setdefault(user, []).append(msg.get("message_id"))
+            else:
+                devices_by_user.setdefault(user, set()).add(msg.get("origin_device_id"))
+        if not devices_by_user and not ids_by_user:
+            return []
+
+        acks = []
+        for user in dict.fromkeys(list(devices_by_user) + list(ids_by_user)):
+            devices = []
+            for device_id in sorted(devices_by_user.get(user, ())):
+                contiguous = self._applied_sequences.get(device_id, 0)
+                above = self._applied_above.get(device_id, set())
+                through = max(above, default=contiguous)
+                devices.append({
+                    "origin_device_id": device_id,
+                    "through_sequence": through,
+                    "exceptions": [seq for seq in range(contiguous + 1, through) if seq not in above]
+                })
+            payload = {"devices": devices, "message_ids": ids_by_user.get(user, [])}
+            acks.append(self._generate_server_message("outbox", "ack_outbox", payload, origin_user_id=user))
+        return acks
 
     def _send_comeback(self, original_message, message_list, success, reason=""):
         """Gera uma mensagem de 'comeback' para uma ação do cliente."""
@@ -222,19 +522,251 @@ class LocalBackend:
         comeback_msg = self._generate_server_message(original_obj, comeback_action, payload, origin_user_id=origin_user)
         message_list.append(comeback_msg)
 
-    def _handle_patient_data(self, message, filename):
+    def _handle_bulk_fill(self, message, message_list):
+        """
+        Revalida e aplica um lote de uma importação em massa de leituras de evolução em uma
+        única passada pelo armazenamento. Os lotes de uma importação chegam em mensagens
+        separadas, com o mesmo 'import_id'; o resumo é acumulado entre elas (e entre ciclos)
+        e um único comeback é enviado no último lote. Uma mensagem sem 'import_id' é uma
+        importação de um lote só.
+        """
+        payload = message.get("payload") or {}
+        patient_id = payload.get("patient_id")
+        import_id = payload.get("import_id") or message.get("message_id")
+        is_last_batch = payload.get("batch", 1) >= payload.get("batches", 1)
+
+        if patient_id not in self._user_by_id:
+            self._bulk_imports_dirty |= self._bulk_imports.pop(import_id, None) is not None
+            if is_last_batch:
+                self._send_comeback(message, message_list, False, reason="Paciente não encontrado.")
+            return
+
+        # As linhas rejeitadas no cliente entram no resumo junto com as rejeitadas aqui.
+        client_rejected = list(payload.get("rejected_rows") or [])
+        accepted, rejected = [], []
+        for accepted_batch, rejected_batch in revalidate_readings(payload.get("readings") or []):
+            accepted.extend(accepted_batch)
+            rejected.extend(rejected_batch)
+        rejected_count = payload.get("rejected_count", len(client_rejected)) + len(rejected)
+        rejected = client_rejected + rejected
+
+        self.db.bulk_fill_evolution(patient_id, accepted)
+
+        previous = self._bulk_imports.pop(import_id, None)
+        summary = previous or {"accepted": 0, "rejected": 0, "rejected_rows": []}
+        summary["accepted"] += len(accepted)
+        summary["rejected"] += rejected_count
+        summary["rejected_rows"] = (summary["rejected_rows"] + rejected)[:MAX_REPORTED_REJECTIONS]
+        if not is_last_batch:
+            self._bulk_imports[import_id] = summary
+        self._bulk_imports_dirty |= previous is not None or not is_last_batch
+
+        if is_last_batch:
+            comeback_payload = {
+                "request_message_id": message.get("message_id"),
+                "executed": True,
+                "reason": "",
+                "import_id": import_id,
+                **summary
+            }
+            message_list.append(self._generate_server_message("evolution", "bulk_fill_cback", comeback_payload,
+                                                              origin_user_id=message.get("origin_user_id")))
+        if accepted:
+            evolution = self.db.get_patient_data('patient_evolution.json').get(patient_id, {})
+            dates = dict.fromkeys(reading['date'] for reading in accepted)
+            changes = [upsert_change(date, copy.deepcopy(evolution.get(date, {}))) for date in dates]
+            self._publish_patch(message, "evolution", patient_id, changes, message_list)
+
+    def _handle_envelope(self, message, message_list):
+        """
+        Aplica as operações de um envelope em ordem e de forma atômica: se alguma falhar,
+        as anteriores são desfeitas e nada é publicado. Os comebacks individuais são
+        substituídos por um único comeback agregado, com o resultado de cada operação.
+        """
+        message_id = message.get("message_id")
+        operations = (message.get("payload") or {}).get("operations") or []
+        unsupported = [op for op in operations if (op.get("object"), op.get("action")) not in self.ENVELOPE_OPERATIONS]
+        if not operations or unsupported:
+            reason = "Envelope vazio." if not operations else \
+                f"Operação não permitida em envelope: {unsupported[0].get('object')}/{unsupported[0].get('action')}."
+            self._send_comeback(message, message_list, False, reason=reason)
+            return
+
+        self.db.begin_savepoint()
+        versions = self.sync_versions.savepoint()
+        outputs, results = [], []
+        failure = None
+        try:
+            for index, op in enumerate(operations):
+                sub_message = {**message, "message_id": f"{message_id}:{index}", "object": op.get("object"),
+                               "action": op.get("action"), "payload": op.get("payload") or {}}
+                op_outputs = []
+                self._process_message(sub_message, op_outputs)
+
+                # O comeback da operação vira uma linha do resultado agregado.
+                comeback = next((out for out in op_outputs if out.get("action") == f"{op.get('action')}_cback"
+                                 and out["payload"].get("request_message_id") == sub_message["message_id"]), None)
+                result = {"object": op.get("object"), "action": op.get("action"), "executed": True, "reason": ""}
+                if comeback is not None:
+                    result.update({k: v for k, v in comeback["payload"].items() if k != "request_message_id"})
+                results.append(result)
+                outputs.extend(out for out in op_outputs if out is not comeback)
+                if not result["executed"]:
+                    failure = f"Operação {index + 1} ({op.get('action')}) falhou: {result.get('reason') or 'sem motivo informado'}"
+                    break
+        except Exception:
+            self._rollback_envelope(versions)
+            raise
+
+        if failure:
+            self._rollback_envelope(versions)
+            outputs = []
+        else:
+            self.db.release_savepoint()
+
+        comeback_payload = {
+            "request_message_id": message_id,
+            "executed": failure is None,
+            "reason": failure or "",
+            "results": results
+        }
+        message_list.extend(outputs)
+        message_list.append(self._generate_server_message("envelope", "apply_operations_cback", comeback_payload,
+                                                          origin_user_id=message.get("origin_user_id")))
+
+    def _rollback_envelope(self, versions):
+        """Desfaz as alterações de um envelope que falhou (arquivos, versões e índice de inscrições)."""
+        self.db.rollback_savepoint()
+        self.sync_versions.rollback(versions)
+        self._build_subscription_index()
+
+    def _handle_update_tracked_metrics(self, message, message_list):
+        """Atualiza as métricas rastreadas e publica também os dias de evolução que perderam métricas."""
+        payload = message.get("payload") or {}
+        patient_id = payload.get("patient_id")
+        tracked_metrics = payload.get("tracked_metrics") or []
+
+        account = next((acc for acc in self.db.get_accounts() if acc.get('id') == patient_id), {})
+        removed = set((account.get('patient_info') or {}).get('tracked_metrics', [])) - set(tracked_metrics)
+        evolution = self.db.get_patient_data('patient_evolution.json').get(patient_id, {})
+        affected_dates = [date for date, metrics in evolution.items() if removed & set(metrics)]
+
+        self.db.update_tracked_metrics(patient_id, tracked_metrics)
+        self._send_comeback(message, message_list, True) # Assume success for now
+
+        self._publish_patch(message, "tracked_metrics", patient_id,
+                            [upsert_change("tracked_metrics", list(tracked_metrics))], message_list)
+        if affected_dates:
+            evolution = self.db.get_patient_data('patient_evolution.json').get(patient_id, {})
+            changes = [upsert_change(date, copy.deepcopy(evolution.get(date, {}))) for date in affected_dates]
+            self._publish_patch(message, "evolution", patient_id, changes, message_list)
+
+    def _handle_patient_data(self, message, filename, message_list):
         """Handler genérico para CRUD de dados de paciente (diagnósticos, eventos, etc.)."""
         action = message.get("action")
         payload = message.get("payload")
         patient_user = payload.get("patient_user")
 
         if action in ["add_diagnostic", "add_event", "add_med"]:
+            item_id = payload.get("id")
             item_data = {k: v for k, v in payload.items() if k != 'patient_user'}
             self.db.add_item_to_patient_list(filename, patient_user, item_data)
         elif action in ["edit_diagnostic", "edit_event", "edit_med"]:
-            self.db.edit_item_in_patient_list(filename, patient_user, payload.get("id"), payload)
+            item_id = payload.get("id")
+            self.db.edit_item_in_patient_list(filename, patient_user, item_id, payload)
         elif action in ["delete_diagnostic", "delete_event", "delete_med"]:
-            self.db.delete_item_from_patient_list(filename, patient_user, payload.get("diagnostic_id") or payload.get("event_id") or payload.get("med_id"))
+            item_id = payload.get("diagnostic_id") or payload.get("event_id") or payload.get("med_id")
+            self.db.delete_item_from_patient_list(filename, patient_user, item_id)
+            self._publish_patch(message, message.get("object"), self._id_by_user.get(patient_user),
+                                [delete_change(item_id)], message_list)
+            return
+        else:
+            return
+
+        record = next((item for item in self.db.get_patient_data(filename).get(patient_user, []) if item.get('id') == item_id), None)
+        if record is not None:
+            self._publish_patch(message, message.get("object"), self._id_by_user.get(patient_user),
+                                [upsert_change(item_id, copy.deepcopy(record))], message_list)
+
+    # --- Índice de inscrições (fan-out de mudanças de dados de paciente) ---
+
+    def _build_subscription_index(self):
+        """Monta o índice patient_id -> usuários inscritos a partir de 'linked_patients'/'responsible_doctors'."""
+        accounts = self.db.get_accounts()
+        self._subscribers = {}
+        self._user_by_id = {acc.get('id'): acc.get('user') for acc in accounts}
+        self._id_by_user = {acc.get('user'): acc.get('id') for acc in accounts}
+
+        for acc in accounts:
+            if acc.get('profile_type') == 'patient':
+                self._subscribe(acc.get('id'), acc.get('user'))
+                for doctor_id in (acc.get('patient_info') or {}).get('responsible_doctors', []):
+                    self._subscribe(acc.get('id'), self._user_by_id.get(doctor_id))
+            elif acc.get('profile_type') == 'doctor':
+                for patient_id in acc.get('linked_patients', []):
+                    if patient_id in self._user_by_id:
+                        self._subscribe(patient_id, acc.get('user'))
+
+    def _register_account(self, account):
+        """Registra uma conta recém-criada nos mapas de id/usuário e no índice."""
+        self._user_by_id[account.get('id')] = account.get('user')
+        self._id_by_user[account.get('user')] = account.get('id')
+        if account.get('profile_type') == 'patient':
+            self._subscribe(account.get('id'), account.get('user'))
+
+    def _subscribe(self, patient_id, user):
+        """Inscreve um usuário nas mudanças de dados de um paciente."""
+        if patient_id and user:
+            self._subscribers.setdefault(patient_id, set()).add(user)
+
+    def _unsubscribe(self, patient_id, user):
+        """Remove a inscrição de um usuário nos dados de um paciente."""
+        subscribers = self._subscribers.get(patient_id)
+        if subscribers is not None:
+            subscribers.discard(user)
+
+    def _unsubscribe_deleted_account(self, account):
+        """Remove do índice todas as inscrições de uma conta deletada."""
+        if not account:
+            return
+        user_id = account.get('id')
+        user = account.get('user')
+
+        if account.get('profile_type') == 'patient':
+            self._subscribers.pop(user_id, None)
+        else:
+            for patient_id in account.get('linked_patients', []):
+                self._unsubscribe(patient_id, user)
+
+        self._user_by_id.pop(user_id, None)
+        self._id_by_user.pop(user, None)
+
+    def _publish_patch(self, original_message, collection, patient_id, changes, message_list):
+        """
+        Incrementa a versão da coleção do paciente e envia um patch ('sync/patch') com os
+        registros alterados para cada inscrito, inclusive o autor, para que os caches dos
+        clientes sejam atualizados sem reler os arquivos. Custo O(inscritos x alterações).
+        """
+        if not patient_id or not changes:
+            return
+        patient_user = self._user_by_id.get(patient_id)
+        key = collection_key(collection, patient_id, patient_user)
+        # A versão avança mesmo sem inscritos: quem se inscrever depois detecta a lacuna.
+        version = self.sync_versions.bump(collection, key)
+
+        subscribers = self._subscribers.get(patient_id)
+        if not subscribers:
+            return
+        payload = {
+            "collection": collection,
+            "patient_id": patient_id,
+            "patient_user": patient_user,
+            "version": version,
+            "changes": changes,
+            "request_message_id": original_message.get("message_id")
+        }
+        for subscriber in subscribers:
+            message_list.append(self._generate_server_message("sync", "patch", payload, origin_user_id=subscriber))
 
     def _handle_login(self, original_message, message_list):
         """Valida credenciais e gera uma mensagem de success_login ou fail_login."""
@@ -260,12 +792,82 @@ class LocalBackend:
             }
             server_msg = self._generate_server_message("account", "try_login_cback", response_payload, origin_user_id=login_user)
             message_list.append(server_msg)
+            # Em seguida, o snapshot do conjunto de trabalho do usuário, a partir do qual o cliente segue com os patches.
+            message_list.append(self._generate_server_message("sync", "snapshot", self._build_login_snapshot(account, accounts),
+                                                              origin_user_id=login_user))
         else:
             # Falha no login
             response_payload = {"executed": False, "reason": "Usuário ou senha inválidos.", "request_message_id": original_msg_id}
             server_msg = self._generate_server_message("account", "try_login_cback", response_payload, origin_user_id=login_user)
             message_list.append(server_msg)
 
+    def _build_login_snapshot(self, account, accounts):
+        """
+        Monta o snapshot do conjunto de trabalho de um usuário que acabou de entrar: o roster
+        (ou os vínculos, para pacientes) e, para cada paciente acompanhado, um resumo e as
+        coleções com a versão atual. Cada arquivo de dados é lido uma única vez.
+        """
+        by_id = {acc.get('id'): acc for acc in accounts}
+        user = account.get('user')
+        if account.get('profile_type') == 'doctor':
+            patient_ids = list(account.get('linked_patients', []))
+            roster = self.db._read_db(read_model_path(self.base_path, DOCTOR_ROSTER, user))
+        else:
+            patient_ids = [account.get('id')]
+            roster = self.db._read_db(read_model_path(self.base_path, PATIENT_LINKS, user))
+
+        data_files = {collection: self.db.get_patient_data(filename)
+                      for collection, (filename, _) in SYNC_COLLECTIONS.items() if collection != "tracked_metrics"}
+        patients = []
+        for patient_id in patient_ids:
+            patient = by_id.get(patient_id)
+            if not patient:
+                continue
+            patient_user = patient.get('user')
+            collections = {}
+            for collection in SYNC_COLLECTIONS:
+                key = collection_key(collection, patient_id, patient_user)
+                if collection == "tracked_metrics":
+                    records = {"tracked_metrics": (patient.get('patient_info') or {}).get('tracked_metrics', [])}
+                else:
+                    records = to_records(data_files[collection].get(key))
+                # Cópia: o snapshot só é serializado no fim do ciclo, depois de outras mensagens.
+                collections[collection] = {"version": self.sync_versions.current(collection, key),
+                                           "records": copy.deepcopy(records)}
+            patients.append({
+                "id": patient_id,
+                "user": patient_user,
+                "name": patient.get('name', patient_user),
+                "summary": {collection: len(content["records"]) for collection, content in collections.items()
+                            if collection != "tracked_metrics"},
+                "collections": collections
+            })
+
+        return {
+            "user": user,
+            "profile_type": account.get('profile_type'),
+            "roster": roster if isinstance(roster, dict) else {},
+            "patients": patients,
+            "reference_data_version": self._reference_data_version()
+        }
+
+    def _reference_data_version(self):
+        """Hash do conteúdo de cada arquivo de referência, recalculado apenas quando o arquivo muda."""
+        versions = {}
+        for filename in self.REFERENCE_FILES:
+            path = os.path.join(self.base_path, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            cached = self._reference_versions.get(filename)
+            if cached is None or cached[0] != (stat.st_mtime_ns, stat.st_size):
+                with open(path, 'rb') as f:
+                    cached = ((stat.st_mtime_ns, stat.st_size), hashlib.sha1(f.read()).hexdigest()[:12])
+                self._reference_versions[filename] = cached
+            versions[filename] = cached[1]
+        return versions
+
     def _handle_create_account(self, original_message, message_list):
         """Cria uma nova conta, salva e envia uma mensagem de success_login."""
         payload = original_message.get("payload", {})
@@ -276,7 +878,7 @@ class LocalBackend:
         # --- Validação ---
         if not all(payload.get(k) for k in ["name", "user", "password", "profile_type"]):
             # Não envia resposta para o cliente, apenas loga o erro no backend.
-            print("[Backend] Erro: Payload de create_account inválido.")
+            logger.error("Payload de create_account inválido.")
             return
 
         if any(acc['user'] == user for acc in accounts):
@@ -287,7 +889,9 @@ class LocalBackend:
 
         # --- Criação da Conta ---
         profile_type = payload.get("profile_type")
-        user_id = self._generate_unique_id(profile_type)
+        # Na reconstrução a partir do log (backend/replay_engine.py), os IDs já atribuídos são reutilizados.
+        assigned_ids = original_message.get("assigned_ids") or {}
+        user_id = assigned_ids.get("id") or self._generate_unique_id(profile_type)
 
         base_user_data = {
             "profile_type": profile_type,
@@ -299,7 +903,7 @@ class LocalBackend:
 
         # --- Lida com o caso "Médico também é paciente" ---
         if profile_type == 'doctor' and payload.get("is_also_patient"):
-            patient_id = self._generate_unique_id('patient')
+            patient_id = assigned_ids.get("self_patient_id") or self._generate_unique_id('patient')
             doctor_as_patient_account = {
                 "profile_type": "patient",
                 "name": base_user_data['name'],
@@ -311,10 +915,12 @@ class LocalBackend:
             doctor_as_patient_account["patient_info"]["patient_code"] = patient_id
             doctor_as_patient_account["patient_info"]["responsible_doctors"] = [user_id]
             accounts.append(doctor_as_patient_account)
+            self._register_account(doctor_as_patient_account)
+            self._subscribe(patient_id, user)
 
             base_user_data['linked_patients'] = [patient_id]
             base_user_data['self_patient_id'] = patient_id
-            print(f"[Backend] Perfil de paciente ({patient_id}) criado para o médico {user_id}.")
+            logger.info("Perfil de paciente (%s) criado para o médico %s.", patient_id, user_id)
 
         elif profile_type == 'patient':
             base_user_data["patient_info"] = payload.get("patient_info")
@@ -322,25 +928,23 @@ class LocalBackend:
 
         accounts.append(base_user_data)
         self.db.save_accounts(accounts)
-        print(f"[Backend] Conta '{user}' criada com sucesso.")
+        self._register_account(base_user_data)
+        logger.info("Conta '%s' criada com sucesso.", user)
+
+        # A mensagem já está no log de transações do ciclo (gravado só ao fim do lote),
+        # então os IDs atribuídos ficam registrados junto com ela.
+        original_message["assigned_ids"] = {"id": user_id}
+        if base_user_data.get('self_patient_id'):
+            original_message["assigned_ids"]["self_patient_id"] = base_user_data['self_patient_id']
 
         # Envia uma mensagem de confirmação (comeback) para o cliente.
         self._send_comeback(original_message, message_list, True)
 
-    ## Aqui, o backend faz leitura da base de dados, precisará de mudanças quando ela 
-    ## não for mais local
     def _generate_unique_id(self, id_type):
-        """Gera um ID numérico único e o salva no arquivo de IDs correspondente."""
-        filename = f"{id_type}_ids.json"
-
-        existing_ids = self.db._read_db(filename)
-
-        while True:
-            new_id = str(random.randint(10000000, 99999999))
-            if new_id not in existing_ids:
-                existing_ids.append(new_id)
-                self.db._write_db(filename, existing_ids)
-                return new_id
+        """Gera um ID numérico único para uma nova conta (médico ou paciente)."""
+        # Médicos e pacientes compartilham o mesmo espaço de IDs, pois as contas
+        # são buscadas apenas pelo 'id'.
+        return self.id_allocator.next_id()
 
     def _handle_accepted_invitation(self, payload, patient_user, message_list):
         """Gera uma mensagem 'establish_link' para o médico quando um paciente aceita um convite."""
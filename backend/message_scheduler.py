@@ -0,0 +1,100 @@
+from collections import deque
+from typing import Dict, Any, List
+
+
+class MessageScheduler:
+    """
+    Fila de mensagens ingeridas que decide o que o backend processa em cada ciclo.
+
+    - Cada dispositivo de origem tem uma fila FIFO própria, então as mensagens de um
+      dispositivo são aplicadas na ordem das suas sequências, mesmo quando vêm de
+      usuários diferentes (ex: logout de um usuário e login de outro no mesmo aparelho).
+      Mensagens antigas, sem dispositivo, usam a fila do usuário de origem.
+    - O dispositivo concorre na classe de prioridade da mensagem que está no início da
+      sua fila: autenticação/sessão primeiro, CRUD interativo depois e cargas em
+      massa por último.
+    - Dentro de uma classe, os dispositivos são atendidos em round-robin (uma mensagem
+      por vez), então um cliente com milhares de mensagens não atrasa os demais.
+    - O que não couber no orçamento do ciclo continua na fila para o próximo.
+    """
+
+    AUTH = 0
+    INTERACTIVE = 1
+    BULK = 2
+
+    AUTH_ACTIONS = {
+        ("account", "try_login"),
+        ("account", "try_logout"),
+        ("account", "create_account"),
+    }
+    # 'fill_metric' é uma leitura digitada pelo usuário (interativa); só a importação em lote é massa.
+    BULK_ACTIONS = {
+        ("evolution", "bulk_fill"),
+    }
+
+    def __init__(self):
+        self._queues: Dict[tuple, deque] = {}
+        self._ready = [deque(), deque(), deque()] # Filas prontas (dispositivos), por classe de prioridade
+        self._queued_ids = set()
+
+    def __len__(self):
+        return len(self._queued_ids)
+
+    def __contains__(self, message_id):
+        return message_id in self._queued_ids
+
+    @classmethod
+    def priority_of(cls, msg: Dict[str, Any]) -> int:
+        """Retorna a classe de prioridade de uma mensagem."""
+        key = (msg.get("object"), msg.get("action"))
+        if key in cls.AUTH_ACTIONS:
+            return cls.AUTH
+        if key in cls.BULK_ACTIONS:
+            return cls.BULK
+        return cls.INTERACTIVE
+
+    @staticmethod
+    def queue_key(msg: Dict[str, Any]):
+        """Fila da mensagem: o dispositivo de origem (ou o usuário, para mensagens antigas)."""
+        device_id = msg.get("origin_device_id")
+        return ("device", device_id) if device_id else ("user", msg.get("origin_user_id"))
+
+    def enqueue(self, msg: Dict[str, Any]):
+        """Adiciona uma mensagem ao fim da fila do seu dispositivo de origem."""
+        key = self.queue_key(msg)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+        if not queue:
+            self._ready[self.priority_of(msg)].append(key)
+        queue.append(msg)
+        self._queued_ids.add(msg.get("message_id"))
+
+    def next_batch(self, limit: int) -> List[Dict[str, Any]]:
+        """Retira até 'limit' mensagens, respeitando prioridade e round-robin entre dispositivos."""
+        batch = []
+        while len(batch) < limit:
+            ready = next((users for users in self._ready if users), None)
+            if ready is None:
+                break
+
+            key = ready.popleft()
+            queue = self._queues[key]
+            msg = queue.popleft()
+            self._queued_ids.discard(msg.get("message_id"))
+            batch.append(msg)
+
+            # O dispositivo volta para o fim da fila da classe da sua próxima mensagem.
+            if queue:
+                self._ready[self.priority_of(queue[0])].append(key)
+            else:
+                del self._queues[key]
+        return batch
+
+    def pending_by_priority(self) -> List[int]:
+        """Quantidade de mensagens aguardando, agrupadas pela classe da mensagem."""
+        counts = [0, 0, 0]
+        for queue in self._queues.values():
+            for msg in queue:
+                counts[self.priority_of(msg)] += 1
+        return counts
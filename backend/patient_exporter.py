@@ -0,0 +1,188 @@
+"""
+Exportação em fluxo do prontuário completo de pacientes.
+
+Os registros (conta, medicações, eventos, diagnósticos, evolução e, opcionalmente,
+o histórico de transações) são gerados um a um, em NDJSON ou CSV. Os arquivos de
+dados são lidos uma coleção por vez e liberados antes da próxima, então exportar
+vários pacientes (ex: todos os pacientes de um médico) não acumula os dados de
+todas as coleções em memória, e a saída nunca é montada por inteiro. O log de
+transações, que cresce sem limite, é lido em fluxo, uma mensagem por vez.
+
+Uso:
+    python -m backend.patient_exporter --patient maria --format ndjson --output maria.ndjson
+    python -m backend.patient_exporter --doctor dr_joao --format csv --output pacientes.csv
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from typing import Callable, Dict, Any, Iterator, List
+
+from backend.database_manager import PersistenceService
+
+# (tipo do registro, arquivo, chave do paciente no arquivo: 'user' ou 'id')
+PATIENT_COLLECTIONS = [
+    ("medication", 'patient_medications.json', 'user'),
+    ("event", 'patient_events.json', 'user'),
+    ("diagnostic", 'patient_diagnostics.json', 'user'),
+    ("evolution", 'patient_evolution.json', 'id'),
+]
+CSV_COLUMNS = ["record_type", "patient_id", "patient_user", "key", "data"]
+ACCOUNT_EXPORT_FIELDS = ("id", "user", "name", "profile_type", "patient_info", "invitations")
+
+ProgressCallback = Callable[[str, int], None]
+
+
+class PatientExporter:
+    """Gera o prontuário de um ou mais pacientes como uma sequência de registros."""
+
+    def __init__(self, db: PersistenceService):
+        """
+        Args:
+            db: Instância do PersistenceService de onde os dados são lidos.
+        """
+        self.db = db
+
+    def patients_of_doctor(self, doctor_user: str) -> List[str]:
+        """Retorna os usuários dos pacientes vinculados a um médico."""
+        accounts = self.db.get_accounts()
+        doctor = next((acc for acc in accounts if acc.get('user') == doctor_user), None)
+        if not doctor:
+            return []
+        linked = set(doctor.get('linked_patients', []))
+        return [acc.get('user') for acc in accounts if acc.get('id') in linked]
+
+    def iter_records(self, patient_users: List[str], include_transactions: bool = False,
+                     progress: ProgressCallback | None = None) -> Iterator[Dict[str, Any]]:
+        """
+        Gera os registros dos pacientes, coleção por coleção.
+
+        Args:
+            patient_users: Usuários dos pacientes a exportar.
+            include_transactions: Inclui as mensagens do log de transações que envolvem os pacientes.
+            progress: Chamado como progress(etapa, registros_gerados) ao fim de cada etapa.
+        """
+        emitted = 0
+
+        # 1. Contas: ficam só os campos do prontuário (sem senha).
+        wanted = set(patient_users)
+        accounts = {acc.get('user'): acc for acc in self.db.get_accounts() if acc.get('user') in wanted}
+        patients = [(user, accounts[user].get('id')) for user in patient_users if user in accounts]
+        for user, patient_id in patients:
+            account = accounts[user]
+            yield self._record("account", patient_id, user, patient_id,
+                               {k: account[k] for k in ACCOUNT_EXPORT_FIELDS if k in account})
+            emitted += 1
+        del accounts
+        if progress: progress("account", emitted)
+
+        # 2. Coleções de dados: um arquivo carregado por vez.
+        for record_type, filename, key_field in PATIENT_COLLECTIONS:
+            data = self.db.get_patient_data(filename)
+            for user, patient_id in patients:
+                entries = data.get(user if key_field == 'user' else patient_id)
+                if not entries:
+                    continue
+                if isinstance(entries, dict): # Evolução: {data: métricas}
+                    for date in sorted(entries):
+                        yield self._record(record_type, patient_id, user, date, entries[date])
+                        emitted += 1
+                else:
+                    for item in entries:
+                        yield self._record(record_type, patient_id, user, item.get('id'), item)
+                        emitted += 1
+            del data
+            if progress: progress(record_type, emitted)
+
+        # 3. Histórico de transações que envolvem os pacientes.
+        if include_transactions:
+            id_by_user = dict(patients)
+            user_by_id = {patient_id: user for user, patient_id in patients}
+            for msg in self.db.iter_list('placebo_transactions.json'):
+                user = self._transaction_patient(msg, id_by_user, user_by_id)
+                if user:
+                    yield self._record("transaction", id_by_user[user], user, msg.get("message_id"), msg)
+                    emitted += 1
+            if progress: progress("transaction", emitted)
+
+    @staticmethod
+    def _transaction_patient(msg, id_by_user, user_by_id) -> str | None:
+        """Retorna o usuário do paciente envolvido na transação, se for um dos exportados."""
+        payload = msg.get("payload") or {}
+        candidates = (payload.get("patient_user"), msg.get("origin_user_id"), payload.get("patient_user_to_invite"))
+        for candidate in candidates:
+            if candidate in id_by_user:
+                return candidate
+        return user_by_id.get(payload.get("patient_id") or payload.get("target_user_id"))
+
+    @staticmethod
+    def _record(record_type, patient_id, patient_user, key, data) -> Dict[str, Any]:
+        return {"record_type": record_type, "patient_id": patient_id, "patient_user": patient_user,
+                "key": key, "data": data}
+
+    # --- Formatos de saída ---
+
+    def iter_ndjson(self, patient_users: List[str], **kwargs) -> Iterator[str]:
+        """Gera o prontuário como linhas NDJSON (um registro por linha)."""
+        for record in self.iter_records(patient_users, **kwargs):
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+
+    def iter_csv(self, patient_users: List[str], **kwargs) -> Iterator[str]:
+        """Gera o prontuário como linhas CSV; a coluna 'data' leva o conteúdo do registro em JSON."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        def flush():
+            line = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            return line
+
+        writer.writerow(CSV_COLUMNS)
+        yield flush()
+        for record in self.iter_records(patient_users, **kwargs):
+            writer.writerow([record["record_type"], record["patient_id"], record["patient_user"],
+                             record["key"], json.dumps(record["data"], ensure_ascii=False)])
+            yield flush()
+
+    def export_to_file(self, patient_users: List[str], output_path: str, fmt: str = "ndjson", **kwargs) -> int:
+        """Escreve o prontuário em um arquivo e retorna o número de caracteres escritos."""
+        lines = self.iter_csv(patient_users, **kwargs) if fmt == "csv" else self.iter_ndjson(patient_users, **kwargs)
+        written = 0
+        with open(output_path, 'w', encoding='utf-8', newline='') as f:
+            for line in lines:
+                f.write(line)
+                written += len(line)
+        return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta o prontuário completo de pacientes em NDJSON ou CSV.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--patient", action="append", help="Usuário do paciente (pode ser repetido).")
+    target.add_argument("--doctor", help="Exporta todos os pacientes vinculados a este médico.")
+    parser.add_argument("--format", choices=("ndjson", "csv"), default="ndjson")
+    parser.add_argument("--output", help="Arquivo de saída (padrão: saída padrão).")
+    parser.add_argument("--with-transactions", action="store_true", help="Inclui o histórico do log de transações.")
+    parser.add_argument("--base-path", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    args = parser.parse_args()
+
+    exporter = PatientExporter(PersistenceService(args.base_path))
+    patient_users = args.patient or exporter.patients_of_doctor(args.doctor)
+
+    def report(stage, count):
+        print(f"[Export] {stage}: {count} registros", file=sys.stderr)
+
+    options = {"include_transactions": args.with_transactions, "progress": report}
+    if args.output:
+        exporter.export_to_file(patient_users, args.output, args.format, **options)
+    else:
+        lines = exporter.iter_csv(patient_users, **options) if args.format == "csv" else exporter.iter_ndjson(patient_users, **options)
+        for line in lines:
+            sys.stdout.write(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Modelos de leitura (projeções) mantidos pelo backend para as telas.
+
+Em vez de cada tela cruzar 'account.json' e 'patient_medications.json' a cada
+'on_enter', o backend mantém documentos pequenos e já prontos, um por usuário,
+atualizados de forma incremental a cada mensagem aplicada:
+
+- 'doctor_roster/<médico>.json': pacientes vinculados ao médico;
+- 'patient_links/<paciente>.json': médicos responsáveis e convites pendentes;
+- 'active_medications/<paciente>.json': medicações que ainda não terminaram.
+  Esta projeção depende da data: na primeira chamada de refresh_stale() em um
+  dia novo, todas são recalculadas, mesmo sem mensagens para o paciente.
+
+Os documentos ficam em 'read_models/', na raiz do projeto, e são escritos pelo
+PersistenceService (portanto entram no modo em lote durante um ciclo).
+"""
+import json
+import os
+import re
+from datetime import date
+from typing import Dict, Any, List
+
+from backend.database_manager import PersistenceService
+from auxiliary_classes.app_logging import get_logger
+
+logger = get_logger('read_models')
+
+READ_MODELS_DIR = 'read_models'
+READ_MODELS_VERSION = 1
+DOCTOR_ROSTER = 'doctor_roster'
+PATIENT_LINKS = 'patient_links'
+ACTIVE_MEDICATIONS = 'active_medications'
+
+_UNSAFE_CHARS = re.compile(r'[^A-Za-z0-9._@-]')
+
+
+def read_model_path(base_path: str, model: str, key: str) -> str:
+    """Caminho do documento de um modelo de leitura para uma chave (usuário)."""
+    return os.path.join(base_path, READ_MODELS_DIR, model, f"{_UNSAFE_CHARS.sub('_', key)}.json")
+
+
+def load_read_model(base_path: str, model: str, key: str) -> Dict[str, Any]:
+    """Lê um documento de modelo de leitura (usado pelas telas). Retorna {} se não existir."""
+    if not key:
+        return {}
+    try:
+        with open(read_model_path(base_path, model, key), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+class ReadModelProjector:
+    """Atualiza os documentos de leitura afetados por cada mensagem aplicada no backend."""
+
+    def __init__(self, base_path: str, db: PersistenceService):
+        """
+        Args:
+            base_path: O caminho raiz do projeto.
+            db: PersistenceService usado pelo backend (para ler o estado e escrever os documentos).
+        """
+        self.base_path = base_path
+        self.db = db
+        self.meta_path = os.path.join(base_path, READ_MODELS_DIR, '_meta.json')
+        for model in (DOCTOR_ROSTER, PATIENT_LINKS, ACTIVE_MEDICATIONS):
+            os.makedirs(os.path.join(base_path, READ_MODELS_DIR, model), exist_ok=True)
+
+        meta = self.db._read_db(self.meta_path)
+        if not isinstance(meta, dict) or meta.get('version') != READ_MODELS_VERSION:
+            self.rebuild_all()
+        else:
+            self._medications_as_of = meta.get('medications_as_of')
+
+    # --- Atualização incremental ---
+
+    def apply(self, msg: Dict[str, Any]):
+        """Atualiza apenas os documentos afetados por uma mensagem já aplicada."""
+        obj = msg.get("object")
+        action = msg.get("action")
+        payload = msg.get("payload") or {}
+        origin_user = msg.get("origin_user_id")
+
+        if obj == "medication":
+            self.refresh_active_medications(payload.get("patient_user"))
+        elif obj == "account" and action == "create_account":
+            users = [payload.get("user")]
+            if payload.get("profile_type") == 'doctor' and payload.get("is_also_patient"):
+                users.append(f"{payload.get('user')}_patient_profile")
+            self._refresh_users(users)
+        elif obj == "linking_accounts" and action == "invite_patient":
+            self._refresh_users([payload.get("patient_user_to_invite")])
+        elif obj == "linking_accounts" and action == "respond_to_invitation":
+            self._refresh_users([origin_user], extra_ids=[payload.get("doctor_id")])
+        elif obj == "linking_accounts" and action == "unlink_accounts":
+            self._refresh_users([origin_user], extra_ids=[payload.get("target_user_id")])
+
+    def remove_account(self, account: Dict[str, Any] | None):
+        """Remove os documentos de uma conta deletada e atualiza os de quem estava vinculado a ela."""
+        if not account:
+            return
+        user = account.get('user')
+        if account.get('profile_type') == 'doctor':
+            self._delete(DOCTOR_ROSTER, user)
+            # Pacientes vinculados e pacientes com convite pendente deste médico.
+            related_ids = list(account.get('linked_patients', []))
+            related_ids += [acc.get('id') for acc in self.db.get_accounts() if account.get('id') in acc.get('invitations', [])]
+        else:
+            self._delete(PATIENT_LINKS, user)
+            self._delete(ACTIVE_MEDICATIONS, user)
+            related_ids = list((account.get('patient_info') or {}).get('responsible_doctors', []))
+            related_ids += account.get('invitations', [])
+        self._refresh_users([], extra_ids=related_ids)
+
+    def _refresh_users(self, users: List[str], extra_ids: List[str] = ()):
+        """Recalcula os documentos de conta (roster ou vínculos) dos usuários e IDs indicados."""
+        accounts = self.db.get_accounts()
+        by_user = {acc.get('user'): acc for acc in accounts}
+        by_id = {acc.get('id'): acc for acc in accounts}
+
+        targets = [by_user[user] for user in users if user in by_user]
+        targets += [by_id[account_id] for account_id in extra_ids if account_id in by_id]
+        for account in targets:
+            if account.get('profile_type') == 'doctor':
+                self._write(DOCTOR_ROSTER, account.get('user'), self._doctor_roster(account, by_id))
+            else:
+                self._write(PATIENT_LINKS, account.get('user'), self._patient_links(account, by_id))
+
+    def refresh_active_medications(self, patient_user: str):
+        """Recalcula a lista de medicações ativas de um paciente."""
+        if not patient_user:
+            return
+        medications = self.db.get_patient_data('patient_medications.json').get(patient_user, [])
+        self._write(ACTIVE_MEDICATIONS, patient_user,
+                    self._active_medications(patient_user, medications, date.today().isoformat()))
+
+    def refresh_stale(self, today: str | None = None):
+        """
+        Recalcula as medicações ativas de todos os pacientes se o dia mudou desde o
+        último cálculo ('as_of'), para que as medicações encerradas saiam das listas.
+
+        Args:
+            today: Data de referência (ISO); por padrão, a data atual.
+        """
+        today = today or date.today().isoformat()
+        if self._medications_as_of == today:
+            return
+        self._rebuild_active_medications(today)
+        self._save_meta()
+        logger.info("Medicações ativas recalculadas para %s.", today)
+
+    # --- Reconstrução completa ---
+
+    def rebuild_all(self):
+        """Recria todos os documentos a partir do estado atual (primeira execução ou mudança de versão)."""
+        accounts = self.db.get_accounts()
+        by_id = {acc.get('id'): acc for acc in accounts}
+        for account in accounts:
+            if account.get('profile_type') == 'doctor':
+                self._write(DOCTOR_ROSTER, account.get('user'), self._doctor_roster(account, by_id))
+            elif account.get('profile_type') == 'patient':
+                self._write(PATIENT_LINKS, account.get('user'), self._patient_links(account, by_id))
+
+        self._rebuild_active_medications(date.today().isoformat())
+        self._save_meta()
+        logger.info("Modelos de leitura reconstruídos para %d contas.", len(accounts))
+
+    def _rebuild_active_medications(self, today: str):
+        for patient_user, medications in self.db.get_patient_data('patient_medications.json').items():
+            self._write(ACTIVE_MEDICATIONS, patient_user, self._active_medications(patient_user, medications, today))
+        self._medications_as_of = today
+
+    def _save_meta(self):
+        self.db._write_db(self.meta_path, {"version": READ_MODELS_VERSION, "medications_as_of": self._medications_as_of})
+
+    # --- Documentos ---
+
+    @staticmethod
+    def _doctor_roster(doctor: Dict[str, Any], by_id: Dict[str, Dict]) -> Dict[str, Any]:
+        patients = []
+        for patient_id in doctor.get('linked_patients', []):
+            patient = by_id.get(patient_id)
+            if patient:
+                patients.append({"id": patient_id, "name": patient.get('name', patient.get('user')), "user": patient.get('user')})
+        return {
+            "doctor_user": doctor.get('user'),
+            "doctor_id": doctor.get('id'),
+            "self_patient_id": doctor.get('self_patient_id'),
+            "patients": patients
+        }
+
+    @staticmethod
+    def _patient_links(patient: Dict[str, Any], by_id: Dict[str, Dict]) -> Dict[str, Any]:
+        def doctor_entries(doctor_ids):
+            return [{"id": doctor_id, "name": by_id[doctor_id].get('name', 'Médico Desconhecido')}
+                    for doctor_id in doctor_ids if doctor_id in by_id]
+        return {
+            "patient_user": patient.get('user'),
+            "patient_id": patient.get('id'),
+            "doctors": doctor_entries((patient.get('patient_info') or {}).get('responsible_doctors', [])),
+            "invitations": doctor_entries(patient.get('invitations', []))
+        }
+
+    @staticmethod
+    def _active_medications(patient_user: str, medications: List[Dict[str, Any]], today: str) -> Dict[str, Any]:
+        active = [med for med in medications if not med.get('end_date') or med.get('end_date') >= today]
+        active.sort(key=lambda med: min(med.get('times_of_day') or ['99:99']))
+        return {"patient_user": patient_user, "as_of": today, "medications": active}
+
+    def _write(self, model: str, key: str, document: Dict[str, Any]):
+        if key:
+            self.db._write_db(read_model_path(self.base_path, model, key), document)
+
+    def _delete(self, model: str, key: str):
+        if key:
+            self.db.delete_file(read_model_path(self.base_path, model, key))
@@ -0,0 +1,234 @@
+"""
+Reconstrução do estado do backend a partir do log de transações.
+
+O 'placebo_transactions.json' guarda, na ordem de aplicação, toda mensagem que o
+backend processou. O ReplayEngine:
+
+- cria checkpoints: uma cópia dos arquivos de estado junto com a posição do log;
+- reconstrói o estado em um diretório temporário, partindo do checkpoint mais
+  recente e reaplicando o restante do log em lotes, com a mesma lógica do
+  LocalBackend (as respostas para o inbox são descartadas);
+- compara o resultado com os arquivos atuais e, se pedido, restaura os arquivos
+  corrompidos ou divergentes.
+
+Registros 'create_account' antigos, gravados antes de o backend guardar os IDs
+atribuídos ('assigned_ids'), ganham IDs novos no replay. Se algum deles for
+reaplicado, um arquivo diferente do atual é marcado como 'não reproduzível' (e
+não 'divergente'): crie um checkpoint para que o replay parta depois deles.
+
+Também serve como benchmark: o relatório traz registros/segundo.
+
+Uso (com o app parado):
+    python -m backend.replay_engine checkpoint
+    python -m backend.replay_engine verify
+    python -m backend.replay_engine rebuild --restore account.json patient_medications.json
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Callable, Dict, Any, List
+
+from backend.database_manager import PersistenceService
+from backend.local_backend import LocalBackend
+from auxiliary_classes.app_logging import ROOT_LOGGER
+
+# Arquivos de estado mantidos pelo PersistenceService e reconstruídos pelo replay.
+STATE_FILES = [
+    'account.json',
+    'patient_medications.json',
+    'patient_events.json',
+    'patient_diagnostics.json',
+    'patient_evolution.json',
+]
+
+
+class ReplayEngine:
+    """Cria checkpoints e reconstrói os arquivos de estado a partir do log de transações."""
+
+    CHECKPOINT_DIR = 'checkpoints'
+
+    def __init__(self, base_path: str):
+        """
+        Args:
+            base_path: O caminho raiz do projeto (onde 'account.json' está).
+        """
+        self.base_path = base_path
+        self.db = PersistenceService(base_path)
+        self.checkpoint_path = os.path.join(base_path, 'backend', self.CHECKPOINT_DIR)
+
+    def _read_log(self) -> List[Dict[str, Any]]:
+        return self.db._read_db('placebo_transactions.json')
+
+    # --- Checkpoints ---
+
+    def create_checkpoint(self) -> str:
+        """Salva os arquivos de estado atuais e a posição do log. Retorna o caminho do checkpoint."""
+        log = self._read_log()
+        checkpoint = {
+            "log_position": len(log),
+            "last_message_id": log[-1].get("message_id") if log else None,
+            "files": {name: self.db._read_db(name) for name in STATE_FILES}
+        }
+        os.makedirs(self.checkpoint_path, exist_ok=True)
+        path = os.path.join(self.checkpoint_path, f"checkpoint_{len(log):010d}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+        print(f"[Replay] Checkpoint criado na posição {len(log)} do log: {path}")
+        return path
+
+    def latest_checkpoint(self, log: List[Dict[str, Any]]) -> Dict[str, Any] | None:
+        """Retorna o checkpoint mais recente que ainda confere com o log (ou None)."""
+        if not os.path.isdir(self.checkpoint_path):
+            return None
+        for name in sorted(os.listdir(self.checkpoint_path), reverse=True):
+            if not (name.startswith('checkpoint_') and name.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.checkpoint_path, name), 'r', encoding='utf-8') as f:
+                    checkpoint = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                continue # Checkpoint corrompido: tenta o anterior
+            position = checkpoint.get("log_position", 0)
+            last_id = log[position - 1].get("message_id") if 0 < position <= len(log) else None
+            if position <= len(log) and last_id == checkpoint.get("last_message_id"):
+                return checkpoint
+        return None
+
+    # --- Reconstrução ---
+
+    def rebuild(self, batch_size: int = 500, quiet: bool = True,
+                progress: Callable[[int, int], None] | None = None) -> Dict[str, Any]:
+        """
+        Reconstrói o estado em um diretório temporário.
+
+        Args:
+            batch_size: Quantidade de registros do log aplicados por lote.
+            quiet: Silencia os logs do backend (abaixo de ERROR) durante o replay.
+            progress: Chamado como progress(registros_aplicados, total) após cada lote.
+
+        Returns:
+            Relatório com o diretório reconstruído ('workspace'), registros aplicados, registros/s
+            e quantos registros antigos sem IDs atribuídos foram reaplicados ('legacy_records').
+            O chamador deve remover o 'workspace' ao terminar (verify() e restore() o utilizam).
+        """
+        log = self._read_log()
+        checkpoint = self.latest_checkpoint(log)
+        start_position = checkpoint["log_position"] if checkpoint else 0
+
+        workspace = tempfile.mkdtemp(prefix="placebo_replay_")
+        for folder in ('backend', 'inbox_handler', 'outbox_handler'):
+            os.makedirs(os.path.join(workspace, folder))
+        scratch_db = PersistenceService(workspace)
+        if checkpoint:
+            for name, content in checkpoint["files"].items():
+                scratch_db._write_db(name, content)
+
+        records = log[start_position:]
+        legacy_records = sum(1 for record in records if self._is_legacy_record(record))
+        root_logger = logging.getLogger(ROOT_LOGGER)
+        previous_level = root_logger.level
+        if quiet:
+            root_logger.setLevel(logging.ERROR)
+        started = time.perf_counter()
+        try:
+            backend = LocalBackend(workspace)
+            for offset in range(0, len(records), batch_size):
+                batch = records[offset:offset + batch_size]
+                backend.db.begin_batch()
+                try:
+                    backend._apply_batch(batch) # Respostas para o inbox são descartadas
+                finally:
+                    backend.db.end_batch()
+                if progress:
+                    progress(offset + len(batch), len(records))
+        finally:
+            root_logger.setLevel(previous_level)
+        elapsed = time.perf_counter() - started
+
+        return {
+            "workspace": workspace,
+            "checkpoint_position": start_position,
+            "records_applied": len(records),
+            "legacy_records": legacy_records,
+            "elapsed_s": elapsed,
+            "records_per_second": len(records) / elapsed if elapsed else 0.0
+        }
+
+    @staticmethod
+    def _is_legacy_record(record: Dict[str, Any]) -> bool:
+        """Indica se o registro cria uma conta sem os IDs atribuídos, que o replay não consegue reproduzir."""
+        return (record.get("object"), record.get("action")) == ("account", "create_account") \
+            and not record.get("assigned_ids")
+
+    def verify(self, report: Dict[str, Any]) -> Dict[str, str]:
+        """
+        Compara os arquivos reconstruídos com os atuais: 'ok', 'divergente', 'corrompido',
+        'ausente' ou 'não reproduzível' (diferente, mas o replay reaplicou registros antigos).
+        """
+        mismatch = "não reproduzível" if report.get("legacy_records") else "divergente"
+        scratch_db = PersistenceService(report["workspace"])
+        results = {}
+        for name in STATE_FILES:
+            live_path = self.db._get_filepath(name)
+            rebuilt = scratch_db._read_db(name)
+            if not os.path.exists(live_path):
+                results[name] = "ok" if not rebuilt else "ausente"
+                continue
+            try:
+                with open(live_path, 'r', encoding='utf-8') as f:
+                    live = json.load(f)
+            except json.JSONDecodeError:
+                results[name] = "corrompido"
+                continue
+            results[name] = "ok" if live == rebuilt else mismatch
+        return results
+
+    def restore(self, report: Dict[str, Any], filenames: List[str]):
+        """Substitui os arquivos atuais indicados pelas versões reconstruídas."""
+        scratch_db = PersistenceService(report["workspace"])
+        for name in filenames:
+            if name not in STATE_FILES:
+                raise ValueError(f"Arquivo de estado desconhecido: {name}")
+            self.db._write_db(name, scratch_db._read_db(name))
+            print(f"[Replay] {name} restaurado a partir do log.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Checkpoints e reconstrução do estado a partir do log de transações.")
+    parser.add_argument("command", choices=("checkpoint", "verify", "rebuild"))
+    parser.add_argument("--restore", nargs="*", default=None,
+                        help="Arquivos a restaurar (rebuild). Sem nomes, restaura os divergentes, corrompidos ou ausentes.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--base-path", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    args = parser.parse_args()
+
+    engine = ReplayEngine(args.base_path)
+    if args.command == "checkpoint":
+        engine.create_checkpoint()
+        return
+
+    report = engine.rebuild(batch_size=args.batch_size)
+    try:
+        print(f"[Replay] {report['records_applied']} registros aplicados a partir da posição "
+              f"{report['checkpoint_position']} em {report['elapsed_s']:.2f}s "
+              f"({report['records_per_second']:.0f} registros/s).")
+        if report['legacy_records']:
+            print(f"[Replay] {report['legacy_records']} contas criadas sem IDs registrados no log; "
+                  f"crie um checkpoint para que o replay parta depois delas.")
+        results = engine.verify(report)
+        for name, status in results.items():
+            print(f"[Replay] {name}: {status}")
+        if args.command == "rebuild" and args.restore is not None:
+            to_restore = args.restore or [name for name, status in results.items()
+                                          if status in ("divergente", "corrompido", "ausente")]
+            engine.restore(report, to_restore)
+    finally:
+        shutil.rmtree(report["workspace"], ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Versões das coleções sincronizadas por patches ('sync/patch').
+
+Cada coleção de dados de um paciente (medicações, eventos, diagnósticos,
+evolução e métricas rastreadas) tem um contador próprio, incrementado a cada
+patch emitido pelo backend. O cliente guarda a versão que já aplicou e, se
+receber um patch que não é o seguinte ao seu, sabe que perdeu alterações,
+descarta aquela coleção do cache e pede um novo snapshot.
+
+O formato das coleções e das alterações fica em 'auxiliary_classes/sync_protocol.py',
+compartilhado com o cliente, e é reexportado aqui.
+"""
+import threading
+from typing import Dict
+
+from backend.database_manager import PersistenceService
+from auxiliary_classes.sync_protocol import SYNC_COLLECTIONS, collection_key, to_records, upsert_change, delete_change
+
+
+def version_name(collection: str, key: str) -> str:
+    """Nome da versão de uma coleção de um paciente em 'sync_versions.json'."""
+    return f"{collection}/{key}"
+
+
+class SyncVersions:
+    """Contadores de versão por (coleção, paciente), persistidos em 'backend/sync_versions.json'."""
+
+    def __init__(self, db: PersistenceService, path: str):
+        """
+        Args:
+            db: PersistenceService do backend.
+            path: Caminho do arquivo de versões.
+        """
+        self.db = db
+        self.path = path
+        versions = self.db._read_db(path)
+        self._versions: Dict[str, int] = versions if isinstance(versions, dict) else {}
+        self._lock = threading.Lock()
+        self._dirty = False
+
+    def current(self, collection: str, key: str) -> int:
+        return self._versions.get(version_name(collection, key), 0)
+
+    def bump(self, collection: str, key: str) -> int:
+        """Incrementa e retorna a versão da coleção de um paciente."""
+        with self._lock:
+            name = version_name(collection, key)
+            self._versions[name] = self._versions.get(name, 0) + 1
+            self._dirty = True
+            return self._versions[name]
+
+    def savepoint(self) -> tuple:
+        """Retorna uma cópia das versões, para desfazer os incrementos com rollback()."""
+        with self._lock:
+            return dict(self._versions), self._dirty
+
+    def rollback(self, savepoint: tuple):
+        with self._lock:
+            versions, self._dirty = savepoint
+            self._versions = dict(versions)
+
+    def save(self):
+        if self._dirty:
+            self.db._write_db(self.path, dict(self._versions))
+            self._dirty = False
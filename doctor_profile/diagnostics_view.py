@@ -1,18 +1,16 @@
 from kivy.uix.relativelayout import RelativeLayout
 from kivy.lang import Builder
-from kivy.properties import StringProperty, ListProperty
+from kivy.properties import StringProperty, ListProperty, ObjectProperty
 from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.label import Label
 from kivy.app import App
 from kivy.uix.button import Button
 from kivy.clock import Clock
 from kivy.metrics import dp
-import json
-import os
 from datetime import datetime, timezone
 from outbox_handler.outbox_processor import OutboxProcessor
 from functools import partial
-import uuid
+from auxiliary_classes.id_generator import new_id
+from auxiliary_classes.recycle_list import message_row, DETAIL_BLOCK_HEIGHT
 
 # Loads the associated kv file
 Builder.load_file("doctor_profile/diagnostics_view.kv", encoding='utf-8')
@@ -26,6 +24,7 @@ class DiagnosticsView(RelativeLayout):
     cid10_list = ListProperty([])
     current_patient_user = StringProperty("")
     editing_diagnostic_id = StringProperty(None, allownone=True)
+    _rendered_version = None # Store version of the list on screen (see load_diagnostics)
 
     def on_kv_post(self, base_widget):
         """Load data when the screen is displayed."""
@@ -38,106 +37,52 @@ class DiagnosticsView(RelativeLayout):
             self.load_diagnostics()
         else:
             # Clear content if no patient is selected
-            self.ids.diagnostics_list.clear_widgets()
+            self.ids.diagnostics_list.data = []
+            self._rendered_version = None
 
     def load_cid10_data(self):
-        """Loads the CID-10 codes and names from a JSON file."""
-        cid10_path = self._get_main_dir_path('cid10.json')
-        """Loads the CID-10 codes and names from a JSON file."""
-        if os.path.exists(cid10_path):
-            try:
-                with open(cid10_path, 'r', encoding='utf-8') as f:
-                    self.cid10_list = json.load(f)
-                print("Loaded CID-10 list.")
-            except (json.JSONDecodeError, FileNotFoundError):
-                App.get_running_app().show_error_popup("Erro ao carregar dados de diagnóstico.")
+        """Loads the CID-10 codes and names (parsed once by the client store)."""
+        self.cid10_list = App.get_running_app().store.reference_data('cid10.json')
+        if not self.cid10_list:
+            App.get_running_app().show_error_popup("Erro ao carregar dados de diagnóstico.")
 
     def load_diagnostics(self):
-        """Loads diagnostics for the current patient."""
-        diagnostics_path = self._get_main_dir_path('patient_diagnostics.json')
-        self.diagnostics = []
-        if not self.current_patient_user or not os.path.exists(diagnostics_path):
-            self.populate_diagnostics_list()
-            return
-
-        try:
-            with open(diagnostics_path, 'r', encoding='utf-8') as f:
-                all_diagnostics = json.load(f)
-            
-            patient_diagnostics = all_diagnostics.get(self.current_patient_user, [])
-            # Sort by 'date_added' if it exists, otherwise no specific order
-            self.diagnostics = sorted(patient_diagnostics, key=lambda x: x.get('date_added', ''), reverse=True)
-            print(f"Loaded {len(self.diagnostics)} diagnostics for {self.current_patient_user}")
-            self.populate_diagnostics_list()
-        except (json.JSONDecodeError, FileNotFoundError):
-            App.get_running_app().show_error_popup("Erro ao carregar diagnósticos do paciente.")
-            self.diagnostics = []
-            self.populate_diagnostics_list()
+        """Loads diagnostics for the current patient from the client store."""
+        store = App.get_running_app().store
+        topics = [('diagnostic', self.current_patient_user)]
+        # The store calls this again whenever a sync cycle changes this patient's diagnostics.
+        store.watch(self, topics, self.load_diagnostics)
+        version = store.version(topics)
+        if version == self._rendered_version:
+            return # Nothing changed since the list was last built
+        self._rendered_version = version
+        patient_diagnostics = store.diagnostics(self.current_patient_user)
+        # Sort by 'date_added' if it exists, otherwise no specific order
+        self.diagnostics = sorted(patient_diagnostics, key=lambda x: x.get('date_added', ''), reverse=True)
+        print(f"Loaded {len(self.diagnostics)} diagnostics for {self.current_patient_user}")
+        self.populate_diagnostics_list()
 
     def populate_diagnostics_list(self):
-        """Clears and repopulates the diagnostic list widget."""
-        diagnostics_list_widget = self.ids.diagnostics_list
-        diagnostics_list_widget.clear_widgets()
-
+        """Rebuilds the rows of the diagnostic RecycleView (the <DiagnosticItem> template in the .kv)."""
         if not self.diagnostics:
-            diagnostics_list_widget.add_widget(
-                Label(text='Nenhum diagnóstico cadastrado.', color=(0,0,0,1))
-            )
+            self.ids.diagnostics_list.data = [message_row('Nenhum diagnóstico cadastrado.')]
             return
 
+        rows = []
         for diagnostic in self.diagnostics:
-            item_container = DiagnosticItem() # Agora herda de BoxLayout
-            item_container.orientation = 'vertical' # Para empilhar os widgets
-
-            # Top part with name and buttons
-            top_layout = RelativeLayout(size_hint_y=None, height=dp(65))
-
-            # Name and CID-10 Label
+            # Name and CID-10
             name_text = f"[b]{diagnostic.get('name', 'N/A')}[/b]"
             if diagnostic.get('cid_code'):
                 name_text += f"\n(CID-10: {diagnostic.get('cid_code')})"
-            name_label = Label(
-                text=name_text, markup=True, color=(0,0,0,1),
-                halign='left', valign='middle',
-                size_hint=(0.60, 1), # Ocupa a altura do pai
-                pos_hint={'x': 0.05, 'center_y': 0.5} # Centraliza verticalmente
-            )
-            name_label.bind(width=lambda s, w: s.setter('text_size')(s, (w, None)))
-            top_layout.add_widget(name_label)
-
-            # Create a vertical BoxLayout for the buttons
-            button_layout = BoxLayout(
-                orientation='vertical',
-                size_hint=(0.25, None),
-                height=dp(65), # Height for two buttons + spacing
-                spacing=dp(5),
-                pos_hint={'right': 0.95, 'top': 0.95}
-            )
-
-            remove_button = Button(text='Remover')
-            remove_button.bind(on_press=partial(self.remove_diagnostic, diagnostic.get('id')))
-            button_layout.add_widget(remove_button)
-
-            edit_button = Button(text='Ver/Editar')
-            edit_button.bind(on_press=partial(self.start_editing_diagnostic, diagnostic))
-            button_layout.add_widget(edit_button)
-
-            top_layout.add_widget(button_layout)
-            item_container.add_widget(top_layout)
-
-            # Description Label (only if description exists)
             description = diagnostic.get('description', '')
-            if description:
-                desc_label = Label(
-                    text=f"[b]Descrição:[/b] {description}", markup=True,
-                    color=(0.5, 0.5, 0.5, 1), font_size='11sp',
-                    halign='left', valign='top', size_hint_y=None, padding=(dp(10), dp(5))
-                )
-                desc_label.bind(width=lambda s, w: s.setter('text_size')(s, (w, None)))
-                desc_label.bind(texture_size=lambda s, ts: s.setter('height')(s, ts[1]))
-                item_container.add_widget(desc_label)
-
-            diagnostics_list_widget.add_widget(item_container)
+            rows.append({
+                'owner': self,
+                'diagnostic': diagnostic,
+                'title': name_text,
+                'description': f"[b]Descrição:[/b] {description}" if description else '',
+                'height': DiagnosticItem.row_height(description),
+            })
+        self.ids.diagnostics_list.data = rows
 
     def add_diagnostic(self):
         """Adds a new diagnostic and saves it."""
@@ -150,7 +95,7 @@ class DiagnosticsView(RelativeLayout):
             return
 
         new_diagnostic = {
-            "id": f"diag{int(datetime.now().timestamp())}",
+            "id": new_id("diag"),
             "cid_code": cid_code,
             "name": name,
             "description": description,
@@ -203,10 +148,6 @@ class DiagnosticsView(RelativeLayout):
         
         self.cancel_edit()
         
-    def _get_main_dir_path(self, filename):
-        """Constructs the full path to a file in the main project directory."""
-        return os.path.join(os.path.dirname(os.path.dirname(__file__)), filename)
-
     def cancel_edit(self):
         """Cancels editing and clears fields."""
         self.editing_diagnostic_id = None
@@ -288,6 +229,15 @@ class DiagnosticsView(RelativeLayout):
 
 class DiagnosticItem(BoxLayout):
     """
-    A custom widget representing a single item in the diagnostic list.
+    A row of the diagnostic list. Its layout is defined in the .kv file; the RecycleView
+    reuses the rows while scrolling and sets these properties from each entry of its data.
     """
-    pass
\ No newline at end of file
+    owner = ObjectProperty(None) # The DiagnosticsView that handles the row's buttons
+    diagnostic = ObjectProperty(None, allownone=True)
+    title = StringProperty('')
+    description = StringProperty('')
+
+    @staticmethod
+    def row_height(description):
+        """Height of a row, matching the .kv template (the description collapses when empty)."""
+        return dp(65) + (DETAIL_BLOCK_HEIGHT if description else 0)
\ No newline at end of file
@@ -9,10 +9,10 @@ from datetime import datetime, timedelta, timezone
 from kivy.metrics import dp
 from outbox_handler.outbox_processor import OutboxProcessor
 import uuid
-import json
 import os
 
 from auxiliary_classes.date_checker import get_days_for_month, MONTH_NAME_TO_NUM
+from auxiliary_classes.evolution_import import build_bulk_fill_payloads
 
 # Loads the associated kv file
 Builder.load_file("doctor_profile/doctor_patient_evolution_view.kv", encoding='utf-8')
@@ -202,6 +202,46 @@ class DoctorPatientEvolutionView(RelativeLayout):
         payload = {"patient_id": patient_id, "date": date_str, "metrics": new_data}
         App.get_running_app().outbox_processor.add_to_outbox("evolution", "fill_metric", payload)
 
+    def import_evolution_file(self):
+        """
+        Imports a CSV or NDJSON export from a home-monitoring device. Rows are validated
+        in batches while the file is streamed, and each batch becomes one 'evolution/bulk_fill'
+        message sharing the same import id; the backend replies with one summary of
+        accepted/rejected rows after the last batch.
+        """
+        file_path = os.path.expanduser(self.ids.import_path_input.text.strip())
+        if not self.current_patient_user:
+            App.get_running_app().show_error_popup("Selecione um paciente.")
+            return
+        if not file_path or not os.path.isfile(file_path):
+            App.get_running_app().show_error_popup("Arquivo não encontrado.")
+            return
+        if os.path.splitext(file_path)[1].lower() not in ('.csv', '.ndjson', '.jsonl'):
+            App.get_running_app().show_error_popup("Formato não suportado. Use CSV ou NDJSON.")
+            return
+
+        patient_id = self._get_patient_info().get('id')
+        if not patient_id:
+            App.get_running_app().show_error_popup("Erro interno: ID do paciente não encontrado.")
+            return
+
+        try:
+            payloads = build_bulk_fill_payloads(patient_id, file_path)
+        except (OSError, UnicodeDecodeError):
+            App.get_running_app().show_error_popup("Não foi possível ler o arquivo.")
+            return
+
+        accepted = sum(len(payload['readings']) for payload in payloads)
+        if not accepted:
+            rejected = sum(payload['rejected_count'] for payload in payloads)
+            App.get_running_app().show_error_popup(f"Nenhuma leitura válida ({rejected} linhas rejeitadas).")
+            return
+
+        for payload in payloads:
+            App.get_running_app().outbox_processor.add_to_outbox("evolution", "bulk_fill", payload)
+        App.get_running_app().show_success_popup(f"Importação de {accepted} leituras enviada.")
+        self.ids.import_path_input.text = ''
+
     def generate_report(self, days):
         """
         Gathers data for the last N days and navigates to the report screen.
@@ -259,30 +299,13 @@ class DoctorPatientEvolutionView(RelativeLayout):
         graph_screen.data_points = list(reversed(data_points)) # Show oldest to newest
         App.get_running_app().manager.push('graph_view')
 
-    def _get_main_dir_path(self, filename):
-        """Constructs the full path to a file in the main project directory."""
-        return os.path.join(os.path.dirname(os.path.dirname(__file__)), filename)
-
     def _get_patient_info(self):
-        """Helper to get the full info dict for the current patient."""
-        accounts_path = self._get_main_dir_path('account.json')
-        if not self.current_patient_user or not os.path.exists(accounts_path):
-            return {}
-        with open(accounts_path, 'r', encoding='utf-8') as f:
-            accounts = json.load(f)
-        return next((acc for acc in accounts if acc.get('user') == self.current_patient_user), {})
+        """Helper to get the full account dict for the current patient."""
+        return App.get_running_app().store.account(self.current_patient_user)
 
     def _get_evolution_data_for_date(self, patient_id, date_str):
         """Helper to get saved evolution data for a specific patient and date."""
-        evolution_path = self._get_main_dir_path('patient_evolution.json')
-        if not patient_id or not os.path.exists(evolution_path):
-            return {}
-        with open(evolution_path, 'r', encoding='utf-8') as f:
-            try:
-                all_evolutions = json.load(f)
-                return all_evolutions.get(patient_id, {}).get(date_str, {})
-            except json.JSONDecodeError:
-                return {}
+        return App.get_running_app().store.evolution(patient_id, date_str)
 
     def enforce_text_limit(self, text_input, max_length):
         """Enforces a maximum character limit on a TextInput."""
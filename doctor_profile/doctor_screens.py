@@ -1,8 +1,7 @@
 from kivy.uix.screenmanager import Screen
 from kivy.lang import Builder
+from kivy.app import App
 from kivy.properties import ListProperty, StringProperty, DictProperty
-import json
-import os
 from datetime import datetime
 from doctor_profile import medication_view
 from doctor_profile import events_view
@@ -32,30 +31,16 @@ class DoctorHomeScreen(Screen):
         self.load_and_set_date()
         self.load_linked_patients()
 
-    def _get_main_dir_path(self, filename):
-        """Constructs the full path to a file in the main project directory (e.g., cid10.json)."""
-        return os.path.join(os.path.dirname(os.path.dirname(__file__)), filename) # Isso é para arquivos como cid10.json
-
     def load_linked_patients(self):
         """Loads the doctor's linked patients to populate the spinner."""
         doctor_user = ""
         # Get logged-in doctor's user from session
-        session_path = self._get_main_dir_path('session.json')
-        if os.path.exists(session_path):
-            with open(session_path, 'r') as f:
-                session_data = json.load(f)
-                if session_data.get('profile_type') == 'doctor':
-                    doctor_user = session_data.get('user')
-
-        accounts_path = self._get_main_dir_path('account.json')
-        if not doctor_user or not os.path.exists(accounts_path):
-            self.patient_list = ["Nenhum paciente vinculado"]
-            return
-
-        with open(accounts_path, 'r', encoding='utf-8') as f:
-            accounts = json.load(f)
+        session = App.get_running_app().session
+        if session.profile_type == 'doctor':
+            doctor_user = session.user
 
-        doctor_account = next((acc for acc in accounts if acc['user'] == doctor_user), None)
+        store = App.get_running_app().store
+        doctor_account = store.account(doctor_user)
         if not doctor_account:
             self.patient_list = ["Nenhum paciente vinculado"]
             return
@@ -68,7 +53,7 @@ class DoctorHomeScreen(Screen):
 
         # Add the "self" patient profile first if it exists
         if self_patient_id and self_patient_id in linked_patient_ids:
-            self_patient_account = next((acc for acc in accounts if acc.get('id') == self_patient_id), None)
+            self_patient_account = store.account_by_id(self_patient_id)
             if self_patient_account:
                 patient_names.append("__Eu__")
                 self.patient_map["__Eu__"] = self_patient_account.get('user')
@@ -77,7 +62,7 @@ class DoctorHomeScreen(Screen):
             # Skip the self patient, as it's already added
             if patient_id == self_patient_id:
                 continue
-            patient_account = next((acc for acc in accounts if acc.get('id') == patient_id), None)
+            patient_account = store.account_by_id(patient_id)
             if patient_account:
                 user = patient_account.get('user')
                 name = patient_account.get('name', user)
@@ -28,30 +28,22 @@ class DoctorSettingsView(RelativeLayout):
 
     def change_password(self):
         """Navigates to the change password screen."""
-        session_path = self._get_main_dir_path('session.json')
-        if os.path.exists(session_path):
-            with open(session_path, 'r', encoding='utf-8') as f:
-                session_data = json.load(f)
-            user_name = session_data.get('user')
-            if user_name:
-                change_password_screen = App.get_running_app().manager.get_screen('change_password')
-                change_password_screen.ids.change_password_view_content.current_user_name = user_name
-                App.get_running_app().manager.push('change_password')
-            else:
-                print("Erro: Usuário não encontrado na sessão.")
-                # TODO: Show popup
+        user_name = App.get_running_app().session.user
+        if user_name:
+            change_password_screen = App.get_running_app().manager.get_screen('change_password')
+            change_password_screen.ids.change_password_view_content.current_user_name = user_name
+            App.get_running_app().manager.push('change_password')
+        else:
+            print("Erro: Usuário não encontrado na sessão.")
+            # TODO: Show popup
 
     def delete_account(self):
         """
         Deletes all data associated with the current doctor's account.
         This is a destructive and irreversible action.
         """
-        session_path = self._get_main_dir_path('session.json')
-        # Get current doctor's user and ID from session
-        if not os.path.exists(session_path): return
-        with open(session_path, 'r', encoding='utf-8') as f:
-            session_data = json.load(f)
-        doctor_user = session_data.get('user')
+        # Get current doctor's user from the session
+        doctor_user = App.get_running_app().session.user
         if not doctor_user: return
 
         # Adiciona mensagem ao outbox_messages.json ANTES de deletar os dados
@@ -1,20 +1,16 @@
 from kivy.uix.relativelayout import RelativeLayout
 from kivy.lang import Builder
-from kivy.properties import ListProperty, StringProperty
+from kivy.properties import ListProperty, StringProperty, ObjectProperty
 from kivy.graphics import Color, Rectangle
-from kivy.uix.label import Label
 from kivy.uix.boxlayout import BoxLayout
 from kivy.app import App
-import json
 from kivy.clock import Clock, mainthread
 from outbox_handler.outbox_processor import OutboxProcessor
-import os
 from datetime import datetime
-from functools import partial
-from kivy.uix.button import Button
-import uuid
 from kivy.metrics import dp
 from auxiliary_classes.date_checker import get_days_for_month, MONTH_NAME_TO_NUM
+from auxiliary_classes.id_generator import new_id
+from auxiliary_classes.recycle_list import message_row, DETAIL_LINE_HEIGHT, DETAIL_BLOCK_HEIGHT
 
 # Loads the associated kv file
 Builder.load_file("doctor_profile/events_view.kv", encoding='utf-8')
@@ -31,6 +27,7 @@ class EventsView(RelativeLayout):
     # This is dynamically set by DoctorHomeScreen
     current_patient_user = StringProperty("")
     editing_event_id = StringProperty(None, allownone=True)
+    _rendered_version = None # Store version of the list on screen (see load_events)
 
     def on_kv_post(self, base_widget):
         """Load data when the screen is displayed."""
@@ -44,68 +41,46 @@ class EventsView(RelativeLayout):
             self.load_events()
         else:
             # Limpa o conteúdo se nenhum paciente estiver selecionado
-            self.ids.events_list.clear_widgets()
+            self.ids.events_list.data = []
+            self._rendered_version = None
 
     def load_events(self):
-        events_path = self._get_main_dir_path('patient_events.json')
-        """Loads event list for the selected patient from the JSON file."""
-        self.events = []
-        if not self.current_patient_user or not os.path.exists(events_path):
-            self.populate_events_list()
-            return
+        """Loads event list for the selected patient from the client store."""
+        store = App.get_running_app().store
+        topics = [('event', self.current_patient_user)]
+        # The store calls this again whenever a sync cycle changes this patient's events.
+        store.watch(self, topics, self.load_events)
+        # The past/future split depends on the clock, so the list is also rebuilt when the minute changes.
+        version = (store.version(topics), datetime.now().strftime('%Y-%m-%d %H:%M'))
+        if version == self._rendered_version:
+            return # Nothing changed since the list was last built
+        self._rendered_version = version
+        patient_events = store.events(self.current_patient_user)
+
+        # Separate past and future events
+        now = datetime.now()
+        future_events = []
+        past_events = []
+        for event in patient_events:
+            try:
+                event_datetime = datetime.strptime(f"{event.get('date')} {event.get('time')}", '%Y-%m-%d %H:%M')
+                (future_events if event_datetime > now else past_events).append(event)
+            except (ValueError, TypeError):
+                past_events.append(event) # Treat events with bad dates as past
 
-        try:
-            with open(events_path, 'r', encoding='utf-8') as f:
-                all_events = json.load(f)
-            
-            patient_events = all_events.get(self.current_patient_user, [])
-            
-            # Separate past and future events
-            now = datetime.now()
-            future_events = []
-            past_events = []
-            for event in patient_events:
-                try:
-                    event_datetime = datetime.strptime(f"{event.get('date')} {event.get('time')}", '%Y-%m-%d %H:%M')
-                    (future_events if event_datetime > now else past_events).append(event)
-                except (ValueError, TypeError):
-                    past_events.append(event) # Treat events with bad dates as past
-            
-            self.events = sorted(future_events, key=lambda x: (x['date'], x['time'])) + sorted(past_events, key=lambda x: (x['date'], x['time']), reverse=True)
-            print(f"Loaded {len(self.events)} events for {self.current_patient_user}")
-            self.populate_events_list()
-        except (json.JSONDecodeError, FileNotFoundError):
-            print("Error loading patient_events.json")
-            self.events = []
-            self.populate_events_list()
+        self.events = sorted(future_events, key=lambda x: (x['date'], x['time'])) + sorted(past_events, key=lambda x: (x['date'], x['time']), reverse=True)
+        print(f"Loaded {len(self.events)} events for {self.current_patient_user}")
+        self.populate_events_list()
 
     def populate_events_list(self):
-        """Clears and repopulates the event list widget."""
-        events_list_widget = self.ids.events_list
-        events_list_widget.clear_widgets()
-
+        """Rebuilds the rows of the event RecycleView (the <EventItem> template in the .kv)."""
         if not self.events:
-            events_list_widget.add_widget(
-                Label(text='Nenhum exame ou consulta cadastrado.', color=(0,0,0,1))
-            )
+            self.ids.events_list.data = [message_row('Nenhum exame ou consulta cadastrado.')]
             return
 
+        now = datetime.now()
+        rows = []
         for event in self.events:
-            item_container = EventItem() # Agora herda de BoxLayout
-            item_container.orientation = 'vertical'
-
-            # --- Determine color based on event time ---
-            is_past_event = False
-            try:
-                event_datetime_for_color = datetime.strptime(f"{event.get('date')} {event.get('time')}", '%Y-%m-%d %H:%M')
-                if event_datetime_for_color < datetime.now():
-                    is_past_event = True
-            except (ValueError, TypeError):
-                is_past_event = True # Treat invalid dates as past
-
-            # Top part with name and buttons
-            top_layout = RelativeLayout(size_hint_y=None, height=dp(65))
-
             # Event Name and Date
             date_str = event.get('date', '')
             time_str = event.get('time', '00:00')
@@ -115,37 +90,8 @@ class EventsView(RelativeLayout):
             except (ValueError, TypeError):
                 formatted_date = date_str # Fallback to original string if format is wrong
                 event_datetime = None
-            
-            name_text = f"[b]{event.get('name', 'N/A')}[/b]\n{formatted_date} às {time_str}"
-            name_label = Label(
-                text=name_text, markup=True, color=(0,0,0,1),
-                halign='left', valign='middle',
-                size_hint=(0.60, 1),
-                pos_hint={'x': 0.05, 'center_y': 0.5}
-            )
-            name_label.bind(width=lambda s, w: s.setter('text_size')(s, (w, None)))
-            top_layout.add_widget(name_label)
-
-            # Create a vertical BoxLayout for the buttons
-            button_layout = BoxLayout(
-                orientation='vertical',
-                size_hint=(0.25, None),
-                height=dp(65), # Height for two buttons + spacing
-                spacing=dp(5),
-                pos_hint={'right': 0.95, 'top': 0.95}
-            )
-            remove_button = Button(text='Remover')
-            remove_button.bind(on_press=partial(self.remove_event, event.get('id')))
-            button_layout.add_widget(remove_button)
-            edit_button = Button(text='Ver/Editar')
-            edit_button.bind(on_press=partial(self.start_editing_event, event))
-            button_layout.add_widget(edit_button)
-            top_layout.add_widget(button_layout)
-
-            item_container.add_widget(top_layout)
 
             # --- Time until event ---
-            now = datetime.now()
             status_text = ""
             status_color = (0, 0, 0, 1) # Default black
             if event_datetime:
@@ -161,29 +107,18 @@ class EventsView(RelativeLayout):
                 else: # Event is in the past
                     status_text = "Evento já ocorreu."
                     status_color = (0.1, 0.1, 0.5, 1) # Blue for past
-            
-            if status_text:
-                status_label = Label(
-                    text=status_text, color=status_color, font_size='11sp',
-                    halign='left', valign='top', size_hint_y=None, padding=(dp(10), dp(5))
-                )
-                status_label.bind(width=lambda s, w: s.setter('text_size')(s, (w, None)))
-                status_label.bind(texture_size=lambda s, ts: s.setter('height')(s, ts[1]))
-                item_container.add_widget(status_label)
-
-            # Description Label (only if description exists)
+
             description = event.get('description', '')
-            if description:
-                desc_label = Label(
-                    text=f"[b]Descrição:[/b] {description}", markup=True,
-                    color=(0.5, 0.5, 0.5, 1), font_size='11sp',
-                    halign='left', valign='top', size_hint_y=None, padding=(dp(10), dp(5))
-                )
-                desc_label.bind(width=lambda s, w: s.setter('text_size')(s, (w, None)))
-                desc_label.bind(texture_size=lambda s, ts: s.setter('height')(s, ts[1]))
-                item_container.add_widget(desc_label)
-
-            events_list_widget.add_widget(item_container)
+            rows.append({
+                'owner': self,
+                'event': event,
+                'title': f"[b]{event.get('name', 'N/A')}[/b]\n{formatted_date} às {time_str}",
+                'status': status_text,
+                'status_color': status_color,
+                'description': f"[b]Descrição:[/b] {description}" if description else '',
+                'height': EventItem.row_height(status_text, description),
+            })
+        self.ids.events_list.data = rows
 
     def fill_today_date(self):
         """Fills the date selectors with today's date."""
@@ -225,7 +160,7 @@ class EventsView(RelativeLayout):
         time = f"{hour}:{minute}"
 
         new_event = {
-            "id": f"evt{int(datetime.now().timestamp())}",
+            "id": new_id("evt"),
             "name": name,
             "description": description,
             "date": date,
@@ -334,13 +269,19 @@ class EventsView(RelativeLayout):
         """Enforces a maximum character limit on a TextInput."""
         if len(text_input.text) > max_length:
             text_input.text = text_input.text[:max_length]
-
-    def _get_main_dir_path(self, filename):
-        """Constructs the full path to a file in the main project directory."""
-        return os.path.join(os.path.dirname(os.path.dirname(__file__)), filename)
-
 class EventItem(BoxLayout):
     """
-    A custom widget representing a single item in the event list.
+    A row of the event list. Its layout is defined in the .kv file; the RecycleView
+    reuses the rows while scrolling and sets these properties from each entry of its data.
     """
-    pass
+    owner = ObjectProperty(None) # The EventsView that handles the row's buttons
+    event = ObjectProperty(None, allownone=True)
+    title = StringProperty('')
+    status = StringProperty('')
+    status_color = ListProperty([0, 0, 0, 1])
+    description = StringProperty('')
+
+    @staticmethod
+    def row_height(status, description):
+        """Height of a row, matching the .kv template (the optional lines collapse when empty)."""
+        return dp(65) + (DETAIL_LINE_HEIGHT if status else 0) + (DETAIL_BLOCK_HEIGHT if description else 0)
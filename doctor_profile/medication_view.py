@@ -2,18 +2,16 @@ from kivy.uix.relativelayout import RelativeLayout
 from kivy.lang import Builder
 from kivy.graphics import Color, Rectangle
 from kivy.uix.boxlayout import BoxLayout
-from kivy.properties import ListProperty, StringProperty
-from kivy.uix.label import Label
+from kivy.properties import ListProperty, StringProperty, ObjectProperty
 from kivy.app import App
 from kivy.uix.button import Button
 from outbox_handler.outbox_processor import OutboxProcessor
 from kivy.clock import Clock
-import json
-import os
 from datetime import datetime
-import uuid
 from functools import partial
 from kivy.metrics import dp
+from auxiliary_classes.id_generator import new_id
+from auxiliary_classes.recycle_list import message_row, DETAIL_LINE_HEIGHT, DETAIL_BLOCK_HEIGHT
 
 # Loads the associated kv file
 Builder.load_file("doctor_profile/medication_view.kv", encoding='utf-8')
@@ -30,6 +28,7 @@ class MedicationsView(RelativeLayout):
     # This is dynamically set by DoctorHomeScreen
     current_patient_user = StringProperty("")
     editing_med_id = StringProperty(None, allownone=True)
+    _rendered_version = None # Store version of the list on screen (see load_medications)
 
     def on_kv_post(self, base_widget):
         """Load data when the screen is displayed."""
@@ -45,129 +44,46 @@ class MedicationsView(RelativeLayout):
             self.load_medications()
         else:
             # Limpa o conteúdo se nenhum paciente estiver selecionado
-            self.ids.medications_list.clear_widgets()
-
-    def _get_main_dir_path(self, filename):
-        """Constructs the full path to a file in the main project directory."""
-        return os.path.join(os.path.dirname(os.path.dirname(__file__)), filename)
+            self.ids.medications_list.data = []
+            self._rendered_version = None
 
     def load_generic_medications(self):
-        """Loads the list of generic medications from a JSON file."""
-        if os.path.exists(self._get_main_dir_path('generic_medications.json')): # Caminho corrigido
-            try:
-                with open('generic_medications.json', 'r', encoding='utf-8') as f:
-                    self.generic_med_list = json.load(f)
-                print("Loaded generic medications list.")
-            except (json.JSONDecodeError, FileNotFoundError):
-                App.get_running_app().show_error_popup("Erro ao carregar lista de medicações.")
-                self.generic_med_list = []
-        else:
-            App.get_running_app().show_error_popup("Arquivo de medicações não encontrado.")
-            self.generic_med_list = []
+        """Loads the list of generic medications (parsed once by the client store)."""
+        self.generic_med_list = App.get_running_app().store.reference_data('generic_medications.json')
+        if not self.generic_med_list:
+            App.get_running_app().show_error_popup("Erro ao carregar lista de medicações.")
 
     def populate_medications_list(self):
-        """Clears and repopulates the medication list widget."""
-        med_list_widget = self.ids.medications_list
-        med_list_widget.clear_widgets()
-
+        """Rebuilds the rows of the medication RecycleView (the <MedicationItem> template in the .kv)."""
         if not self.medications:
-            med_list_widget.add_widget(
-                Label(text='Nenhuma medicação cadastrada.', color=(0,0,0,1))
-            )
+            self.ids.medications_list.data = [message_row('Nenhuma medicação cadastrada.')]
             return
 
-        for med in self.medications:
-            item_container = MedicationItem()
-            item_container.orientation = 'vertical' # Usaremos um BoxLayout para empilhar os widgets
-
-            # --- Determine color based on next dose status ---
-            now = datetime.now()
-            weekday_map = {0: 'Seg', 1: 'Ter', 2: 'Qua', 3: 'Qui', 4: 'Sex', 5: 'Sab', 6: 'Dom'}
-            today_weekday_str = weekday_map[now.weekday()]
-            days = ', '.join(med.get('days_of_week', []))
-            is_for_today = "Todos os dias" in days or today_weekday_str in days
-            
-            color_status = 'neutral' # neutral, upcoming, taken
-            if is_for_today:
-                dose_times_today = sorted([datetime.strptime(t, '%H:%M').time() for t in med.get('times_of_day', [])])
-                has_upcoming_dose = any(now.replace(hour=t.hour, minute=t.minute) > now for t in dose_times_today)
-                if has_upcoming_dose:
-                    color_status = 'upcoming'
-                else:
-                    color_status = 'taken'
-
-            # Top part with name and buttons
-            top_layout = RelativeLayout(size_hint_y=None, height=dp(65))
-
-            name_label = Label(
-                text=f"[b]{med.get('generic_name', 'N/A')}[/b] {med.get('dosage', '')}",
-                markup=True,
-                color=(0,0,0,1),
-                halign='left',
-                valign='middle',
-                size_hint=(0.60, 1), # Ocupa a altura do pai
-                pos_hint={'x': 0.05, 'center_y': 0.5} # Centraliza verticalmente
-            )
-            # Garante que o texto quebre a linha se for muito longo
-            name_label.bind(width=lambda s, w: s.setter('text_size')(s, (w, None)))
-            top_layout.add_widget(name_label)
-
-            # Button Layout
-            button_layout = BoxLayout(
-                orientation='vertical',
-                size_hint=(0.25, None),
-                height=dp(65),
-                spacing=dp(5),
-                pos_hint={'right': 0.95, 'top': 0.95}
-            )
-            remove_button = Button(text='Remover')
-            remove_button.bind(on_press=partial(self.remove_medication, med.get('id')))
-            button_layout.add_widget(remove_button)
-
-            edit_button = Button(text='Ver/Editar')
-            edit_button.bind(on_press=partial(self.start_editing_medication, med))
-            button_layout.add_widget(edit_button)
-            top_layout.add_widget(button_layout)
+        now = datetime.now()
+        weekday_map = {0: 'Seg', 1: 'Ter', 2: 'Qua', 3: 'Qui', 4: 'Sex', 5: 'Sab', 6: 'Dom'}
+        today_weekday_str = weekday_map[now.weekday()]
 
-            item_container.add_widget(top_layout)
-
-            # Schedule details
+        rows = []
+        for med in self.medications:
             quantity = med.get('quantity', '')
             presentation = med.get('presentation', '')
             times = ', '.join(med.get('times_of_day', []))
             days = ', '.join(med.get('days_of_week', []))
             observation = med.get('observation', '')
-            
-            # Schedule Label
-            schedule_text = f"Tomar {quantity} {presentation.lower()}(s) às {times} ({days})"
-            schedule_label = Label(
-                text=schedule_text,
-                color=(0.3, 0.3, 0.3, 1),
-                halign='left', valign='top', font_size='12sp',
-                size_hint_y=None, padding=(dp(10), dp(5))
-            )
-            schedule_label.bind(width=lambda s, w: s.setter('text_size')(s, (w, None)))
-            schedule_label.bind(texture_size=lambda s, ts: s.setter('height')(s, ts[1]))
-            item_container.add_widget(schedule_label)
 
             # --- Time until next dose ---
-            now = datetime.now()
-            weekday_map = {0: 'Seg', 1: 'Ter', 2: 'Qua', 3: 'Qui', 4: 'Sex', 5: 'Sab', 6: 'Dom'}
-            today_weekday_str = weekday_map[now.weekday()]
-            
-            is_for_today = "Todos os dias" in days or today_weekday_str in days
-            
             next_dose_status = ""
-            if is_for_today:
+            status_color = (0, 0, 0, 1)
+            if "Todos os dias" in days or today_weekday_str in days:
                 dose_times_today = sorted([datetime.strptime(t, '%H:%M').time() for t in med.get('times_of_day', [])])
-                
+
                 next_dose_time = None
                 for dose_time in dose_times_today:
                     dose_datetime = now.replace(hour=dose_time.hour, minute=dose_time.minute, second=0, microsecond=0)
                     if dose_datetime > now:
                         next_dose_time = dose_datetime
                         break
-                
+
                 if next_dose_time:
                     delta = next_dose_time - now
                     hours, remainder = divmod(delta.seconds, 3600)
@@ -178,48 +94,31 @@ class MedicationsView(RelativeLayout):
                     next_dose_status = "Doses de hoje já foram tomadas."
                     status_color = (0.1, 0.1, 0.5, 1) # Blue for taken
 
-            if next_dose_status:
-                status_label = Label(
-                    text=next_dose_status, color=status_color, font_size='11sp',
-                    halign='left', valign='top', size_hint_y=None, padding=(dp(10), dp(5))
-                )
-                status_label.bind(width=lambda s, w: s.setter('text_size')(s, (w, None)))
-                status_label.bind(texture_size=lambda s, ts: s.setter('height')(s, ts[1]))
-                item_container.add_widget(status_label)
-
-            # Observation Label (only if observation exists)
-            if observation:
-                obs_label = Label(
-                    text=f"[b]Obs:[/b] {observation}", markup=True,
-                    color=(0.5, 0.5, 0.5, 1), font_size='11sp',
-                    halign='left', valign='top', size_hint_y=None, padding=(dp(10), dp(5))
-                )
-                obs_label.bind(width=lambda s, w: s.setter('text_size')(s, (w, None)))
-                obs_label.bind(texture_size=lambda s, ts: s.setter('height')(s, ts[1]))
-                item_container.add_widget(obs_label)
-
-            med_list_widget.add_widget(item_container)
+            rows.append({
+                'owner': self,
+                'med': med,
+                'title': f"[b]{med.get('generic_name', 'N/A')}[/b] {med.get('dosage', '')}",
+                'schedule': f"Tomar {quantity} {presentation.lower()}(s) às {times} ({days})",
+                'status': next_dose_status,
+                'status_color': status_color,
+                'observation': f"[b]Obs:[/b] {observation}" if observation else '',
+                'height': MedicationItem.row_height(next_dose_status, observation),
+            })
+        self.ids.medications_list.data = rows
 
     def load_medications(self):
-        """Loads medication list for the selected patient from the JSON file."""
-        self.medications = []
-        medications_path = self._get_main_dir_path('patient_medications.json')
-        if not self.current_patient_user or not os.path.exists(medications_path):
-            self.populate_medications_list()
-            return
-
-        try:
-            with open(medications_path, 'r', encoding='utf-8') as f:
-                all_meds = json.load(f)
-            
-            patient_meds = all_meds.get(self.current_patient_user, [])
-            self.medications = patient_meds
-            print(f"Loaded {len(self.medications)} medications for {self.current_patient_user}")
-            self.populate_medications_list() # Populate the list after loading
-        except (json.JSONDecodeError, FileNotFoundError):
-            App.get_running_app().show_error_popup("Erro ao carregar medicações do paciente.")
-            self.medications = []
-            self.populate_medications_list() # Show empty message on error
+        """Loads medication list for the selected patient from the client store."""
+        store = App.get_running_app().store
+        topics = [('medication', self.current_patient_user)]
+        # The store calls this again whenever a sync cycle changes this patient's medications.
+        store.watch(self, topics, self.load_medications)
+        version = store.version(topics)
+        if version == self._rendered_version:
+            return # Nothing changed since the list was last built
+        self._rendered_version = version
+        self.medications = store.medications(self.current_patient_user)
+        print(f"Loaded {len(self.medications)} medications for {self.current_patient_user}")
+        self.populate_medications_list()
 
     def remove_medication(self, med_id, *args):
         """Removes a medication from the list and updates the JSON file."""
@@ -274,7 +173,7 @@ class MedicationsView(RelativeLayout):
 
 
         new_med = {
-            "id": f"med{int(datetime.now().timestamp())}",
+            "id": new_id("med"),
             "generic_name": generic_name,
             "presentation": presentation if presentation != 'Apresentação' else 'Comprimido',
             "dosage": dosage,
@@ -498,7 +397,18 @@ class MedicationsView(RelativeLayout):
 
 class MedicationItem(BoxLayout):
     """
-    A custom widget representing a single item in the medication list.
-    Its visual representation is defined in the .kv file.
+    A row of the medication list. Its layout is defined in the .kv file; the RecycleView
+    reuses the rows while scrolling and sets these properties from each entry of its data.
     """
-    pass
\ No newline at end of file
+    owner = ObjectProperty(None) # The MedicationsView that handles the row's buttons
+    med = ObjectProperty(None, allownone=True)
+    title = StringProperty('')
+    schedule = StringProperty('')
+    status = StringProperty('')
+    status_color = ListProperty([0, 0, 0, 1])
+    observation = StringProperty('')
+
+    @staticmethod
+    def row_height(status, observation):
+        """Height of a row, matching the .kv template (the optional lines collapse when empty)."""
+        return dp(65) + DETAIL_BLOCK_HEIGHT + (DETAIL_LINE_HEIGHT if status else 0) + (DETAIL_BLOCK_HEIGHT if observation else 0)
\ No newline at end of file
@@ -6,10 +6,8 @@ from kivy.uix.checkbox import CheckBox, CheckBox
 from outbox_handler.outbox_processor import OutboxProcessor
 from kivy.uix.label import Label
 from kivy.app import App
-import json
 from datetime import datetime
 import uuid
-import os
 
 # Loads the associated kv file
 Builder.load_file("doctor_profile/patient_settings_view.kv", encoding='utf-8')
@@ -31,9 +29,6 @@ class PatientSettingsView(RelativeLayout):
         'oxygen_saturation': 'Saturação de Oxigênio (%)'
     }
 
-    def _get_main_dir_path(self, filename): # Isso é para arquivos como cid10.json
-        return os.path.join(os.path.dirname(os.path.dirname(__file__)), filename)
-
     def on_current_patient_user(self, instance, value):
         """When the patient changes, load their specific settings."""
         if value:
@@ -87,21 +82,5 @@ class PatientSettingsView(RelativeLayout):
         App.get_running_app().show_success_popup(f"Configurações salvas para {self.current_patient_user}.")
 
     def _get_patient_settings(self):
-        """Helper to safely load settings for the current patient."""
-        accounts_path = self._get_main_dir_path('account.json')
-        if not self.current_patient_user or not os.path.exists(accounts_path):
-            return {}
-        
-        try:
-            with open(accounts_path, 'r', encoding='utf-8') as f:
-                accounts = json.load(f)
-            
-            patient_account = next((acc for acc in accounts if acc.get('user') == self.current_patient_user), None)
-            if patient_account:
-                # Return a combined dict with patient_info and the top-level ID
-                settings = patient_account.get('patient_info', {})
-                settings['id'] = patient_account.get('id')
-                return settings
-            return {}
-        except (json.JSONDecodeError, FileNotFoundError):
-            return {}
\ No newline at end of file
+        """Helper to load settings for the current patient (patient_info plus the account ID)."""
+        return App.get_running_app().store.patient_settings(self.current_patient_user)
\ No newline at end of file
@@ -0,0 +1,126 @@
+from typing import Dict, Any, List, Tuple
+
+from backend.database_manager import PersistenceService
+from auxiliary_classes.sync_protocol import SYNC_COLLECTIONS, collection_key, to_records
+from auxiliary_classes.app_logging import get_logger
+
+logger = get_logger('inbox')
+
+
+class ClientCache:
+    """
+    Cache do cliente com os dados dos pacientes, mantido pelos patches do servidor ('sync/patch').
+
+    Cada entrada é uma coleção de um paciente ({id do registro: registro}) junto com a
+    versão já aplicada. As versões só chegam pelo servidor: as coleções do snapshot
+    entram com a versão dele e, a partir daí, cada patch altera apenas os registros que
+    mudaram. Uma coleção que não veio no snapshot é lida dos arquivos quando uma tela a
+    pede, sem versão; o primeiro patch dela (ou um patch fora de ordem) descarta a
+    coleção e marca 'snapshot_needed', para que o cliente peça um novo snapshot.
+    """
+
+    def __init__(self, db: PersistenceService):
+        """
+        Args:
+            db: PersistenceService usado para a carga inicial das coleções.
+        """
+        self.db = db
+        # (coleção, chave do paciente) -> {"version": int | None, "records": {id: registro}}
+        # A versão é None se a coleção veio dos arquivos, e não de um snapshot.
+        self._entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # Um patch não pôde ser aplicado (versão desconhecida ou lacuna); fica True até o próximo snapshot.
+        self.snapshot_needed = False
+        # Roster, resumos por paciente e versão dos dados de referência do último snapshot de login.
+        self.snapshot_info: Dict[str, Any] = {}
+
+    def records(self, collection: str, key: str) -> Dict[str, Any]:
+        """Retorna os registros de uma coleção de um paciente ({id: registro}), carregando-os se preciso."""
+        if not key:
+            return {}
+        entry = self._entries.get((collection, key))
+        if entry is None:
+            entry = self._entries[(collection, key)] = {"version": None, "records": self._load(collection, key)}
+        return entry["records"]
+
+    def get_list(self, collection: str, key: str) -> List[Any]:
+        """Retorna os registros de uma coleção de um paciente como lista, na ordem de inserção."""
+        return list(self.records(collection, key).values())
+
+    def version(self, collection: str, key: str) -> int | None:
+        entry = self._entries.get((collection, key))
+        return entry["version"] if entry else None
+
+    def apply_patch(self, payload: Dict[str, Any]) -> bool:
+        """
+        Aplica um patch do servidor. Retorna True se os dados do cliente mudaram
+        (ou podem ter mudado), False se o patch já tinha sido aplicado.
+        """
+        collection = payload.get("collection")
+        if collection not in SYNC_COLLECTIONS:
+            return False
+        key = collection_key(collection, payload.get("patient_id"), payload.get("patient_user"))
+        entry = self._entries.get((collection, key))
+        if entry is None:
+            return True # Coleção fora do cache: será lida já atualizada quando for pedida
+
+        version = payload.get("version")
+        if entry["version"] is None:
+            # Coleção lida dos arquivos: não há como saber se o patch é o seguinte.
+            logger.info("Versão de %s/%s desconhecida no cache. Coleção descartada; snapshot pedido.", collection, key)
+            del self._entries[(collection, key)]
+            self.snapshot_needed = True
+            return True
+        if version != entry["version"] + 1:
+            if version is not None and version <= entry["version"]:
+                return False # Patch repetido
+            # Lacuna: alguma alteração foi perdida.
+            logger.info("Versão %s de %s/%s fora de ordem (cache na %s). Coleção descartada; snapshot pedido.",
+                        version, collection, key, entry['version'])
+            del self._entries[(collection, key)]
+            self.snapshot_needed = True
+            return True
+
+        records = entry["records"]
+        for change in payload.get("changes", []):
+            if change.get("op") == "upsert":
+                records[change.get("id")] = change.get("record")
+            elif change.get("op") == "delete":
+                records.pop(change.get("id"), None)
+        entry["version"] = version
+        return True
+
+    def load_snapshot(self, payload: Dict[str, Any]):
+        """
+        Substitui o cache pelo snapshot enviado pelo servidor no login. As coleções
+        entram com a versão do snapshot, e os patches seguintes continuam a partir dela.
+        """
+        self._entries.clear()
+        self.snapshot_needed = False
+        for patient in payload.get("patients", []):
+            for collection, content in (patient.get("collections") or {}).items():
+                if collection not in SYNC_COLLECTIONS:
+                    continue
+                key = collection_key(collection, patient.get("id"), patient.get("user"))
+                self._entries[(collection, key)] = {"version": content.get("version"),
+                                                    "records": content.get("records") or {}}
+        self.snapshot_info = {
+            "user": payload.get("user"),
+            "roster": payload.get("roster") or {},
+            "summaries": [{k: patient.get(k) for k in ("id", "user", "name", "summary")}
+                          for patient in payload.get("patients", [])],
+            "reference_data_version": payload.get("reference_data_version") or {}
+        }
+
+    def clear(self):
+        """Descarta todo o cache (ex: no logout)."""
+        self._entries.clear()
+        self.snapshot_info = {}
+        self.snapshot_needed = False
+
+    def _load(self, collection: str, key: str) -> Dict[str, Any]:
+        """Lê a coleção de um paciente do arquivo de origem."""
+        filename, _ = SYNC_COLLECTIONS[collection]
+        if collection == "tracked_metrics":
+            account = next((acc for acc in self.db.get_accounts() if acc.get('id') == key), {})
+            return {"tracked_metrics": (account.get('patient_info') or {}).get('tracked_metrics', [])}
+        return to_records(self.db.get_patient_data(filename).get(key))
@@ -0,0 +1,245 @@
+"""
+Armazenamento de dados do cliente compartilhado por todas as telas.
+
+O ClientStore guarda em memória, já lidos:
+
+- as contas ('account.json'), relidas só quando o arquivo muda;
+- as coleções de cada paciente (medicações, eventos, diagnósticos, evolução), pelo
+  ClientCache, que é mantido pelos patches do servidor;
+- os dados de referência (CID-10, medicamentos genéricos), lidos uma vez;
+- os modelos de leitura do backend, relidos só quando o documento muda.
+
+As telas consultam os dados pelos métodos tipados (ex: medications(), account()) e se
+inscrevem com watch() nos tópicos que exibem. Um tópico é 'accounts', uma coleção de um
+paciente (ex: ('medication', 'joao')) ou um modelo de leitura (ex: ('doctor_roster', 'dra_ana')).
+As alterações de um ciclo de sincronização são acumuladas e publicadas de uma vez por
+publish_changes(): cada inscrito é chamado no máximo uma vez, e cada coleção alterada é
+lida no máximo uma vez, não importa quantas telas a exibem.
+
+Cada tópico tem um contador de versão, incrementado a cada alteração. Uma tela guarda a
+versão dos tópicos que desenhou (version()) e não refaz os widgets se ela não mudou.
+"""
+import json
+import os
+from typing import Callable, Dict, Any, Hashable, Iterable, List, Set, Tuple
+
+from backend.database_manager import PersistenceService
+from backend.read_models import load_read_model, read_model_path
+from auxiliary_classes.sync_protocol import collection_key
+from inbox_handler.client_cache import ClientCache
+from auxiliary_classes.session_service import SessionService
+from auxiliary_classes.app_logging import get_logger
+
+logger = get_logger('store')
+
+ACCOUNTS = 'accounts'
+ALL_TOPICS = '*' # Publicado quando tudo pode ter mudado (snapshot de login, logout)
+
+
+class ClientStore:
+    """Dados do cliente em memória, com consultas tipadas e eventos de alteração por tópico."""
+
+    def __init__(self, base_path: str, db: PersistenceService, session: SessionService):
+        """
+        Args:
+            base_path: O caminho raiz do projeto.
+            db: PersistenceService usado para ler os arquivos de dados.
+            session: Sessão do app (o cache é descartado quando o usuário muda).
+        """
+        self.base_path = base_path
+        self.db = db
+        self.session = session
+        self.cache = ClientCache(db)
+        self.session.subscribe(self._on_session_changed)
+
+        self._accounts: List[Dict[str, Any]] = []
+        self._accounts_by_user: Dict[str, Dict[str, Any]] = {}
+        self._accounts_by_id: Dict[str, Dict[str, Any]] = {}
+        self._accounts_stamp = None # (mtime_ns, tamanho) de 'account.json' na última leitura
+        self._read_models: Dict[Tuple[str, str], Tuple[Any, Dict[str, Any]]] = {} # tópico -> (carimbo, documento)
+        self._reference_data: Dict[str, Any] = {}
+
+        self._watchers: Dict[Hashable, Tuple[Set, Callable[[], None]]] = {} # dono -> (tópicos, callback)
+        self._changed: Set = set()
+        self._versions: Dict[Hashable, int] = {} # tópico -> contador de alterações
+        self._generation = 0 # Incrementada quando tudo pode ter mudado (ALL_TOPICS)
+        self._revision = 0 # Total de alterações, em qualquer tópico
+
+    # --- Contas ---
+
+    @staticmethod
+    def _stamp(path: str):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _refresh_accounts(self) -> bool:
+        """Relê 'account.json' se ele mudou desde a última leitura. Retorna True se releu."""
+        stamp = self._stamp(self.db._get_filepath('account.json'))
+        if stamp is not None and stamp == self._accounts_stamp:
+            return False
+        self._accounts = self.db.get_accounts() if stamp is not None else []
+        self._accounts_by_user = {acc.get('user'): acc for acc in self._accounts}
+        self._accounts_by_id = {acc.get('id'): acc for acc in self._accounts}
+        self._accounts_stamp = stamp
+        self._mark_changed(ACCOUNTS)
+        return True
+
+    def accounts(self) -> List[Dict[str, Any]]:
+        """Retorna todas as contas."""
+        self._refresh_accounts()
+        return self._accounts
+
+    def account(self, user: str | None) -> Dict[str, Any]:
+        """Retorna a conta de um usuário ({} se não existir)."""
+        self._refresh_accounts()
+        return self._accounts_by_user.get(user, {}) if user else {}
+
+    def account_by_id(self, account_id: str | None) -> Dict[str, Any]:
+        """Retorna a conta com o ID dado ({} se não existir)."""
+        self._refresh_accounts()
+        return self._accounts_by_id.get(account_id, {}) if account_id else {}
+
+    def self_patient_user(self, doctor_user: str | None) -> str | None:
+        """Retorna o usuário do perfil de paciente de um médico, se ele tiver um."""
+        self_patient_id = self.account(doctor_user).get('self_patient_id')
+        return self.account_by_id(self_patient_id).get('user') if self_patient_id else None
+
+    def logged_in_patient_user(self) -> str | None:
+        """O paciente exibido nas telas do paciente: o usuário logado ou o perfil de paciente do médico logado."""
+        if not self.session.logged_in:
+            return None
+        if self.session.profile_type == 'patient':
+            return self.session.user
+        if self.session.profile_type == 'doctor':
+            return self.self_patient_user(self.session.user)
+        return None
+
+    def patient_settings(self, patient_user: str | None) -> Dict[str, Any]:
+        """Retorna o 'patient_info' do paciente junto com o 'id' da conta ({} se não existir)."""
+        account = self.account(patient_user)
+        if not account:
+            return {}
+        return {**account.get('patient_info', {}), 'id': account.get('id')}
+
+    # --- Coleções dos pacientes ---
+
+    def medications(self, patient_user: str | None) -> List[Dict[str, Any]]:
+        return self.cache.get_list('medication', patient_user)
+
+    def events(self, patient_user: str | None) -> List[Dict[str, Any]]:
+        return self.cache.get_list('event', patient_user)
+
+    def diagnostics(self, patient_user: str | None) -> List[Dict[str, Any]]:
+        return self.cache.get_list('diagnostic', patient_user)
+
+    def evolution(self, patient_id: str | None, date_str: str) -> Dict[str, Any]:
+        """Retorna as métricas registradas para o paciente na data ({} se não houver)."""
+        return self.cache.records('evolution', patient_id).get(date_str, {})
+
+    def evolution_records(self, patient_id: str | None) -> Dict[str, Any]:
+        """Retorna todas as datas registradas para o paciente ({data: métricas})."""
+        return self.cache.records('evolution', patient_id)
+
+    # --- Dados de referência e modelos de leitura ---
+
+    def reference_data(self, filename: str, default=None):
+        """Retorna um arquivo de referência da raiz do projeto (ex: 'cid10.json'), lido uma única vez."""
+        if filename not in self._reference_data:
+            try:
+                with open(os.path.join(self.base_path, filename), 'r', encoding='utf-8') as f:
+                    self._reference_data[filename] = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                logger.warning("Não foi possível ler o arquivo de referência %s.", filename)
+                return [] if default is None else default
+        return self._reference_data[filename]
+
+    def read_model(self, model: str, key: str | None) -> Dict[str, Any]:
+        """Retorna um documento de modelo de leitura do backend, relido só quando o arquivo muda."""
+        if not key:
+            return {}
+        stamp = self._stamp(read_model_path(self.base_path, model, key))
+        cached = self._read_models.get((model, key))
+        if cached is None or cached[0] != stamp:
+            if cached is not None:
+                self._mark_changed((model, key))
+            cached = self._read_models[(model, key)] = (stamp, load_read_model(self.base_path, model, key))
+        return cached[1]
+
+    # --- Alterações ---
+
+    def _mark_changed(self, topic: Hashable):
+        """Incrementa a versão do tópico e o guarda para a próxima publicação."""
+        if topic == ALL_TOPICS:
+            self._generation += 1
+        else:
+            self._versions[topic] = self._versions.get(topic, 0) + 1
+        self._revision += 1
+        self._changed.add(topic)
+
+    @property
+    def revision(self) -> int:
+        """Contador global de alterações: se não mudou, nenhum dado do store mudou."""
+        return self._revision
+
+    def version(self, topics: Iterable) -> Tuple:
+        """
+        Retorna a versão atual dos tópicos dados. Duas chamadas retornam o mesmo valor se, e
+        somente se, nenhum dos tópicos mudou entre elas (inclui os próprios tópicos, então
+        trocar de paciente também muda a versão).
+        """
+        return (self._generation, tuple((topic, self._versions.get(topic, 0)) for topic in topics))
+
+    def apply_patch(self, payload: Dict[str, Any]) -> bool:
+        """Aplica um patch do servidor no cache e marca a coleção como alterada."""
+        if not self.cache.apply_patch(payload):
+            return False
+        collection = payload.get("collection")
+        self._mark_changed((collection, collection_key(collection, payload.get("patient_id"), payload.get("patient_user"))))
+        return True
+
+    def load_snapshot(self, payload: Dict[str, Any]):
+        """Carrega o snapshot de login; todas as telas inscritas são avisadas."""
+        self.cache.load_snapshot(payload)
+        self._mark_changed(ALL_TOPICS)
+
+    def _on_session_changed(self, session: Dict[str, Any]):
+        """Descarta o cache quando o usuário da sessão deixa de ser o dono dos dados em cache."""
+        if not session.get('logged_in') or session.get('user') != self.cache.snapshot_info.get('user'):
+            self.cache.clear()
+            self._mark_changed(ALL_TOPICS)
+
+    def watch(self, owner: Hashable, topics: Iterable, callback: Callable[[], None]):
+        """
+        Inscreve 'owner' (normalmente uma tela) nos tópicos dados, substituindo a inscrição
+        anterior dele. 'callback' é chamado uma vez por publicação que altere algum dos tópicos.
+        """
+        self._watchers[owner] = (set(topics), callback)
+
+    def unwatch(self, owner: Hashable):
+        self._watchers.pop(owner, None)
+
+    def publish_changes(self) -> Set:
+        """
+        Publica as alterações acumuladas desde a última publicação (chamado ao fim de cada
+        lote do inbox). Confere antes se as contas e os modelos de leitura observados mudaram.
+        Retorna os tópicos alterados.
+        """
+        if self._accounts_stamp is not None:
+            self._refresh_accounts() # Marca ACCOUNTS como alterado se releu o arquivo
+        for topic, (stamp, _) in list(self._read_models.items()):
+            if self._stamp(read_model_path(self.base_path, *topic)) != stamp:
+                del self._read_models[topic] # Relido na próxima consulta
+                self._mark_changed(topic)
+
+        changed, self._changed = self._changed, set()
+        if not changed:
+            return changed
+        for owner, (topics, callback) in list(self._watchers.items()):
+            if ALL_TOPICS in changed or topics & changed:
+                callback()
+        logger.debug("Alterações publicadas: %s", changed)
+        return changed
+
@@ -0,0 +1,438 @@
+"""
+Núcleo da aplicação do inbox, sem dependência do Kivy.
+
+O InboxCore lê o inbox, filtra, decodifica e roteia as mensagens, alterando apenas o
+estado do cliente (sessão, cache, outbox, histórico de mensagens processadas). Tudo o
+que diz respeito à interface é devolvido como "intenções" (dicionários com um 'type'):
+
+- 'popup': {"message", "success"}
+- 'reset_to': {"screen"}
+- 'close_change_password': fecha a tela de alteração de senha
+- 'clear_pending_request': {"request_id"}
+
+Intenções de navegação ficam em 'batch.intents', na ordem em que surgiram. Popups ficam
+em 'batch.deferred', combinados por chave, para o fim do lote. As telas não são recarregadas
+por intenções: o ClientStore publica as alterações do lote para as telas inscritas.
+O InboxProcessor (adaptador Kivy) aplica as intenções na tela; testes de carga e
+replays podem usar process_all() e ignorá-las.
+"""
+import json
+import os
+import time
+from typing import Dict, Any, List, Set
+from inbox_handler.message_decoder import MessageDecoder
+from inbox_handler.client_store import ClientStore
+from inbox_handler.recent_ids import RecentIdHistory
+from backend.database_manager import PersistenceService
+from auxiliary_classes.session_service import SessionService
+from auxiliary_classes.app_logging import get_logger
+
+logger = get_logger('inbox')
+
+
+class InboxBatch:
+    """Estado de um lote do inbox, que pode ser aplicado em várias fatias."""
+
+    def __init__(self, messages: List[Dict[str, Any]], session_user: str | None, pending_request_id: str | None):
+        self.messages = messages
+        self.index = 0
+        self.session_user = session_user
+        self.pending_request_id = pending_request_id
+        self.remaining_messages: List[Dict[str, Any]] = []
+        self.processed_ids: Set[str] = set()
+        self.processed_sequences: Set[int] = set()
+        self.intents: List[Dict[str, Any]] = [] # Intenções imediatas (navegação), em ordem
+        self.deferred: Dict[str, Dict[str, Any]] = {} # Intenções para o fim do lote: chave -> intenção
+        self.popup_counts: Dict[str, int] = {}
+
+    @property
+    def done(self) -> bool:
+        return self.index >= len(self.messages)
+
+    @property
+    def processed(self) -> int:
+        return len(self.processed_ids) + len(self.processed_sequences)
+
+    def take_intents(self) -> List[Dict[str, Any]]:
+        """Retorna e esvazia as intenções imediatas acumuladas até agora."""
+        intents, self.intents = self.intents, []
+        return intents
+
+
+class InboxCore:
+    """
+    Aplica as mensagens do inbox ao estado do cliente e devolve as intenções de UI.
+    """
+
+    # Dicionário de tradução para mensagens de sucesso de 'comeback'
+    ACTION_TRANSLATIONS = {
+        "add_diagnostic": "Diagnóstico adicionado",
+        "delete_diagnostic": "Diagnóstico removido",
+        "edit_diagnostic": "Diagnóstico editado com sucesso",
+        "update_tracked_metrics": "Métricas rastreadas atualizadas",
+        "fill_metric": "Dados de evolução salvos",
+        "bulk_fill": "Leituras de evolução importadas",
+        "add_event": "Evento adicionado",
+        "delete_event": "Evento removido",
+        "edit_event": "Evento editado",
+        "delete_account": "Conta deletada",
+        "change_password": "Senha alterada",
+        "invite_patient": "Convite enviado",
+        "respond_to_invitation": "Resposta ao convite processada",
+        "unlink_accounts": "Conta desvinculada",
+        "try_logout": "Logout realizado com sucesso",
+        "add_med": "Medicação adicionada",
+        "delete_med": "Medicação removida",
+        "edit_med": "Medicação editada",
+        "apply_operations": "Operações aplicadas"
+    }
+
+    def __init__(self, base_path: str, db_manager: PersistenceService, session: SessionService, outbox_processor,
+                 store: ClientStore | None = None):
+        '''
+        Inicializa o núcleo do inbox.
+
+        Args:
+            base_path: O caminho raiz do projeto.
+            db_manager: Instância do PersistenceService para manipulação de arquivos.
+            session: Sessão do app, atualizada no login e no logout.
+            outbox_processor: OutboxProcessor do cliente (dispositivo e log do outbox, para as confirmações).
+            store: Dados do cliente compartilhados com as telas (por padrão, um próprio).
+        '''
+        self.base_path = base_path
+        self.inbox_path = os.path.join(self.base_path, 'inbox_handler', 'inbox_messages.json')
+        self.db = db_manager
+        # IDs recentes das mensagens sem 'server_sequence' (histórico limitado, com append por ciclo).
+        self.processed_ids = RecentIdHistory(os.path.join(self.base_path, 'inbox_handler'))
+        self.sequence_state_path = os.path.join(self.base_path, 'inbox_handler', 'inbox_sequence_state.json')
+        self.decoder = MessageDecoder()
+        self.session = session
+        self.store = store or ClientStore(base_path, db_manager, session)
+        self.cache = self.store.cache
+        self.outbox_processor = outbox_processor
+
+        # Marca d'água das mensagens do servidor: toda 'server_sequence' <= a ela já foi processada.
+        # 'processed_above' guarda apenas as sequências processadas acima da marca enquanto alguma
+        # mensagem mais antiga ainda estiver retida no inbox (resposta de login pendente).
+        sequence_state = self._read_json(self.sequence_state_path, {})
+        self._sequence_watermark = sequence_state.get("server_sequence", 0)
+        self._processed_above = set(sequence_state.get("processed_above", []))
+        self._batch: InboxBatch | None = None # Lote em aplicação (destino das intenções)
+        self._snapshot_requested = False # 'sync/request_snapshot' enviado e snapshot ainda não recebido
+
+    def _read_json(self, file_path, default_value=None):
+        if default_value is None: default_value = []
+        if not os.path.exists(file_path): return default_value
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f: return json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError): return default_value
+
+    def _write_json(self, file_path, data):
+        with open(file_path, 'w', encoding='utf-8') as f: json.dump(data, f, indent=4)
+
+    # --- Lotes ---
+
+    def begin_batch(self, pending_request_id: str | None = None) -> InboxBatch:
+        """
+        Lê o inbox e inicia um lote. 'pending_request_id' é o ID da requisição de
+        login/criação de conta em andamento, cuja resposta é aceita mesmo sem sessão.
+        """
+        batch = InboxBatch(self._read_json(self.inbox_path), self.session.user, pending_request_id)
+        logger.debug("--- Starting cycle --- Session User: %s, Pending Request ID: %s, Messages: %d",
+                     batch.session_user, batch.pending_request_id, len(batch.messages))
+        return batch
+
+    def apply(self, batch: InboxBatch, deadline: float | None = None) -> bool:
+        """
+        Processa mensagens do lote até o fim ou até 'deadline' (time.perf_counter()).
+        Retorna True quando todas as mensagens do lote foram processadas.
+        """
+        self._batch = batch
+        try:
+            while not batch.done:
+                self._process_message(batch, batch.messages[batch.index])
+                batch.index += 1
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+        finally:
+            self._batch = None
+        return batch.done
+
+    def finish_batch(self, batch: InboxBatch) -> int:
+        """Persiste o resultado do lote e reescreve o inbox. Retorna quantas mensagens foram processadas."""
+        # Atualiza o histórico de IDs processados e o arquivo do inbox.
+        # Esta reescrita é crucial para remover as mensagens processadas e evitar loops infinitos.
+        self.processed_ids.add(batch.processed_ids)
+        if batch.processed_sequences:
+            self._advance_sequence_watermark(batch.processed_sequences, batch.remaining_messages)
+        self._write_json(self.inbox_path, batch.remaining_messages)
+        # As telas inscritas são avisadas uma vez por lote, só pelas coleções que mudaram.
+        self.store.publish_changes()
+        return batch.processed
+
+    def process_all(self, pending_request_id: str | None = None) -> InboxBatch:
+        """Aplica o inbox inteiro de uma vez, sem interface (testes de carga, replays)."""
+        batch = self.begin_batch(pending_request_id)
+        self.apply(batch)
+        self.finish_batch(batch)
+        return batch
+
+    def _process_message(self, batch: InboxBatch, msg: Dict[str, Any]):
+        """Avalia, decodifica e roteia uma mensagem do inbox."""
+        msg_target_user = msg.get("origin_user_id")
+        msg_id = msg.get("message_id")
+        payload = msg.get("payload", {})
+        logger.debug("Evaluating message: %s for user %s", msg.get('action'), msg_target_user)
+
+        # Condição para processar:
+        # 1. A mensagem é para o usuário logado.
+        # 2. OU é uma resposta a uma requisição de login/criação de conta pendente.
+        is_for_session_user = (batch.session_user and msg_target_user == batch.session_user) # Usuário já logado
+
+        # Uma resposta a uma requisição pendente pode ser o _cback ou a instrução para deletar do outbox.
+        is_pending_response = (not batch.session_user and batch.pending_request_id and
+                               (payload.get("request_message_id") == batch.pending_request_id or
+                                payload.get("message_id_to_delete") == batch.pending_request_id))
+        is_login_response = is_pending_response
+        # A confirmação cumulativa do outbox vale para este dispositivo mesmo sem sessão
+        # (ex: após um login que falhou).
+        device_id = self.outbox_processor.device_id
+        is_device_ack = (msg.get("action") == "ack_outbox" and
+                         any(entry.get("origin_device_id") == device_id for entry in payload.get("devices", [])))
+        should_process = is_for_session_user or is_login_response or is_device_ack
+        logger.debug("-> is_for_session_user: %s, is_login_response: %s ==> Should Process: %s",
+                     is_for_session_user, is_login_response, should_process)
+
+        server_sequence = msg.get("server_sequence")
+        if server_sequence is not None:
+            already_processed = (server_sequence <= self._sequence_watermark or
+                                 server_sequence in self._processed_above)
+        else:
+            already_processed = msg_id in self.processed_ids
+
+        if should_process and not already_processed:
+            logger.debug("Processando nova mensagem: %s/%s", msg.get('object'), msg.get('action'))
+
+            # 1. Decodificar a mensagem
+            decoded_message = self.decoder.decode(msg)
+
+            # 2. Roteá-la se a decodificação for bem-sucedida
+            if decoded_message:
+                self._route_message(decoded_message)
+
+                # Se a ação foi um login bem-sucedido, a sessão foi criada.
+                # Reavaliamos o session_user para processar mensagens subsequentes no mesmo ciclo.
+                if msg.get("action") == "try_login_cback" and payload.get("executed"):
+                    batch.session_user = self.session.user
+
+            if server_sequence is not None:
+                batch.processed_sequences.add(server_sequence)
+            else:
+                batch.processed_ids.add(msg_id)
+        else:
+            # Se a mensagem não foi processada, verificamos se ela deve ser mantida.
+            # Mantemos apenas as respostas de login/criação de conta pendentes.
+            # Todas as outras mensagens que não são para o usuário atual são descartadas.
+            is_pending_login_response = (batch.pending_request_id and
+                                         payload.get("request_message_id") == batch.pending_request_id)
+
+            if is_pending_login_response:
+                batch.remaining_messages.append(msg)
+
+    def _advance_sequence_watermark(self, processed_sequences, remaining_messages):
+        """
+        Avança a marca d'água até a maior sequência processada, sem ultrapassar
+        nenhuma mensagem que continua retida no inbox.
+        """
+        retained = [m["server_sequence"] for m in remaining_messages if m.get("server_sequence") is not None]
+        new_watermark = max(processed_sequences)
+        if retained:
+            new_watermark = min(new_watermark, min(retained) - 1)
+        self._sequence_watermark = max(self._sequence_watermark, new_watermark)
+        self._processed_above = {seq for seq in self._processed_above | processed_sequences
+                                 if seq > self._sequence_watermark}
+        self._write_json(self.sequence_state_path, {
+            "server_sequence": self._sequence_watermark,
+            "processed_above": sorted(self._processed_above)
+        })
+
+    # --- Intenções de UI ---
+
+    def _intent(self, intent_type: str, **fields):
+        """Registra uma intenção imediata (navegação) no lote atual."""
+        if self._batch is not None:
+            self._batch.intents.append({"type": intent_type, **fields})
+
+    def _defer(self, key: str, intent_type: str, **fields):
+        """Registra uma intenção para o fim do lote; pedidos com a mesma chave são combinados (vale o último)."""
+        if self._batch is not None:
+            self._batch.deferred[key] = {"type": intent_type, **fields}
+
+    def _popup(self, message: str, success: bool):
+        """Pede um popup; se vários forem pedidos no lote, só o último de cada tipo aparece, com a contagem."""
+        if self._batch is None:
+            return
+        key = 'success_popup' if success else 'error_popup'
+        count = self._batch.popup_counts.get(key, 0) + 1
+        self._batch.popup_counts[key] = count
+        self._defer(key, 'popup', message=message if count == 1 else f"{message} (+{count - 1})", success=success)
+
+    # --- Roteamento e handlers ---
+
+    def _route_message(self, message: Dict[str, Any]):
+        """Direciona a mensagem para o handler apropriado."""
+        obj = message.get('object') # Já validado pelo decoder
+        action = message.get('action') # Já validado pelo decoder
+        payload = message.get('payload', {}) # Já validado pelo decoder
+
+        # Se for uma mensagem de 'comeback', usa o handler genérico.
+        if action.endswith('_cback') and action != 'try_login_cback':
+            logger.debug("Mensagem de comeback. Roteando para o método: _handle_comeback")
+            if action == 'try_logout_cback': # Caso especial de logout
+                self._handle_try_logout_cback(payload)
+            self._handle_comeback(action, payload)
+        else:
+            # Para todas as outras mensagens, busca um handler específico.
+            handler_method_name = f"_handle_{obj}_{action}"
+            handler_method = getattr(self, handler_method_name, self._handle_unknown)
+            logger.debug("Mensagem entendida. Roteando para o método: %s", handler_method_name)
+            handler_method(payload)
+
+    def _handle_unknown(self, payload: Dict[str, Any]):
+        logger.warning("Ação desconhecida ou não implementada no cliente.")
+
+    def _handle_comeback(self, action: str, payload: Dict[str, Any]):
+        """Handler genérico para todas as mensagens de 'comeback'."""
+        if payload.get("executed"):
+            # Transforma 'add_diagnostic_cback' em 'Diagnóstico adicionado'
+            action_base_name = action.replace('_cback', '')
+            translated_message = self.ACTION_TRANSLATIONS.get(action_base_name, f"{action_base_name.replace('_', ' ').capitalize()} (sucesso)")
+
+            # Casos especiais de 'comeback'
+            if action == "delete_account_cback":
+                self._popup("Conta deletada com sucesso.", True)
+                self._force_logout()
+            elif action == "bulk_fill_cback":
+                # Resumo da importação em massa de leituras de evolução.
+                self._popup(f"{translated_message}: {payload.get('accepted', 0)} aceitas, "
+                            f"{payload.get('rejected', 0)} rejeitadas.", True)
+            elif action == "apply_operations_cback":
+                # Comeback agregado de um envelope: uma única mensagem para todas as operações.
+                self._popup(f"{translated_message}: {len(payload.get('results', []))}.", True)
+            elif action == "create_account_cback":
+                self._popup("Conta criada com sucesso! Faça o login.", True)
+                self._intent('reset_to', screen='login')
+            # Caso especial para alteração de senha: fecha a tela em caso de sucesso.
+            elif action == "change_password_cback":
+                self._popup(f"{translated_message}!", True)
+                self._intent('close_change_password')
+            else:
+                self._popup(f"{translated_message}!", True)
+        else:
+            reason = payload.get("reason", "A operação falhou.")
+            self._popup(f"Erro: {reason}", False)
+
+    def _force_logout(self):
+        """Força o logout do cliente, limpando a sessão."""
+        logger.info("Forçando logout após ação bem-sucedida (ex: delete_account).")
+        self.session.logout() # O cache é descartado pelo ClientStore
+        self._intent('reset_to', screen='initial_access')
+
+    def _handle_account_try_login_cback(self, payload: Dict[str, Any]):
+        """Processa a resposta de uma tentativa de login ou criação de conta."""
+        if payload.get("executed"):
+            # Sucesso: cria a sessão e redireciona
+            user_data = payload.get('user_data')
+            if not user_data: return
+
+            self.session.login(user_data['user'], user_data['profile_type'])
+
+            logger.info("Login/Criação bem-sucedido para %s. Redirecionando...", user_data['user'])
+            self._intent('reset_to', screen='doctor_home' if user_data['profile_type'] == 'doctor' else 'patient_home')
+        else:
+            # Falha: exibe o popup de erro
+            reason = payload.get("reason", "A operação falhou.")
+            logger.info("Falha no login/criação: %s", reason)
+            self._popup(reason, False)
+
+        # Limpa o ID da requisição pendente em ambos os casos (sucesso ou falha)
+        # Esta é a única fonte da verdade para limpar o ID após login/criação.
+        self._intent('clear_pending_request', request_id=payload.get("request_message_id"))
+
+    def _handle_try_logout_cback(self, payload: Dict[str, Any]):
+        """
+        Processa a confirmação de logout, limpando a sessão e resetando a UI.
+        """
+        if payload.get("executed"):
+            logger.info("Recebido try_logout_cback. Executando logout no cliente.")
+            self._force_logout()
+        else:
+            # Em teoria, um logout não deveria falhar, mas tratamos o caso.
+            reason = payload.get("reason", "Falha ao tentar fazer logout.")
+            self._popup(f"Erro: {reason}", False)
+
+    def _handle_outbox_ack_outbox(self, payload: Dict[str, Any]):
+        """
+        Aplica a confirmação cumulativa do ciclo do backend: remove do outbox, de uma vez,
+        todas as mensagens deste dispositivo até a sequência confirmada, menos as exceções.
+        """
+        outbox_log = self.outbox_processor.outbox_log
+        count = 0
+        for entry in payload.get("devices", []):
+            if entry.get("origin_device_id") == self.outbox_processor.device_id:
+                count += outbox_log.acknowledge_through(entry.get("origin_device_id"),
+                                                        entry.get("through_sequence", 0),
+                                                        entry.get("exceptions", []))
+        count += outbox_log.acknowledge(payload.get("message_ids", []))
+        if count:
+            logger.debug("%d mensagens confirmadas removidas do outbox.", count)
+
+    def _handle_outbox_delete_from_outbox(self, payload: Dict[str, Any]):
+        """
+        Confirma uma mensagem do outbox do cliente (o log avança o ponteiro, sem reescrever o arquivo).
+        Formato antigo, por mensagem; o backend agora envia 'ack_outbox' uma vez por ciclo.
+        """
+        msg_id_to_delete = payload.get("message_id_to_delete")
+        if not msg_id_to_delete: return
+
+        if self.outbox_processor.outbox_log.acknowledge([msg_id_to_delete]):
+            logger.debug("Mensagem %s removida do outbox.", msg_id_to_delete)
+
+    def _handle_inbox_delete_from_inbox(self, payload: Dict[str, Any]):
+        """Remove um ID de mensagem do histórico de mensagens processadas do inbox."""
+        msg_id_to_forget = payload.get("message_id_to_delete")
+        if not msg_id_to_forget: return
+
+        self.processed_ids.forget(msg_id_to_forget)
+
+    def _handle_sync_patch(self, payload: Dict[str, Any]):
+        """
+        Aplica no cache local um patch de registros de um paciente acompanhado.
+        As telas que exibem a coleção são avisadas ao fim do lote.
+        """
+        if self.store.apply_patch(payload):
+            logger.debug("Patch v%s de %s aplicado para o paciente %s.",
+                         payload.get('version'), payload.get('collection'), payload.get('patient_id'))
+        if self.cache.snapshot_needed and not self._snapshot_requested:
+            # O cache não sabia a versão da coleção: em vez de confiar no patch, pede o conjunto de trabalho inteiro.
+            self.outbox_processor.add_to_outbox("sync", "request_snapshot", {})
+            self._snapshot_requested = True
+
+    def _handle_sync_snapshot(self, payload: Dict[str, Any]):
+        """Carrega no cache o snapshot do conjunto de trabalho enviado após um login bem-sucedido."""
+        self.store.load_snapshot(payload)
+        self._snapshot_requested = False
+        logger.info("Snapshot de login carregado: %d pacientes.", len(payload.get('patients', [])))
+
+    def _handle_linking_accounts_unlink_accounts(self, payload: Dict[str, Any]):
+        """
+        Processa a mensagem de broadcast para desvinculação.
+        Para o cliente que originou a ação, esta mensagem é apenas para confirmação e não dispara UI.
+        Para o outro cliente (o alvo da desvinculação), este método pode ser expandido para
+        recarregar sua respectiva view (ex: a lista de médicos do paciente).
+        """
+        logger.debug("Mensagem de broadcast 'unlink_accounts' recebida e processada.")
+        # Conforme solicitado, este método não fará nenhuma atualização de UI.
+        # A atualização da tela do usuário que iniciou a ação é de responsabilidade
+        # exclusiva do método _handle_comeback, que processa a mensagem _cback.
+        pass
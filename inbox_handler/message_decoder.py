@@ -1,5 +1,8 @@
 import json
 from typing import Dict, Any
+from auxiliary_classes.app_logging import get_logger
+
+logger = get_logger('decoder')
 
 class MessageDecoder:
     """
@@ -20,11 +23,8 @@ class MessageDecoder:
         required_keys = ["message_id", "timestamp", "origin_user_id", "object", "action", "payload"]
 
         if not all(key in message for key in required_keys):
-            print(f"[Decoder] Erro: A mensagem {message.get('message_id', '')} não possui todas as chaves necessárias.")
+            logger.warning("A mensagem %s não possui todas as chaves necessárias.", message.get('message_id', ''))
             return None
 
-        obj = message.get('object')
-        action = message.get('action')
-
-        print(f"[Decoder] Mensagem {obj}/{action} decodificada com sucesso.")
+        logger.debug("Mensagem %s/%s decodificada com sucesso.", message.get('object'), message.get('action'))
         return message
@@ -0,0 +1,104 @@
+"""
+Histórico limitado dos IDs de mensagens do inbox já processadas.
+
+Só é usado para mensagens sem 'server_sequence' (as demais são filtradas pela
+marca d'água). Guarda apenas os CAPACITY IDs mais recentes, em memória, e os
+persiste em 'processed_inbox_ids.log' com um append por ciclo (um ID por linha;
+'-<id>' esquece um ID). Quando o log passa do dobro da capacidade, é reescrito
+só com os IDs mantidos, então memória, disco e custo por ciclo ficam constantes.
+"""
+import json
+import os
+from collections import OrderedDict
+from typing import Iterable
+
+RECENT_IDS_FILE = 'processed_inbox_ids.log'
+LEGACY_IDS_FILE = 'processed_inbox_ids.json'
+
+
+class RecentIdHistory:
+    """Conjunto dos IDs processados mais recentes, com capacidade fixa (LRU por inserção)."""
+
+    CAPACITY = 2048
+
+    def __init__(self, inbox_dir: str, capacity: int | None = None):
+        """
+        Args:
+            inbox_dir: Pasta 'inbox_handler' do cliente.
+            capacity: Quantidade de IDs mantidos (padrão: CAPACITY).
+        """
+        self.capacity = capacity or self.CAPACITY
+        self.path = os.path.join(inbox_dir, RECENT_IDS_FILE)
+        self._ids = OrderedDict()
+        self._log_lines = 0
+        self._load()
+        self._migrate_legacy(os.path.join(inbox_dir, LEGACY_IDS_FILE))
+
+    def __contains__(self, message_id):
+        return message_id in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                self._log_lines += 1
+                if line.startswith('-'):
+                    self._ids.pop(line[1:], None)
+                else:
+                    self._remember(line)
+
+    def _migrate_legacy(self, legacy_path):
+        """Importa o antigo 'processed_inbox_ids.json' (lista sem limite) e o remove."""
+        if not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                legacy_ids = json.load(f)
+        except json.JSONDecodeError:
+            legacy_ids = []
+        # A lista antiga vinha de um set, sem ordem: os IDs ordenáveis por tempo (ULID) ficam por último.
+        self.add(sorted(legacy_ids if isinstance(legacy_ids, list) else [], key=str)[-self.capacity:])
+        os.remove(legacy_path)
+
+    def _remember(self, message_id):
+        self._ids.pop(message_id, None)
+        self._ids[message_id] = True
+        if len(self._ids) > self.capacity:
+            self._ids.popitem(last=False)
+
+    def add(self, message_ids: Iterable[str]):
+        """Registra IDs processados (um único append no log)."""
+        new_ids = [message_id for message_id in message_ids if message_id]
+        if not new_ids:
+            return
+        for message_id in new_ids:
+            self._remember(message_id)
+        self._append(new_ids)
+
+    def forget(self, message_id: str):
+        """Esquece um ID, para que a mensagem possa ser processada de novo."""
+        if self._ids.pop(message_id, None):
+            self._append([f"-{message_id}"])
+
+    def _append(self, lines):
+        if self._log_lines + len(lines) > 2 * self.capacity:
+            self._rewrite()
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(''.join(f"{line}\n" for line in lines))
+        self._log_lines += len(lines)
+
+    def _rewrite(self):
+        """Reescreve o log apenas com os IDs mantidos em memória."""
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(''.join(f"{message_id}\n" for message_id in self._ids))
+        os.replace(temp_path, self.path)
+        self._log_lines = len(self._ids)
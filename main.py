@@ -21,6 +21,9 @@ from navigation_screen_manager import NavigationScreenManager
 # Importa as telas para que o Kivy as reconheça ao carregar os arquivos .kv
 from outbox_handler.outbox_processor import OutboxProcessor
 from inbox_handler.inbox_processor import InboxProcessor
+from inbox_handler.client_store import ClientStore
+from auxiliary_classes.session_service import SessionService
+from auxiliary_classes.app_logging import configure_logging, get_logger
 import os
 from initial_access import InitialAccessScreen, LoginScreen, SignUpScreen
 from patient_profile.patient_screens import PatientHomeScreen, PatientMenuScreen
@@ -34,6 +37,8 @@ from patient_profile.patient_settings_view import PatientAppSettingsView
 from auxiliary_classes.popup_label import PopupLabel
 from auxiliary_classes.change_password_view import ChangePasswordScreen # Import the screen
 
+logger = get_logger('app')
+
 
 class MyScreenManager(NavigationScreenManager):
     pass
@@ -43,18 +48,26 @@ class PlaceboApp (App):  ## Aplicações em Kivy terminam em App
     outbox_processor = ObjectProperty(None)
     inbox_processor = ObjectProperty(None)
     local_backend = ObjectProperty(None)
+    session = ObjectProperty(None)
+    store = ObjectProperty(None)
     pending_request_id = StringProperty(None, allownone=True)
     
     def build(self):
-        self.manager = MyScreenManager()
         main_path = os.path.dirname(__file__)
+        # A sessão fica em memória; todos os módulos a consultam por aqui.
+        self.session = SessionService(main_path)
+        self.manager = MyScreenManager()
         
         # Initialize LocalBackend (Server simulation)
         self.local_backend = LocalBackend(main_path)
         
         # Client-side processors, agora com acesso ao db manager do backend
-        self.outbox_processor = OutboxProcessor(main_path)
-        self.inbox_processor = InboxProcessor(main_path, self.local_backend.db)
+        self.outbox_processor = OutboxProcessor(main_path, self.session)
+        # Dados do cliente compartilhados por todas as telas (contas e coleções dos pacientes já lidas).
+        self.store = ClientStore(main_path, self.local_backend.db, self.session)
+        self.inbox_processor = InboxProcessor(main_path, self.local_backend.db, self.session,
+                                              self.outbox_processor, self.store)
+        self._refreshed_revision = self.store.revision # Revisão do store na última atualização da tela
 
         # Simulate client-server sync cycle every 5 seconds
         Clock.schedule_interval(self.run_sync_cycle, 5)
@@ -79,51 +92,49 @@ class PlaceboApp (App):  ## Aplicações em Kivy terminam em App
 
     def run_sync_cycle(self, dt):
         """Simulates a client-server sync cycle."""
+        # O lote anterior do inbox ainda está sendo aplicado em fatias; o backend não pode
+        # reescrever o inbox antes que ele termine, então o ciclo fica para o próximo intervalo.
+        if self.inbox_processor.busy:
+            return
+
+        # 0. O cliente envia ao outbox as mensagens em espera, já combinadas.
+        self.outbox_processor.flush()
+
         # 1. O Backend processa as transações e escreve as respostas diretamente no inbox.
         self.local_backend.run_processing_cycle()
 
-        # 2. O InboxProcessor do cliente processa todas as mensagens em sua caixa de entrada.
-        self.inbox_processor.process_inbox()
+        # 2. O InboxProcessor do cliente aplica o inbox aos poucos, alguns milissegundos por quadro.
+        self.inbox_processor.process_inbox(on_complete=self._on_inbox_applied)
 
-        # 3. Força a atualização da view atual para refletir quaisquer mudanças nos dados.
-        self.refresh_current_view()
+    def _on_inbox_applied(self, processed):
+        """Chamado ao fim do lote do inbox, depois dos popups e recarregamentos adiados."""
+        # 3. Atualiza a view atual apenas se algum dado do store mudou desde a última atualização
+        #    (mensagens que só confirmam operações, sem patch de dados, não redesenham a tela).
+        if processed and self.store.revision != self._refreshed_revision:
+            self._refreshed_revision = self.store.revision
+            self.refresh_current_view()
 
     def refresh_current_view(self):
         """
         Identifica a tela/view atual e chama seu método de recarregamento de dados.
-        Isso garante que a UI esteja sempre sincronizada após cada ciclo.
+        Isso garante que a UI esteja sempre sincronizada após cada ciclo. As views de listas
+        comparam a versão dos seus dados no store com a da última montagem e não refazem os
+        widgets se nada mudou.
         """
         if not self.manager or not self.manager.current_screen:
             return
         
         current_screen = self.manager.current_screen
-        print(f"\n[DEBUG Refresh] Tentando atualizar a tela principal: '{current_screen.name}'")
+        logger.debug("Tentando atualizar a tela principal: '%s'", current_screen.name)
 
         # Verifica se a tela atual tem um método 'on_enter' ou 'load_data' e o chama.
         # O método 'on_enter' é um padrão do Kivy que usamos para carregar dados.
         if hasattr(current_screen, 'on_enter'):
-            print(f"[DEBUG Refresh] -> Chamando on_enter() para '{current_screen.name}'")
+            logger.debug("-> Chamando on_enter() para '%s'", current_screen.name)
             current_screen.on_enter()
-        
-        # Para as views aninhadas dentro de ScreenManagers (como na DoctorHomeScreen)
-        if hasattr(current_screen, 'ids') and 'content_manager' in current_screen.ids:
-            content_screen = current_screen.ids.content_manager.current_screen
-            
-            # Acessa a view de conteúdo real dentro da sub-tela
-            # Assumimos que a view de conteúdo tem um ID previsível (ex: 'medications_view_content')
-            # ou é a primeira filha. Acessar pelo ID é mais seguro.
-            # Mapeia o nome da tela para o método de load correspondente na sua view.
-            load_method_map = {
-                'doctor_medications': 'load_medications',
-                'doctor_events': 'load_events',
-                'doctor_diagnostics': 'load_diagnostics',
-            }
-            
-            load_method_name = load_method_map.get(content_screen.name)
-            if load_method_name and content_screen.children:
-                content_view = content_screen.children[0] # A view é a filha da tela de conteúdo
-                if hasattr(content_view, load_method_name):
-                    print(f"[DEBUG Refresh] -> Forçando atualização. Chamando {load_method_name}() para a view '{content_view.__class__.__name__}'")
-                    getattr(content_view, load_method_name)()
 
+        # As views aninhadas (ex: medicações do médico) não são recarregadas aqui: elas se
+        # inscrevem no ClientStore e são avisadas apenas quando os seus dados mudam.
+
+configure_logging()
 PlaceboApp().run()
\ No newline at end of file
@@ -1,7 +1,7 @@
 from kivy.uix.screenmanager import ScreenManager
 from kivy.clock import Clock
+from kivy.app import App
 import os
-import json
 
 
 class NavigationScreenManager(ScreenManager):  # Example base class, adjust as needed
@@ -19,26 +19,18 @@ class NavigationScreenManager(ScreenManager):  # Example base class, adjust as n
         return os.path.join(os.path.dirname(__file__), filename)
 
     def check_session(self, dt):
-        """Checks for a saved session and sets the initial screen."""
-        session_path = self._get_main_dir_path('session.json')
-        if os.path.exists(session_path):
-            try:
-                with open(session_path, 'r', encoding='utf-8') as f:
-                    session_data = json.load(f)
-                
-                if session_data.get('logged_in'):
-                    profile_type = session_data.get('profile_type')
-                    print(f"Found active session for profile: {profile_type}")
+        """Checks for a restored session and sets the initial screen."""
+        session = App.get_running_app().session
+        if session.logged_in:
+            profile_type = session.profile_type
+            print(f"Found active session for profile: {profile_type}")
+
+            if profile_type == 'doctor':
+                self.current = 'doctor_home'
+            else:
+                self.current = 'patient_home'
+            return
 
-                    if profile_type == 'doctor':
-                        self.current = 'doctor_home'
-                    else:
-                        self.current = 'patient_home'
-                    return
-
-            except (json.JSONDecodeError, FileNotFoundError):
-                pass  # If file is corrupted or not found, default to initial_access
-        
         self.current = 'initial_access'
 
     def push(self, screen_name):
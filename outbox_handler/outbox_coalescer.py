@@ -0,0 +1,101 @@
+"""
+Coalescência das mensagens do outbox que ainda não foram entregues ao backend.
+
+As mensagens de dados de paciente ficam em uma área de espera até o próximo ciclo
+de sincronização. Enquanto esperam, operações sobre o mesmo item são combinadas,
+sem mudar o resultado de aplicá-las uma a uma:
+
+- edições seguidas do mesmo item viram uma só edição (os campos são mesclados na ordem);
+- um item adicionado e removido antes do envio não gera nenhuma mensagem;
+- uma edição seguida da remoção do item vira só a remoção;
+- 'fill_metric' repetidos para o mesmo paciente e data viram um só, com as métricas mescladas.
+
+Qualquer outra mensagem (login, vínculos, 'update_tracked_metrics', 'bulk_fill', ...)
+é uma barreira: a área de espera é descarregada antes dela, para manter a ordem.
+"""
+from typing import Dict, Any, List, Tuple
+
+# ação -> tipo da operação sobre o item
+ITEM_OPERATIONS = {
+    "add_diagnostic": "add", "edit_diagnostic": "edit", "delete_diagnostic": "delete",
+    "add_event": "add", "edit_event": "edit", "delete_event": "delete",
+    "add_med": "add", "edit_med": "edit", "delete_med": "delete",
+}
+# Campo do payload com o ID do item nas remoções
+DELETE_ID_FIELDS = ("diagnostic_id", "event_id", "med_id")
+
+
+def coalesce_key(message: Dict[str, Any]) -> Tuple | None:
+    """Retorna a chave do item alvo da mensagem, ou None se ela não pode ser combinada."""
+    action = message.get("action")
+    payload = message.get("payload") or {}
+    origin_user = message.get("origin_user_id")
+    if action in ITEM_OPERATIONS:
+        if ITEM_OPERATIONS[action] == "delete":
+            item_id = next((payload.get(field) for field in DELETE_ID_FIELDS if payload.get(field)), None)
+        else:
+            item_id = payload.get("id")
+        if item_id is None:
+            return None
+        return (origin_user, message.get("object"), payload.get("patient_user"), item_id)
+    if message.get("object") == "evolution" and action == "fill_metric":
+        if not isinstance(payload.get("metrics"), dict):
+            return None
+        return (origin_user, "evolution", payload.get("patient_id"), payload.get("date"))
+    return None
+
+
+class OutboxCoalescer:
+    """Área de espera das mensagens combináveis, em ordem de criação."""
+
+    def __init__(self):
+        self.staged: List[Dict[str, Any]] = []
+        # chave do item -> mensagens na área de espera que ainda podem ser combinadas
+        # (ex: [add], [add, edit], [edit] ou [fill_metric])
+        self._chains: Dict[Tuple, List[Dict[str, Any]]] = {}
+
+    def __len__(self):
+        return len(self.staged)
+
+    def stage(self, message: Dict[str, Any]) -> Dict[str, Any] | None:
+        """
+        Coloca uma mensagem combinável na área de espera. Retorna a mensagem que passou a
+        carregar a operação (ela mesma ou uma anterior, mesclada), ou None se a operação
+        anulou as anteriores (item adicionado e removido antes do envio).
+        """
+        key = coalesce_key(message)
+        chain = self._chains.get(key, [])
+        operation = ITEM_OPERATIONS.get(message.get("action"), "fill")
+
+        if operation == "delete":
+            self._chains.pop(key, None)
+            for staged in chain:
+                self._unstage(staged)
+            if chain and ITEM_OPERATIONS.get(chain[0].get("action")) == "add":
+                return None # O item nunca chegou ao backend
+            self.staged.append(message)
+            return message
+
+        last = chain[-1] if chain else None
+        if last is not None and last.get("action") == message.get("action") and operation in ("edit", "fill"):
+            if operation == "edit":
+                last["payload"] = {**last["payload"], **message["payload"]}
+            else:
+                last["payload"] = {**last["payload"],
+                                   "metrics": {**last["payload"]["metrics"], **message["payload"]["metrics"]}}
+            return last
+
+        self.staged.append(message)
+        if chain:
+            chain.append(message) # ex: [add, edit]
+        else:
+            self._chains[key] = [message]
+        return message
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """Esvazia a área de espera e retorna as mensagens, na ordem em que devem ser enviadas."""
+        staged, self.staged, self._chains = self.staged, [], {}
+        return staged
+
+    def _unstage(self, message: Dict[str, Any]):
+        self.staged = [staged for staged in self.staged if staged is not message]
@@ -0,0 +1,242 @@
+"""
+Outbox do cliente como log append-only: uma mensagem JSON por linha em
+'outbox_messages.jsonl', mais um ponteiro de confirmação em 'outbox_ack.json'.
+
+- Enfileirar é um único append no fim do arquivo.
+- Confirmar não reescreve o log: o ponteiro avança sobre as mensagens confirmadas
+  no início do log, e confirmações fora de ordem ficam em 'acked_above' até que o
+  ponteiro as alcance. O backend confirma de forma cumulativa ('ack_outbox': tudo
+  até a sequência N do dispositivo, menos as exceções), uma vez por ciclo.
+- Quando o trecho já confirmado passa de COMPACT_THRESHOLD bytes, o log é
+  reescrito só com as mensagens pendentes e a 'generation' é incrementada, para
+  que o backend saiba que as posições mudaram.
+"""
+import json
+import os
+from collections import deque
+from typing import Dict, Any, Iterable, List, Tuple
+from auxiliary_classes.app_logging import get_logger
+
+logger = get_logger('outbox')
+
+OUTBOX_LOG_FILE = 'outbox_messages.jsonl'
+OUTBOX_ACK_FILE = 'outbox_ack.json'
+LEGACY_OUTBOX_FILE = 'outbox_messages.json'
+
+# Posição de leitura do backend no log: (generation, byte offset)
+OutboxCursor = Tuple[int, int]
+
+
+def _read_ack_state(ack_path: str) -> Dict[str, Any]:
+    if not os.path.exists(ack_path):
+        return {}
+    try:
+        with open(ack_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else {}
+    except json.JSONDecodeError:
+        return {}
+
+
+def read_outbox(outbox_dir: str, cursor: OutboxCursor | None = None) -> Tuple[List[Dict[str, Any]], OutboxCursor]:
+    """
+    Lê as mensagens do outbox a partir da posição 'cursor' (usado pelo backend).
+    Sem cursor, ou se o log foi compactado desde a última leitura, lê a partir do
+    ponteiro de confirmação. Retorna as mensagens não confirmadas e o novo cursor.
+    """
+    log_path = os.path.join(outbox_dir, OUTBOX_LOG_FILE)
+    state = _read_ack_state(os.path.join(outbox_dir, OUTBOX_ACK_FILE))
+    generation = state.get('generation', 0)
+    start = state.get('offset', 0)
+    if cursor is not None and cursor[0] == generation:
+        start = max(start, cursor[1])
+    if not os.path.exists(log_path):
+        return [], (generation, start)
+
+    acked_above = set(state.get('acked_above', []))
+    messages = []
+    with open(log_path, 'rb') as f:
+        f.seek(start)
+        data = f.read()
+    end = data.rfind(b'\n') + 1 # Uma linha sem '\n' ainda está sendo escrita
+    for line in data[:end].splitlines():
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            continue
+        if msg.get("message_id") not in acked_above:
+            messages.append(msg)
+    return messages, (generation, start + end)
+
+
+class OutboxLog:
+    """Log append-only do outbox, com enfileiramento e confirmação em O(1)."""
+
+    COMPACT_THRESHOLD = 64 * 1024 # Bytes confirmados no início do log antes de compactá-lo
+
+    def __init__(self, outbox_dir: str):
+        """
+        Args:
+            outbox_dir: Pasta 'outbox_handler' do cliente.
+        """
+        self.log_path = os.path.join(outbox_dir, OUTBOX_LOG_FILE)
+        self.ack_path = os.path.join(outbox_dir, OUTBOX_ACK_FILE)
+
+        state = _read_ack_state(self.ack_path)
+        self.generation = state.get('generation', 0)
+        self._offset = state.get('offset', 0)
+        self._acked_above = set(state.get('acked_above', []))
+        # Mensagens a partir do ponteiro, em ordem:
+        # [message_id, fim da linha, confirmada, dispositivo de origem, sequência]
+        self._entries = deque()
+        self._pending = {} # message_id -> entrada ainda não confirmada
+        self._end = 0
+        self._load(state.get('head_id'))
+        self._migrate_legacy(os.path.join(outbox_dir, LEGACY_OUTBOX_FILE))
+
+    def __len__(self):
+        return len(self._pending)
+
+    def __contains__(self, message_id):
+        return message_id in self._pending
+
+    def _load(self, head_id):
+        """Indexa as mensagens a partir do ponteiro (ou do início, se o ponteiro não confere)."""
+        if not os.path.exists(self.log_path):
+            self._offset, self._acked_above = 0, set()
+            return
+        with open(self.log_path, 'rb') as f:
+            data = f.read()
+
+        # Descarta uma última linha incompleta (escrita interrompida).
+        complete = data.rfind(b'\n') + 1
+        if complete < len(data):
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(complete)
+        self._end = complete
+
+        position = self._offset if self._offset <= complete else None
+        lines = data[position:complete].splitlines(keepends=True) if position is not None else []
+        if position is None or (head_id and lines and self._parse_line(lines[0])[0] != head_id):
+            # O ponteiro não aponta para a mensagem esperada (ex: queda durante a compactação):
+            # relê o log desde o início. Mensagens já aplicadas são descartadas pelo backend
+            # pela sequência, e a nova geração faz o backend reposicionar a leitura.
+            logger.warning("Ponteiro de confirmação inconsistente; relendo o outbox desde o início.")
+            position, self._offset, self._acked_above = 0, 0, set()
+            lines = data[:complete].splitlines(keepends=True)
+            self.generation += 1
+            self._save_state()
+
+        for line in lines:
+            position += len(line)
+            message_id, device_id, sequence = self._parse_line(line)
+            entry = [message_id, position, message_id is None or message_id in self._acked_above, device_id, sequence]
+            self._entries.append(entry)
+            if not entry[2]:
+                self._pending[message_id] = entry
+        self._advance()
+
+    @staticmethod
+    def _parse_line(line: bytes) -> Tuple[str | None, str | None, int | None]:
+        """Retorna (message_id, origin_device_id, sequence) de uma linha do log."""
+        try:
+            msg = json.loads(line)
+        except ValueError:
+            return None, None, None
+        return msg.get("message_id"), msg.get("origin_device_id"), msg.get("sequence")
+
+    def _migrate_legacy(self, legacy_path):
+        """Move as mensagens do antigo 'outbox_messages.json' (lista JSON) para o log."""
+        if not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, 'r', encoding='utf-8') as f:
+                legacy_messages = json.load(f)
+        except json.JSONDecodeError:
+            legacy_messages = []
+        for msg in legacy_messages if isinstance(legacy_messages, list) else []:
+            if msg.get("message_id") not in self._pending:
+                self.append(msg)
+        os.remove(legacy_path)
+
+    def append(self, message: Dict[str, Any]):
+        """Anexa uma mensagem ao fim do log."""
+        line = (json.dumps(message, ensure_ascii=False) + "\n").encode('utf-8')
+        with open(self.log_path, 'ab') as f:
+            f.write(line)
+        self._end += len(line)
+        entry = [message.get("message_id"), self._end, False, message.get("origin_device_id"), message.get("sequence")]
+        self._entries.append(entry)
+        self._pending[entry[0]] = entry
+
+    def acknowledge(self, message_ids: Iterable[str]) -> int:
+        """Confirma mensagens já aplicadas pelo backend. Retorna quantas estavam pendentes."""
+        return self._mark_acked([self._pending[message_id] for message_id in message_ids if message_id in self._pending])
+
+    def acknowledge_through(self, device_id: str, through_sequence: int, exceptions: Iterable[int] = ()) -> int:
+        """
+        Confirma de uma vez todas as mensagens pendentes do dispositivo com sequência até
+        'through_sequence', menos as 'exceptions' (ainda na fila do backend). Retorna quantas confirmou.
+        """
+        exceptions = set(exceptions)
+        return self._mark_acked([entry for entry in self._pending.values()
+                                 if entry[3] == device_id and entry[4] is not None
+                                 and entry[4] <= through_sequence and entry[4] not in exceptions])
+
+    def _mark_acked(self, entries: List[list]) -> int:
+        """Marca as entradas como confirmadas e salva o ponteiro uma única vez."""
+        for entry in entries:
+            del self._pending[entry[0]]
+            entry[2] = True
+            self._acked_above.add(entry[0])
+        count = len(entries)
+        if count:
+            self._advance()
+            if self._offset >= self.COMPACT_THRESHOLD:
+                self._compact()
+            else:
+                self._save_state()
+        return count
+
+    def max_sequence(self, device_id: str) -> int:
+        """Maior sequência do dispositivo entre as mensagens a partir do ponteiro (0 se não houver)."""
+        return max((entry[4] for entry in self._entries if entry[3] == device_id and entry[4] is not None), default=0)
+
+    def pending_messages(self) -> List[Dict[str, Any]]:
+        """Retorna as mensagens ainda não confirmadas, na ordem em que foram enfileiradas."""
+        messages, _ = read_outbox(os.path.dirname(self.log_path))
+        return [msg for msg in messages if msg.get("message_id") in self._pending]
+
+    def _advance(self):
+        """Avança o ponteiro sobre as mensagens confirmadas no início do log."""
+        while self._entries and self._entries[0][2]:
+            message_id, end = self._entries.popleft()[:2]
+            self._offset = end
+            self._acked_above.discard(message_id)
+
+    def _compact(self):
+        """Reescreve o log apenas com as mensagens pendentes e incrementa a geração."""
+        with open(self.log_path, 'rb') as f:
+            f.seek(self._offset)
+            remaining = f.read()
+        temp_path = self.log_path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(remaining)
+        os.replace(temp_path, self.log_path)
+
+        for entry in self._entries:
+            entry[1] -= self._offset
+        self._end -= self._offset
+        self._offset = 0
+        self.generation += 1
+        self._save_state()
+
+    def _save_state(self):
+        head_id = self._entries[0][0] if self._entries else None
+        with open(self.ack_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "generation": self.generation,
+                "offset": self._offset,
+                "head_id": head_id,
+                "acked_above": sorted(self._acked_above)
+            }, f)
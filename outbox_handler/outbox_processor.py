@@ -1,8 +1,13 @@
 import json
 import os
-from typing import Dict, Any
-from datetime import datetime
-import uuid
+from typing import Dict, Any, List
+from auxiliary_classes.id_generator import new_id
+from outbox_handler.outbox_log import OutboxLog
+from outbox_handler.outbox_coalescer import OutboxCoalescer, coalesce_key
+from auxiliary_classes.session_service import SessionService
+from auxiliary_classes.app_logging import get_logger
+
+logger = get_logger('outbox')
 
 class OutboxProcessor:
     """
@@ -10,16 +15,112 @@ class OutboxProcessor:
     também processa mensagens de 'outbox' (vindas do servidor, futuramente).
     """
 
-    def __init__(self, user_data_path: str):
+    def __init__(self, user_data_path: str, session: SessionService | None = None):
         """
         Inicializa o processador de mensagens.
 
         Args:
             user_data_path: O caminho absoluto para a pasta 'user_data'.
+            session: Sessão compartilhada do app (por padrão, uma própria, lida de 'session.json').
         """
         if not os.path.isdir(user_data_path):
             raise FileNotFoundError(f"O diretório de dados do usuário não foi encontrado: {user_data_path}")
         self.user_data_path = user_data_path
+        self.session = session or SessionService(user_data_path)
+        self.device_state_path = os.path.join(self.user_data_path, 'outbox_handler', 'device_state.json')
+        self.outbox_log = OutboxLog(os.path.join(self.user_data_path, 'outbox_handler'))
+        self._load_device_state()
+        # Diário da área de espera: uma linha por mensagem combinável, na ordem de criação.
+        self.staging_path = os.path.join(self.user_data_path, 'outbox_handler', 'outbox_staging.jsonl')
+        self.coalescer = OutboxCoalescer()
+        self._staging_journaled = False
+        self._load_staging()
+
+    def _load_device_state(self):
+        """
+        Carrega (ou cria) a identidade deste dispositivo e o próximo número de sequência.
+        Cada mensagem do outbox recebe uma sequência estritamente crescente por dispositivo,
+        o que permite ao backend detectar duplicatas com uma única comparação de inteiros.
+
+        O estado é salvo depois de cada append ao log, não a cada sequência; se o app cair
+        entre os dois, a sequência continua a partir da maior já gravada no log.
+        """
+        state = {}
+        if os.path.exists(self.device_state_path):
+            try:
+                with open(self.device_state_path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except json.JSONDecodeError:
+                pass
+
+        self.device_id = state.get('device_id') or new_id("dev_")
+        self._next_sequence = max(state.get('next_sequence', 1), self.outbox_log.max_sequence(self.device_id) + 1)
+        if not state.get('device_id'):
+            self._save_device_state()
+
+    def _save_device_state(self):
+        """Persiste a identidade do dispositivo e o próximo número de sequência."""
+        with open(self.device_state_path, 'w', encoding='utf-8') as f:
+            json.dump({'device_id': self.device_id, 'next_sequence': self._next_sequence}, f, indent=4)
+
+    def _take_sequence(self) -> int:
+        """Reserva o próximo número de sequência do dispositivo (persistido por _append_messages)."""
+        sequence = self._next_sequence
+        self._next_sequence += 1
+        return sequence
+
+    def _load_staging(self):
+        """
+        Envia as mensagens que ficaram na área de espera quando o app foi fechado. O diário
+        guarda as mensagens originais; reaplicá-las no coalescedor gera as mesmas mensagens
+        combinadas, com os mesmos IDs, de antes da queda.
+        """
+        if not os.path.exists(self.staging_path):
+            return
+        with open(self.staging_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    self.coalescer.stage(json.loads(line))
+                except ValueError:
+                    continue # Linha incompleta (queda durante a escrita)
+        # Uma queda em flush() entre o append e a remoção do diário deixa a mensagem
+        # nos dois lugares; reanexá-la criaria uma cópia com outra sequência.
+        self._append_messages([message for message in self.coalescer.drain()
+                               if message.get("message_id") not in self.outbox_log])
+        os.remove(self.staging_path)
+
+    def _journal_staged(self, message: Dict[str, Any]):
+        """Anexa uma mensagem ao diário da área de espera, para que nenhuma ação se perca se o app fechar antes do envio."""
+        with open(self.staging_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(message, ensure_ascii=False) + "\n")
+        self._staging_journaled = True
+
+    def _clear_staging(self):
+        """Remove o diário depois que a área de espera foi descarregada no log."""
+        if self._staging_journaled:
+            os.remove(self.staging_path)
+            self._staging_journaled = False
+
+    def _append_messages(self, messages: List[Dict[str, Any]]):
+        """
+        Numera as mensagens com as próximas sequências do dispositivo, anexa-as ao log do
+        outbox e salva o estado do dispositivo uma única vez, depois do append.
+        """
+        for message in messages:
+            message["sequence"] = self._take_sequence()
+            self.outbox_log.append(message)
+        if messages:
+            self._save_device_state()
+
+    def flush(self) -> int:
+        """
+        Envia ao log do outbox as mensagens da área de espera, já combinadas.
+        Chamado antes de cada ciclo do backend. Retorna quantas mensagens foram anexadas.
+        """
+        staged = self.coalescer.drain()
+        self._append_messages(staged)
+        self._clear_staging()
+        return len(staged)
 
     def _read_json_file(self, filename: str) -> Dict | list:
         """Lê um arquivo JSON de forma segura."""
@@ -49,7 +150,7 @@ class OutboxProcessor:
                 message = message_data
 
             if not all(k in message for k in ['object', 'action', 'payload']):
-                print("Erro de processamento: Mensagem com formato inválido.")
+                logger.error("Erro de processamento: Mensagem com formato inválido.")
                 return
 
             obj = message.get('object')
@@ -60,15 +161,15 @@ class OutboxProcessor:
             handler_method_name = f"_handle_{obj}_{action}"
             handler_method = getattr(self, handler_method_name, self._handle_unknown)
             
-            print(f"Processando: {obj}/{action}")
+            logger.debug("Processando: %s/%s", obj, action)
             handler_method(payload)
 
         except Exception as e:
-            print(f"Erro ao processar a mensagem: {e}")
+            logger.error("Erro ao processar a mensagem: %s", e)
 
     def _handle_unknown(self, payload: Dict[str, Any]):
         """Manipula ações desconhecidas."""
-        print(f"Ação não implementada no processador.")
+        logger.warning("Ação não implementada no processador.")
 
     # --- Manipuladores de Ações ---
 
@@ -76,7 +177,7 @@ class OutboxProcessor:
         """Adiciona um novo diagnóstico ao arquivo do paciente."""
         patient_user = payload.get('patient_user')
         if not patient_user:
-            print("Erro: 'patient_user' não encontrado no payload do diagnóstico.")
+            logger.error("'patient_user' não encontrado no payload do diagnóstico.")
             return
 
         all_diagnostics = self._read_json_file('my_patient_diagnostics.json')
@@ -89,67 +190,71 @@ class OutboxProcessor:
         all_diagnostics[patient_user] = patient_diagnostics
         
         self._write_json_file('patient_diagnostics.json', all_diagnostics)
-        print(f"Diagnóstico adicionado para {patient_user}.")
+        logger.debug("Diagnóstico adicionado para %s.", patient_user)
 
     def _get_origin_user_id(self) -> str | None:
-        """Reads the current logged-in user from my_session.json."""
-        session_filepath = os.path.join(self.user_data_path, 'session.json')
-        if os.path.exists(session_filepath):
-            try:
-                with open(session_filepath, 'r', encoding='utf-8') as f:
-                    session_data = json.load(f)
-                    return session_data.get('user')
-            except json.JSONDecodeError:
-                pass
-        return None
+        """Returns the current logged-in user (from the in-memory session, no file I/O)."""
+        return self.session.user
 
     def add_to_outbox(self, obj: str, action: str, payload: Dict[str, Any], origin_user_override: str = None) -> str | None:
         """
-        Gera uma mensagem e a anexa ao arquivo outbox_messages.json.
-        Isso é executado em paralelo com as gravações de arquivo locais existentes.
-        Retorna o message_id da mensagem criada.
+        Gera uma mensagem e a anexa ao log do outbox (outbox_messages.jsonl).
+        Mensagens de dados de paciente esperam o próximo 'flush' e podem ser combinadas
+        com outras sobre o mesmo item (ver OutboxCoalescer); as demais descarregam a área
+        de espera e são anexadas na hora.
+        Retorna o message_id da mensagem que carrega a ação, ou None se ela não gerou mensagem.
         """
         origin_user_id = self._get_origin_user_id() or origin_user_override
         
         if not origin_user_id:
-            print(f"Aviso: Não foi possível determinar o origin_user_id para a mensagem {obj}/{action}. Mensagem não registrada no outbox.")
+            logger.warning("Não foi possível determinar o origin_user_id para a mensagem %s/%s. Mensagem não registrada no outbox.", obj, action)
             return None
 
-        message_id = f"msg_{int(datetime.now().timestamp())}_{uuid.uuid4().hex[:8]}"
+        message_id = new_id("msg_")
 
         message = {
             "message_id": message_id,
             # O timestamp será adicionado pelo backend ao processar a mensagem
             "origin_user_id": origin_user_id,
+            "origin_device_id": self.device_id,
+            "sequence": None, # Atribuída ao entrar no log, para manter a ordem do log
             "object": obj,
             "action": action,
-            "payload": payload
+            "payload": dict(payload)
         }
-        
-        # O arquivo outbox_messages.json deve estar sempre na mesma pasta que este script.
-        outbox_filepath = os.path.join(self.user_data_path, 'outbox_handler', 'outbox_messages.json')
-        all_messages = []
-        if os.path.exists(outbox_filepath):
-            try:
-                with open(outbox_filepath, 'r', encoding='utf-8') as f:
-                    all_messages = json.load(f)
-            except json.JSONDecodeError:
-                pass
-        
-        all_messages.append(message)
 
-        with open(outbox_filepath, 'w', encoding='utf-8') as f:
-            json.dump(all_messages, f, indent=4)
-        print(f"[Outbox] Mensagem {message.get('object')}/{message.get('action')} adicionada ao outbox_messages.json.")
+        if coalesce_key(message) is not None:
+            # A mensagem original vai para o diário antes de ser combinada (um append, O(1)).
+            self._journal_staged(message)
+            carrier = self.coalescer.stage(message)
+            logger.debug("Mensagem %s/%s aguardando o próximo envio (%d na espera).", obj, action, len(self.coalescer))
+            return carrier.get("message_id") if carrier else None
+
+        # Barreira: as mensagens em espera entram no log antes dela, para manter a ordem.
+        # Um único append no fim do log, sem reler as mensagens já enfileiradas.
+        staged = self.coalescer.drain()
+        self._append_messages(staged + [message])
+        self._clear_staging()
+        logger.debug("Mensagem %s/%s adicionada ao outbox.", obj, action)
         return message_id
 
+    def add_operations_to_outbox(self, operations: List[Dict[str, Any]]) -> str | None:
+        """
+        Enfileira várias operações ({'object', 'action', 'payload'}) como um único envelope
+        ('envelope/apply_operations'). O backend as aplica em ordem, todas ou nenhuma, e
+        responde com um único comeback agregado. Retorna o message_id do envelope.
+        """
+        operations = [{"object": op["object"], "action": op["action"], "payload": dict(op.get("payload") or {})}
+                      for op in operations]
+        return self.add_to_outbox("envelope", "apply_operations", {"operations": operations})
+
     def _handle_diagnostic_edit(self, payload: Dict[str, Any]):
         """Edita um diagnóstico existente no arquivo do paciente."""
         patient_user = payload.get('patient_user')
         diagnostic_id = payload.get('diagnostic_id')
 
         if not all([patient_user, diagnostic_id]):
-            print("Erro: 'patient_user' e 'diagnostic_id' são necessários para editar.")
+            logger.error("'patient_user' e 'diagnostic_id' são necessários para editar.")
             return
 
         all_diagnostics = self._read_json_file('patient_diagnostics.json')
@@ -168,15 +273,15 @@ class OutboxProcessor:
         if diagnostic_found:
             all_diagnostics[patient_user] = patient_diagnostics
             self._write_json_file('patient_diagnostics.json', all_diagnostics)
-            print(f"Diagnóstico {diagnostic_id} atualizado para {patient_user}.")
+            logger.debug("Diagnóstico %s atualizado para %s.", diagnostic_id, patient_user)
         else:
-            print(f"Diagnóstico {diagnostic_id} não encontrado para {patient_user}.")
+            logger.warning("Diagnóstico %s não encontrado para %s.", diagnostic_id, patient_user)
 
     def _handle_event_add(self, payload: Dict[str, Any]):
         """Adiciona um novo evento (consulta/exame) ao arquivo do paciente."""
         patient_user = payload.get('patient_user')
         if not patient_user:
-            print("Erro: 'patient_user' não encontrado no payload do evento.")
+            logger.error("'patient_user' não encontrado no payload do evento.")
             return
 
         all_events = self._read_json_file('patient_events.json')
@@ -188,7 +293,7 @@ class OutboxProcessor:
         all_events[patient_user] = patient_events
         
         self._write_json_file('patient_events.json', all_events)
-        print(f"Evento adicionado para {patient_user}.")
+        logger.debug("Evento adicionado para %s.", patient_user)
 
     def _handle_account_success_login(self, payload: Dict[str, Any]):
         """
@@ -196,7 +301,7 @@ class OutboxProcessor:
         """
         user_data = payload.get('user_data')
         if not user_data or not all(k in user_data for k in ['user', 'profile_type']):
-            print("Erro: Payload de 'success_login' inválido.")
+            logger.error("Payload de 'success_login' inválido.")
             return
 
         session_data = {
@@ -205,7 +310,7 @@ class OutboxProcessor:
             'profile_type': user_data['profile_type']
         }
         self._write_json_file('my_session.json', session_data)
-        print(f"Sessão criada para o usuário: {user_data['user']}.")
+        logger.info("Sessão criada para o usuário: %s.", user_data['user'])
 
 
 # Exemplo de uso (pode ser removido ou comentado depois)
@@ -1,13 +1,11 @@
 from kivy.uix.relativelayout import RelativeLayout
 from kivy.lang import Builder
 from kivy.properties import ListProperty, StringProperty, DictProperty
-from kivy.uix.label import Label
 from kivy.uix.boxlayout import BoxLayout
-import json
-import os
 from datetime import datetime
 from kivy.metrics import dp
 from kivy.app import App
+from auxiliary_classes.recycle_list import message_row, DETAIL_LINE_HEIGHT, DETAIL_BLOCK_HEIGHT
 
 
 # Loads the associated kv file
@@ -17,6 +15,7 @@ class PatientEventsView(RelativeLayout):
     """Read-only view for the patient to see their events."""
     events = ListProperty([])
     logged_in_patient_info = DictProperty({})
+    _rendered_version = None # Store version of the list on screen (see load_events)
 
     def on_kv_post(self, base_widget):
         """Called after the kv rules are applied. Loads initial data."""
@@ -32,95 +31,56 @@ class PatientEventsView(RelativeLayout):
             self.load_events()
 
     def load_logged_in_patient_info(self):
-        """Loads the logged-in patient's data from session.json and account.json."""
-        session_path = self._get_main_dir_path('session.json')
-        accounts_path = self._get_main_dir_path('account.json')
-        patient_user = ""
+        """Loads the logged-in patient's account (the patient or the doctor's own patient profile)."""
+        store = App.get_running_app().store
+        patient_user = store.logged_in_patient_user()
 
-        if os.path.exists(session_path):
-            try:
-                with open(session_path, 'r') as f:
-                    session_data = json.load(f)
-                
-                session_user = session_data.get('user')
-                profile_type = session_data.get('profile_type')
-
-                if session_data.get('logged_in'):
-                    if profile_type == 'patient':
-                        patient_user = session_user
-                    elif profile_type == 'doctor':
-                        # Se um médico está logado, encontramos seu perfil de paciente associado.
-                        with open(accounts_path, 'r', encoding='utf-8') as acc_f:
-                            accounts = json.load(acc_f)
-                        doctor_account = next((acc for acc in accounts if acc.get('user') == session_user), None)
-                        if doctor_account and doctor_account.get('self_patient_id'):
-                            self_patient_account = next((acc for acc in accounts if acc.get('id') == doctor_account.get('self_patient_id')), None)
-                            if self_patient_account:
-                                patient_user = self_patient_account.get('user')
-            except (json.JSONDecodeError, FileNotFoundError):
-                print("Error loading session.json.")
-
-        if patient_user and os.path.exists(accounts_path):
-            with open(accounts_path, 'r', encoding='utf-8') as f:
-                accounts = json.load(f)
-            self.logged_in_patient_info = next((acc for acc in accounts if acc.get('user') == patient_user), {}) # Dispara o on_logged_in_patient_info
+        if patient_user:
+            self.logged_in_patient_info = store.account(patient_user) # Dispara o on_logged_in_patient_info
         
         if not self.logged_in_patient_info:
             print("No patient logged in or session data is invalid.")
             self.events = [] # Limpa a lista se não houver usuário
+            self._rendered_version = None
             self.populate_events_list()
 
     def load_events(self, *args):
-        """Loads the event list for the logged-in patient from the JSON file."""
-        self.events = []
+        """Loads the event list for the logged-in patient from the client store."""
         patient_user = self.logged_in_patient_info.get('user')
-        if not patient_user or not os.path.exists(self._get_main_dir_path('patient_events.json')):
-            self.populate_events_list()
-            return
-
-        try:
-            with open(self._get_main_dir_path('patient_events.json'), 'r', encoding='utf-8') as f:
-                all_events = json.load(f)
-            
-            patient_events = all_events.get(patient_user, [])
-            
-            # Separate past and future events
-            now = datetime.now()
-            future_events = []
-            past_events = []
-            for event in patient_events:
-                try:
-                    event_datetime = datetime.strptime(f"{event.get('date')} {event.get('time')}", '%Y-%m-%d %H:%M')
-                    (future_events if event_datetime > now else past_events).append(event)
-                except (ValueError, TypeError):
-                    past_events.append(event) # Treat events with bad dates as past
-            
-            self.events = sorted(future_events, key=lambda x: (x['date'], x['time'])) + sorted(past_events, key=lambda x: (x['date'], x['time']), reverse=True)
-            self.populate_events_list()
-        except (json.JSONDecodeError, FileNotFoundError):
-            print("Error loading patient_events.json")
-            self.events = []
-            self.populate_events_list()
+        store = App.get_running_app().store
+        topics = [('event', patient_user)]
+        # The store calls this again whenever a sync cycle changes this patient's events.
+        store.watch(self, topics, self.load_events)
+        # The past/future split depends on the clock, so the list is also rebuilt when the minute changes.
+        version = (store.version(topics), datetime.now().strftime('%Y-%m-%d %H:%M'))
+        if version == self._rendered_version:
+            return # Nothing changed since the list was last built
+        self._rendered_version = version
+        patient_events = store.events(patient_user)
+
+        # Separate past and future events
+        now = datetime.now()
+        future_events = []
+        past_events = []
+        for event in patient_events:
+            try:
+                event_datetime = datetime.strptime(f"{event.get('date')} {event.get('time')}", '%Y-%m-%d %H:%M')
+                (future_events if event_datetime > now else past_events).append(event)
+            except (ValueError, TypeError):
+                past_events.append(event) # Treat events with bad dates as past
 
-    def _get_main_dir_path(self, filename):
-        """Constructs the full path to a file in the main project directory."""
-        return os.path.join(App.get_running_app().get_user_data_path(), filename)
+        self.events = sorted(future_events, key=lambda x: (x['date'], x['time'])) + sorted(past_events, key=lambda x: (x['date'], x['time']), reverse=True)
+        self.populate_events_list()
 
     def populate_events_list(self):
-        """Clears and repopulates the event list widget."""
-        events_list_widget = self.ids.events_list
-        events_list_widget.clear_widgets()
-
+        """Rebuilds the rows of the event RecycleView (the <PatientEventItem> template in the .kv)."""
         if not self.events:
-            events_list_widget.add_widget(
-                Label(text='Nenhum exame ou consulta cadastrado.', color=(0,0,0,1))
-            )
+            self.ids.events_list.data = [message_row('Nenhum exame ou consulta cadastrado.')]
             return
 
+        now = datetime.now()
+        rows = []
         for event in self.events:
-            item_container = EventItem()
-            item_container.orientation = 'vertical'
-
             # --- Nome do Evento e Data ---
             date_str = event.get('date', '')
             time_str = event.get('time', '00:00')
@@ -130,21 +90,10 @@ class PatientEventsView(RelativeLayout):
             except (ValueError, TypeError):
                 formatted_date = date_str
                 event_datetime = None
-            
-            item_text = f"[b]{event.get('name', 'N/A')}[/b]\n"
-            item_text += f"{formatted_date} às {time_str}"
-
-            event_label = Label(
-                text=item_text, markup=True, color=(0,0,0,1),
-                halign='left', valign='top', size_hint_y=None, padding=(dp(10), dp(10))
-            )
-            event_label.bind(width=lambda s, w: s.setter('text_size')(s, (w, None)),
-                             texture_size=lambda s, ts: s.setter('height')(s, ts[1]))
-            item_container.add_widget(event_label) # Correctly add to the container
 
             # --- Status do Evento ---
-            now = datetime.now()
             status_text = ""
+            status_color = (0, 0, 0, 1)
             if event_datetime:
                 if event_datetime > now:
                     delta = event_datetime - now
@@ -159,28 +108,28 @@ class PatientEventsView(RelativeLayout):
                     status_text = "Evento já ocorreu."
                     status_color = (0.1, 0.1, 0.5, 1) # Azul
 
-                status_label = Label(
-                    text=status_text, color=status_color, font_size='11sp',
-                    halign='left', valign='top', size_hint_y=None, padding=(dp(10), dp(5))
-                )
-                status_label.bind(width=lambda s, w: s.setter('text_size')(s, (w, None)))
-                status_label.bind(texture_size=lambda s, ts: s.setter('height')(s, ts[1]))
-                item_container.add_widget(status_label) # Correctly add to the container
-
             # --- Descrição (se existir) ---
             description = event.get('description')
-            if description:
-                desc_label = Label(
-                    text=f"[b]Descrição:[/b] {description}", markup=True, color=(0.5, 0.5, 0.5, 1),
-                    halign='left', valign='top', font_size='11sp',
-                    size_hint_y=None, padding=(dp(10), dp(5))
-                )
-                desc_label.bind(width=lambda s, w: s.setter('text_size')(s, (w, None)))
-                desc_label.bind(texture_size=lambda s, ts: s.setter('height')(s, ts[1]))
-                item_container.add_widget(desc_label) # Correctly add to the container
-
-            events_list_widget.add_widget(item_container)
-
-class EventItem(BoxLayout):
-    """Custom widget for an event item, allowing dynamic height."""
-    pass
\ No newline at end of file
+            rows.append({
+                'title': f"[b]{event.get('name', 'N/A')}[/b]\n{formatted_date} às {time_str}",
+                'status': status_text,
+                'status_color': status_color,
+                'description': f"[b]Descrição:[/b] {description}" if description else '',
+                'height': PatientEventItem.row_height(status_text, description),
+            })
+        self.ids.events_list.data = rows
+
+class PatientEventItem(BoxLayout):
+    """
+    A row of the event list. Its layout is defined in the .kv file; the RecycleView
+    reuses the rows while scrolling and sets these properties from each entry of its data.
+    """
+    title = StringProperty('')
+    status = StringProperty('')
+    status_color = ListProperty([0, 0, 0, 1])
+    description = StringProperty('')
+
+    @staticmethod
+    def row_height(status, description):
+        """Height of a row, matching the .kv template (the optional lines collapse when empty)."""
+        return dp(55) + (DETAIL_LINE_HEIGHT if status else 0) + (DETAIL_BLOCK_HEIGHT if description else 0)
\ No newline at end of file
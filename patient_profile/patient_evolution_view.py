@@ -7,8 +7,6 @@ from kivy.uix.textinput import TextInput
 from datetime import datetime
 from kivy.metrics import dp
 from kivy.app import App
-import os
-import json
 
 from auxiliary_classes.date_checker import MONTH_NAME_TO_NUM
 
@@ -43,46 +41,17 @@ class PatientEvolutionView(RelativeLayout):
             self.fill_today_date()
 
     def load_logged_in_patient_info(self):
-        """Carrega os dados do paciente logado a partir de session.json e account.json."""
-        session_path = self._get_main_dir_path('session.json')
-        accounts_path = self._get_main_dir_path('account.json')
-        patient_user = ""
-
-        if os.path.exists(session_path):
-            try:
-                with open(session_path, 'r') as f:
-                    session_data = json.load(f)
-                
-                session_user = session_data.get('user')
-                profile_type = session_data.get('profile_type')
-
-                if session_data.get('logged_in'):
-                    if profile_type == 'patient':
-                        patient_user = session_user
-                    elif profile_type == 'doctor':
-                        with open(accounts_path, 'r', encoding='utf-8') as acc_f:
-                            accounts = json.load(acc_f)
-                        doctor_account = next((acc for acc in accounts if acc.get('user') == session_user), None)
-                        if doctor_account and doctor_account.get('self_patient_id'):
-                            self_patient_account = next((acc for acc in accounts if acc.get('id') == doctor_account.get('self_patient_id')), None)
-                            if self_patient_account:
-                                patient_user = self_patient_account.get('user')
-            except (json.JSONDecodeError, FileNotFoundError):
-                print("Erro ao carregar session.json.")
-
-        if patient_user and os.path.exists(accounts_path):
-            with open(accounts_path, 'r', encoding='utf-8') as f:
-                accounts = json.load(f)
-            self.logged_in_patient_info = next((acc for acc in accounts if acc.get('user') == patient_user), {}) # Dispara o on_logged_in_patient_info
+        """Carrega os dados do paciente logado (o próprio paciente ou o perfil de paciente do médico)."""
+        store = App.get_running_app().store
+        patient_user = store.logged_in_patient_user()
+
+        if patient_user:
+            self.logged_in_patient_info = store.account(patient_user) # Dispara o on_logged_in_patient_info
         
         if not self.logged_in_patient_info:
             print("Nenhum paciente logado ou dados de sessão inválidos.")
             self.ids.metrics_grid.clear_widgets() # Limpa a tela se não houver usuário
 
-    def _get_main_dir_path(self, filename):
-        """Constrói o caminho completo para um arquivo no diretório principal."""
-        return os.path.join(App.get_running_app().get_user_data_path(), filename)
-
     def fill_today_date(self):
         """Preenche os seletores de data com a data atual (de app_data.json ou do sistema)."""
         # Use the system's current date directly
@@ -213,15 +182,7 @@ class PatientEvolutionView(RelativeLayout):
 
     def _get_evolution_data_for_date(self, patient_id, date_str):
         """Busca dados de evolução salvos para um paciente e data específicos."""
-        evolution_path = self._get_main_dir_path('patient_evolution.json')
-        if not patient_id or not os.path.exists(evolution_path):
-            return {}
-        with open(evolution_path, 'r', encoding='utf-8') as f:
-            try:
-                all_evolutions = json.load(f)
-                return all_evolutions.get(patient_id, {}).get(date_str, {})
-            except json.JSONDecodeError:
-                return {}
+        return App.get_running_app().store.evolution(patient_id, date_str)
 
     def enforce_text_limit(self, text_input, max_length):
         """Impõe um limite máximo de caracteres em um TextInput."""
@@ -25,30 +25,22 @@ class PatientAppSettingsView(RelativeLayout):
 
     def change_password(self):
         """Navigates to the change password screen."""
-        session_path = self._get_main_dir_path('session.json')
-        if os.path.exists(session_path):
-            with open(session_path, 'r', encoding='utf-8') as f:
-                session_data = json.load(f)
-            user_name = session_data.get('user')
-            if user_name:
-                change_password_screen = App.get_running_app().manager.get_screen('change_password')
-                change_password_screen.ids.change_password_view_content.current_user_name = user_name
-                App.get_running_app().manager.push('change_password')
-            else:
-                print("Erro: Usuário não encontrado na sessão.")
-                # TODO: Show popup
+        user_name = App.get_running_app().session.user
+        if user_name:
+            change_password_screen = App.get_running_app().manager.get_screen('change_password')
+            change_password_screen.ids.change_password_view_content.current_user_name = user_name
+            App.get_running_app().manager.push('change_password')
+        else:
+            print("Erro: Usuário não encontrado na sessão.")
+            # TODO: Show popup
 
     def delete_account(self):
         """
         Deleta todos os dados associados à conta do paciente atual.
         Esta é uma ação destrutiva e irreversível.
         """
-        # Obter usuário e ID do paciente da sessão
-        session_path = self._get_main_dir_path('session.json')
-        if not os.path.exists(session_path): return
-        with open(session_path, 'r') as f:
-            session_data = json.load(f)
-        patient_user = session_data.get('user')
+        # Obter usuário do paciente da sessão
+        patient_user = App.get_running_app().session.user
         if not patient_user: return
 
         # Adiciona mensagem ao outbox_messages.json ANTES de deletar os dados locais.
@@ -0,0 +1,80 @@
+"""
+Logging do Placebo: limite de mensagens DEBUG repetidas, formatação preguiçosa e escrita pela fila.
+"""
+import io
+import logging
+import unittest
+from unittest import mock
+
+from auxiliary_classes import app_logging
+from auxiliary_classes.app_logging import DebugRateLimiter, ROOT_LOGGER, configure_logging, get_logger
+
+
+def record(msg, level=logging.DEBUG, name="placebo.test", args=()):
+    return logging.LogRecord(name, level, __file__, 0, msg, args, None)
+
+
+class DebugRateLimiterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = mock.patch.object(app_logging.time, 'monotonic', return_value=100.0)
+        self.now = self.clock.start()
+        self.limiter = DebugRateLimiter(burst=2, interval=10.0)
+
+    def tearDown(self):
+        self.clock.stop()
+
+    def test_repeated_debug_messages_are_limited_per_window(self):
+        passed = [self.limiter.filter(record("Mensagem %s", args=(i,))) for i in range(5)]
+        self.assertEqual(passed, [True, True, False, False, False])
+        # Outra mensagem (ou outro logger) tem a sua própria janela.
+        self.assertTrue(self.limiter.filter(record("Outra")))
+        self.assertTrue(self.limiter.filter(record("Mensagem %s", name="placebo.outro", args=(0,))))
+
+    def test_next_window_reports_the_dropped_count(self):
+        for _ in range(5):
+            self.limiter.filter(record("Mensagem"))
+        self.now.return_value = 110.0
+        first = record("Mensagem")
+        self.assertTrue(self.limiter.filter(first))
+        self.assertEqual(first.getMessage(), "Mensagem (+3 mensagens iguais suprimidas)")
+
+    def test_info_and_above_are_never_limited(self):
+        self.assertTrue(all(self.limiter.filter(record("Aviso", level=logging.INFO)) for _ in range(10)))
+
+
+class LoggingSetupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = logging.getLogger(ROOT_LOGGER)
+        self.saved = (self.root.level, list(self.root.handlers), self.root.propagate)
+
+    def tearDown(self):
+        app_logging._stop_listener()
+        app_logging._listener = None
+        self.root.level, self.root.handlers, self.root.propagate = self.saved[0], self.saved[1], self.saved[2]
+
+    def test_arguments_are_not_formatted_below_the_level(self):
+        self.root.setLevel(logging.INFO)
+        value = mock.MagicMock()
+        get_logger('test').debug("Valor %s", value)
+        value.__str__.assert_not_called()
+
+    def test_records_are_written_by_the_queue_listener_at_the_configured_level(self):
+        stream = io.StringIO()
+        listener = configure_logging('WARNING', stream=stream)
+        self.assertIs(configure_logging('INFO'), listener) # A segunda chamada só ajusta o nível
+
+        logger = get_logger('test')
+        logger.debug("Escondida")
+        logger.info("Entrada %d", 7)
+        app_logging._stop_listener()
+
+        output = stream.getvalue()
+        self.assertIn("INFO    placebo.test: Entrada 7", output)
+        self.assertNotIn("Escondida", output)
+        self.assertFalse(self.root.propagate)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+"""
+Importação em massa de leituras de evolução em várias mensagens 'bulk_fill', uma por lote.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from auxiliary_classes.evolution_import import build_bulk_fill_payloads
+from backend.local_backend import LocalBackend
+from outbox_handler.outbox_processor import OutboxProcessor
+
+
+class BulkFillTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        for folder in ('backend', 'inbox_handler', 'outbox_handler'):
+            os.makedirs(os.path.join(self.workspace, folder))
+        self.outbox = OutboxProcessor(self.workspace)
+        self.outbox.add_to_outbox("account", "create_account", {"profile_type": "patient", "name": "peu", "user": "peu",
+                                                                "password": "123456", "patient_info": {}},
+                                  origin_user_override='peu')
+        LocalBackend(self.workspace).run_processing_cycle()
+
+        self.csv_path = os.path.join(self.workspace, 'leituras.csv')
+        with open(self.csv_path, 'w', encoding='utf-8') as f:
+            f.write("date,weight\n2030-01-01,70\n2030-01-02,71\n31/02/2030,72\n2030-01-04,73\n2030-01-05,abc\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def test_one_message_per_batch_and_a_single_summary(self):
+        # Orçamento de uma mensagem por ciclo: o resumo precisa sobreviver entre ciclos (e backends).
+        backend = LocalBackend(self.workspace, max_messages_per_cycle=1)
+        patient_id = next(acc['id'] for acc in backend.db.get_accounts() if acc['user'] == 'peu')
+        payloads = build_bulk_fill_payloads(patient_id, self.csv_path, batch_size=2)
+
+        self.assertEqual([len(p['readings']) for p in payloads], [2, 1, 0])
+        self.assertEqual({p['import_id'] for p in payloads}, {payloads[0]['import_id']})
+        self.assertEqual([(p['batch'], p['batches']) for p in payloads], [(1, 3), (2, 3), (3, 3)])
+
+        for payload in payloads:
+            self.outbox.add_to_outbox("evolution", "bulk_fill", payload, origin_user_override='peu')
+        for _ in payloads:
+            LocalBackend(self.workspace, max_messages_per_cycle=1).run_processing_cycle()
+
+        inbox = backend.db._read_db(backend.inbox_path)
+        summaries = [msg['payload'] for msg in inbox if msg['action'] == 'bulk_fill_cback']
+        self.assertEqual(len(summaries), 1)
+        self.assertEqual((summaries[0]['accepted'], summaries[0]['rejected']), (3, 2))
+        self.assertEqual([row['row'] for row in summaries[0]['rejected_rows']], [4, 6])
+
+        evolution = backend.db.get_patient_data('patient_evolution.json')[patient_id]
+        self.assertEqual(sorted(evolution), ["2030-01-01", "2030-01-02", "2030-01-04"])
+        self.assertEqual(backend.db._read_db(backend.bulk_imports_path), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Versões das coleções do ClientCache: conhecidas só pelo snapshot e pelos patches do servidor.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from backend.database_manager import PersistenceService
+from inbox_handler.client_cache import ClientCache
+
+
+def patch(version, record_id):
+    return {"collection": "medication", "patient_id": "20000001", "patient_user": "maria", "version": version,
+            "changes": [{"op": "upsert", "id": record_id, "record": {"id": record_id}}]}
+
+
+def snapshot(version):
+    return {"user": "maria", "patients": [{"id": "20000001", "user": "maria", "collections": {
+        "medication": {"version": version, "records": {"med1": {"id": "med1"}}}}}]}
+
+
+class ClientCacheVersionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.workspace, 'backend'))
+        with open(os.path.join(self.workspace, 'patient_medications.json'), 'w', encoding='utf-8') as f:
+            json.dump({"maria": [{"id": "med1"}]}, f)
+        self.cache = ClientCache(PersistenceService(self.workspace))
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def test_patches_continue_from_the_snapshot_version(self):
+        self.cache.load_snapshot(snapshot(3))
+
+        self.assertEqual(self.cache.version("medication", "maria"), 3)
+        self.assertFalse(self.cache.apply_patch(patch(3, "med_old")))
+        self.assertTrue(self.cache.apply_patch(patch(4, "med2")))
+        self.assertEqual(list(self.cache.records("medication", "maria")), ["med1", "med2"])
+        self.assertEqual(self.cache.version("medication", "maria"), 4)
+        self.assertFalse(self.cache.snapshot_needed)
+
+    def test_collection_read_from_files_has_no_version_and_requests_a_snapshot(self):
+        # Mesmo com um arquivo de versões do backend presente, o cliente não o lê.
+        with open(os.path.join(self.workspace, 'backend', 'sync_versions.json'), 'w', encoding='utf-8') as f:
+            json.dump({"medication/maria": 8}, f)
+        self.assertEqual(list(self.cache.records("medication", "maria")), ["med1"])
+        self.assertIsNone(self.cache.version("medication", "maria"))
+
+        self.assertTrue(self.cache.apply_patch(patch(9, "med2")))
+        self.assertTrue(self.cache.snapshot_needed)
+        self.assertIsNone(self.cache.version("medication", "maria")) # Descartada, não atualizada
+
+        self.cache.load_snapshot(snapshot(9))
+        self.assertFalse(self.cache.snapshot_needed)
+        self.assertEqual(self.cache.version("medication", "maria"), 9)
+
+    def test_version_gap_drops_the_collection_and_requests_a_snapshot(self):
+        self.cache.load_snapshot(snapshot(3))
+        self.assertTrue(self.cache.apply_patch(patch(5, "med3")))
+        self.assertTrue(self.cache.snapshot_needed)
+        self.assertIsNone(self.cache.version("medication", "maria"))
+
+
+if __name__ == '__main__':
+    unittest.main()
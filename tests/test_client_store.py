@@ -0,0 +1,117 @@
+"""
+ClientStore: dados do cliente em memória, consultas tipadas e eventos de alteração por tópico.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from collections import Counter
+from unittest import mock
+
+from auxiliary_classes.session_service import SessionService
+from backend.database_manager import PersistenceService
+from inbox_handler.client_store import ACCOUNTS, ClientStore
+
+ACCOUNTS_DATA = [
+    {"id": "10000001", "user": "ana", "profile_type": "doctor", "self_patient_id": "20000002"},
+    {"id": "20000001", "user": "maria", "profile_type": "patient", "patient_info": {"tracked_metrics": ["peso"]}},
+    {"id": "20000002", "user": "ana_patient_profile", "profile_type": "patient", "patient_info": {}},
+]
+
+
+def snapshot():
+    return {"user": "maria", "patients": [{"id": "20000001", "user": "maria", "collections": {
+        "medication": {"version": 1, "records": {"med1": {"id": "med1"}}},
+        "event": {"version": 1, "records": {}}}}]}
+
+
+def patch(collection, version, record_id):
+    return {"collection": collection, "patient_id": "20000001", "patient_user": "maria", "version": version,
+            "changes": [{"op": "upsert", "id": record_id, "record": {"id": record_id}}]}
+
+
+class ClientStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        self.db = PersistenceService(self.workspace)
+        self.db._write_db('account.json', ACCOUNTS_DATA)
+        self.session = SessionService(self.workspace)
+        self.session.login("maria", "patient")
+        self.store = ClientStore(self.workspace, self.db, self.session)
+        self.store.load_snapshot(snapshot())
+        self.store.publish_changes()
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def test_typed_queries(self):
+        self.assertEqual(self.store.account("maria")["id"], "20000001")
+        self.assertEqual(self.store.account_by_id("10000001")["user"], "ana")
+        self.assertEqual(self.store.account("ninguem"), {})
+        self.assertEqual(self.store.patient_settings("maria"), {"tracked_metrics": ["peso"], "id": "20000001"})
+        self.assertEqual(self.store.medications("maria"), [{"id": "med1"}])
+        self.assertEqual(self.store.logged_in_patient_user(), "maria")
+
+        self.session.login("ana", "doctor")
+        self.assertEqual(self.store.logged_in_patient_user(), "ana_patient_profile")
+
+    def test_accounts_are_parsed_once_until_the_file_changes(self):
+        with mock.patch.object(self.db, 'get_accounts', wraps=self.db.get_accounts) as get_accounts:
+            for _ in range(5):
+                self.store.account("maria")
+                self.store.accounts()
+            self.assertEqual(get_accounts.call_count, 1)
+
+            self.db._write_db('account.json', ACCOUNTS_DATA + [{"id": "20000003", "user": "joao"}])
+            self.assertEqual(self.store.account("joao")["id"], "20000003")
+            self.assertEqual(get_accounts.call_count, 2)
+
+    def test_watchers_are_called_once_per_publication_for_their_topics(self):
+        calls = Counter()
+        for owner, topic in (("medications", ("medication", "maria")), ("events", ("event", "maria")),
+                             ("other_patient", ("medication", "joao"))):
+            self.store.watch(owner, [topic], lambda owner=owner: calls.update([owner]))
+
+        self.store.apply_patch(patch("medication", 2, "med2"))
+        self.store.apply_patch(patch("medication", 3, "med3"))
+        self.assertEqual(self.store.publish_changes(), {("medication", "maria")})
+        self.assertEqual(calls, {"medications": 1})
+
+        self.assertEqual(self.store.publish_changes(), set()) # Nada novo: ninguém é chamado
+        self.store.unwatch("medications")
+        self.store.apply_patch(patch("medication", 4, "med4"))
+        self.store.publish_changes()
+        self.assertEqual(calls["medications"], 1)
+
+    def test_account_file_changes_are_published_to_account_watchers(self):
+        self.store.accounts()
+        seen = []
+        self.store.watch("settings", [ACCOUNTS], lambda: seen.append(True))
+        self.db._write_db('account.json', ACCOUNTS_DATA[:2])
+
+        self.assertEqual(self.store.publish_changes(), {ACCOUNTS})
+        self.assertEqual(seen, [True])
+
+    def test_logout_discards_the_cache_and_notifies_every_watcher(self):
+        seen = []
+        self.store.watch("medications", [("medication", "maria")], lambda: seen.append(True))
+        self.session.logout()
+
+        self.store.publish_changes()
+        self.assertEqual(seen, [True])
+        self.assertEqual(self.store.cache.snapshot_info, {})
+
+    def test_reference_data_is_read_once(self):
+        path = os.path.join(self.workspace, 'cid10.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump([{"code": "A00"}], f)
+        self.assertEqual(self.store.reference_data('cid10.json'), [{"code": "A00"}])
+        os.remove(path)
+        self.assertEqual(self.store.reference_data('cid10.json'), [{"code": "A00"}])
+        self.assertEqual(self.store.reference_data('generic_medications.json', {}), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
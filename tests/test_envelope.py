@@ -0,0 +1,93 @@
+"""
+Envelopes ('envelope/apply_operations'): operações aplicadas em ordem, de forma atômica, com um só comeback.
+"""
+import copy
+import os
+import shutil
+import tempfile
+import unittest
+
+from backend.local_backend import LocalBackend
+from outbox_handler.outbox_log import OutboxLog
+
+ACCOUNTS = [
+    {"id": "20000001", "user": "peu", "profile_type": "patient", "invitations": ["10000001", "10000002"],
+     "patient_info": {"tracked_metrics": ["peso"], "responsible_doctors": []}},
+    {"id": "10000001", "user": "ana", "name": "Ana", "profile_type": "doctor", "linked_patients": []},
+    {"id": "10000002", "user": "bia", "name": "Bia", "profile_type": "doctor", "linked_patients": []},
+]
+MEDICATIONS = {"peu": [{"id": "med1", "generic_name": "x"}, {"id": "med2", "generic_name": "y"}]}
+
+OPERATIONS = [
+    {"object": "medication", "action": "delete_med", "payload": {"med_id": "med1", "patient_user": "peu"}},
+    {"object": "linking_accounts", "action": "respond_to_invitation", "payload": {"doctor_id": "10000001", "response": "accept"}},
+    {"object": "linking_accounts", "action": "respond_to_invitation", "payload": {"doctor_id": "10000002", "response": "accept"}},
+]
+
+
+class EnvelopeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        for folder in ('backend', 'inbox_handler', 'outbox_handler'):
+            os.makedirs(os.path.join(self.workspace, folder))
+        self.backend = LocalBackend(self.workspace)
+        self.backend.db._write_db('account.json', copy.deepcopy(ACCOUNTS))
+        self.backend.db._write_db('patient_medications.json', copy.deepcopy(MEDICATIONS))
+        self.log = OutboxLog(os.path.join(self.workspace, 'outbox_handler'))
+        self.sequence = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def _run(self, *messages):
+        for obj, action, payload in messages:
+            self.sequence += 1
+            self.log.append({"message_id": f"m{self.sequence}", "origin_user_id": "peu", "origin_device_id": "d1",
+                             "sequence": self.sequence, "object": obj, "action": action, "payload": payload})
+        self.backend.run_processing_cycle()
+        inbox = self.backend.db._read_db(self.backend.inbox_path)
+        self.backend.db._write_db(self.backend.inbox_path, [])
+        return [msg for msg in inbox if msg["action"] != "ack_outbox"]
+
+    def _state(self):
+        return {filename: self.backend.db._read_db(filename) for filename in ('account.json', 'patient_medications.json')}
+
+    def test_envelope_applies_in_order_with_one_comeback(self):
+        inbox = self._run(("envelope", "apply_operations", {"operations": OPERATIONS}))
+        comebacks = [msg for msg in inbox if msg["action"].endswith("_cback")]
+        self.assertEqual([msg["action"] for msg in comebacks], ["apply_operations_cback"])
+        self.assertTrue(comebacks[0]["payload"]["executed"])
+        self.assertEqual([r["action"] for r in comebacks[0]["payload"]["results"]],
+                         ["delete_med", "respond_to_invitation", "respond_to_invitation"])
+
+        state = self._state()
+        self.assertEqual([med["id"] for med in state["patient_medications.json"]["peu"]], ["med2"])
+        patient = state["account.json"][0]
+        self.assertEqual(patient["invitations"], [])
+        self.assertEqual(patient["patient_info"]["responsible_doctors"], ["10000001", "10000002"])
+
+    def test_failed_operation_rolls_back_the_whole_envelope(self):
+        before = self._state()
+        failing = OPERATIONS + [{"object": "linking_accounts", "action": "invite_patient",
+                                 "payload": {"patient_user_to_invite": "ninguem"}}]
+        inbox = self._run(("envelope", "apply_operations", {"operations": failing}))
+
+        self.assertEqual(self._state(), before)
+        self.assertEqual([msg["action"] for msg in inbox], ["apply_operations_cback"]) # Nada é publicado
+        payload = inbox[0]["payload"]
+        self.assertFalse(payload["executed"])
+        self.assertTrue(payload["reason"].startswith("Operação 4 (invite_patient) falhou"))
+        self.assertEqual(len(self.backend.sync_versions.savepoint()[0]), 0)
+
+    def test_session_actions_are_not_allowed_in_an_envelope(self):
+        inbox = self._run(("envelope", "apply_operations", {"operations": [
+            {"object": "account", "action": "try_logout", "payload": {}}] + OPERATIONS}))
+
+        self.assertFalse(inbox[0]["payload"]["executed"])
+        self.assertIn("account/try_logout", inbox[0]["payload"]["reason"])
+        self.assertEqual(self._state()["patient_medications.json"], MEDICATIONS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Alocação de IDs de conta em blocos reservados (backend/id_allocator.py).
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from backend.database_manager import PersistenceService
+from backend.id_allocator import IdAllocator
+
+
+class IdAllocatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.workspace, 'backend'))
+        self.db = PersistenceService(self.workspace)
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def test_ids_are_unique_eight_digit_strings(self):
+        allocator = IdAllocator(self.db, block_size=16)
+        ids = [allocator.next_id() for _ in range(1000)]
+        self.assertEqual(len(set(ids)), 1000)
+        self.assertTrue(all(len(i) == 8 and i.isdigit() and i[0] != '0' for i in ids))
+
+    def test_no_reuse_across_reservations(self):
+        first = IdAllocator(self.db, block_size=8)
+        issued = [first.next_id() for _ in range(3)] # Bloco reservado, mas usado só em parte
+        self.assertEqual(self.db._read_db(IdAllocator.STATE_FILE), {'next_block_start': 8})
+
+        # Um novo processo começa no próximo bloco; o resto do bloco anterior é descartado.
+        second = IdAllocator(self.db, block_size=8)
+        issued += [second.next_id() for _ in range(10)]
+        self.assertEqual(len(set(issued)), len(issued))
+        self.assertEqual(second._counter_to_id(8), issued[3])
+        self.assertEqual(self.db._read_db(IdAllocator.STATE_FILE), {'next_block_start': 24})
+
+    def test_existing_and_legacy_ids_are_skipped(self):
+        probe = IdAllocator(self.db)
+        taken = [probe._counter_to_id(0), probe._counter_to_id(2)]
+        self.db.save_accounts([{"id": taken[0], "user": "peu", "profile_type": "patient"}])
+        self.db._write_db('doctor_ids.json', [taken[1]])
+
+        allocator = IdAllocator(self.db)
+        ids = [allocator.next_id() for _ in range(3)]
+        self.assertEqual(ids, [probe._counter_to_id(1), probe._counter_to_id(3), probe._counter_to_id(4)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+"""
+Identificadores monotônicos e ordenáveis pelo tempo (auxiliary_classes/id_generator.py).
+"""
+import time
+import unittest
+from unittest import mock
+
+from auxiliary_classes import id_generator
+from auxiliary_classes.id_generator import id_timestamp_ms, new_id
+
+
+class IdGeneratorTest(unittest.TestCase):
+
+    def setUp(self):
+        # Isola o estado do gerador: os relógios simulados abaixo não vazam para outros testes.
+        patcher = mock.patch.multiple(id_generator, _last_ms=-1, _last_random=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ids_are_strictly_increasing_within_the_same_millisecond(self):
+        with mock.patch.object(id_generator.time, 'time', return_value=4102444800.0):
+            ids = [new_id("msg_") for _ in range(500)]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), 500)
+        self.assertTrue(all(len(i) == len("msg_") + 26 for i in ids))
+
+    def test_ids_stay_increasing_when_the_clock_goes_back(self):
+        with mock.patch.object(id_generator.time, 'time', return_value=4102444900.0):
+            later = new_id()
+        with mock.patch.object(id_generator.time, 'time', return_value=4102444800.0):
+            earlier_clock = new_id()
+        self.assertLess(later, earlier_clock)
+
+    def test_timestamp_is_recovered_from_the_id(self):
+        before = int(time.time() * 1000)
+        self.assertGreaterEqual(id_timestamp_ms(new_id("med"), "med"), before)
+        with mock.patch.object(id_generator.time, 'time', return_value=4102444800.123):
+            self.assertEqual(id_timestamp_ms(new_id("evt"), "evt"), 4102444800123)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Núcleo do inbox sem interface: backend, outbox e InboxCore rodando sem Kivy, com as intenções de UI como dados.
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from auxiliary_classes.session_service import SessionService
+from backend.local_backend import LocalBackend
+from inbox_handler.inbox_core import InboxCore
+from outbox_handler.outbox_processor import OutboxProcessor
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class InboxCoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        for folder in ('backend', 'inbox_handler', 'outbox_handler'):
+            os.makedirs(os.path.join(self.workspace, folder))
+        self.backend = LocalBackend(self.workspace)
+        self.session = SessionService(self.workspace)
+        self.outbox = OutboxProcessor(self.workspace, self.session)
+        self.core = InboxCore(self.workspace, self.backend.db, self.session, self.outbox)
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def _send(self, obj, action, payload, user=None):
+        self.outbox.add_to_outbox(obj, action, payload, origin_user_override=user)
+        self.outbox.flush()
+        request_id = self.outbox.outbox_log.pending_messages()[-1]["message_id"]
+        self.backend.run_processing_cycle()
+        return request_id
+
+    def _create_and_login(self):
+        request_id = self._send("account", "create_account", {"profile_type": "patient", "name": "Peu", "user": "peu",
+                                                              "password": "123456", "patient_info": {"tracked_metrics": []}},
+                                'peu')
+        self.core.process_all(request_id)
+        request_id = self._send("account", "try_login", {"user": "peu", "password": "123456"}, 'peu')
+        return self.core.process_all(request_id)
+
+    def test_core_does_not_import_kivy(self):
+        code = ("import sys, inbox_handler.inbox_core; "
+                "sys.exit(any(name.split('.')[0] == 'kivy' for name in sys.modules))")
+        self.assertEqual(subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT).returncode, 0)
+
+    def test_login_response_creates_the_session_and_returns_intents(self):
+        batch = self._create_and_login()
+
+        self.assertEqual(self.session.user, "peu")
+        self.assertEqual(batch.intents[0], {"type": "reset_to", "screen": "patient_home"})
+        self.assertEqual(batch.intents[1]["type"], "clear_pending_request")
+        # O ack do ciclo foi aplicado: o outbox do dispositivo está vazio.
+        self.assertEqual(len(self.outbox.outbox_log.pending_messages()), 0)
+
+    def test_messages_are_applied_once_and_other_users_messages_are_dropped(self):
+        self._create_and_login()
+        self._send("medication", "add_med", {"patient_user": "peu", "id": "med1"})
+        self.backend.db._write_db(self.backend.inbox_path, self.backend.db._read_db(self.backend.inbox_path) + [
+            {"message_id": "legacy", "timestamp": "t", "origin_user_id": "peu", "object": "medication",
+             "action": "add_med_cback", "payload": {"executed": True, "request_message_id": "x"}},
+            {"message_id": "other", "timestamp": "t", "origin_user_id": "ana", "server_sequence": 999,
+             "object": "medication", "action": "add_med_cback", "payload": {"executed": True}},
+        ])
+        inbox = self.backend.db._read_db(self.backend.inbox_path)
+
+        batch = self.core.process_all()
+        self.assertEqual(batch.processed, 3) # Patch, ack do ciclo e a mensagem sem sequência
+        self.assertEqual(list(self.core.cache.records("medication", "peu")), ["med1"])
+        self.assertEqual(batch.deferred["success_popup"]["message"], "Medicação adicionada!")
+        self.assertEqual(self.backend.db._read_db(self.backend.inbox_path), [])
+
+        # A mesma entrega de novo (ex: reenvio): a marca d'água e o histórico de IDs a ignoram.
+        self.backend.db._write_db(self.backend.inbox_path, inbox)
+        self.assertEqual(self.core.process_all().processed, 0)
+
+    def test_account_deletion_forces_a_logout(self):
+        self._create_and_login()
+        self._send("account", "delete_account", {})
+        batch = self.core.process_all()
+
+        self.assertFalse(self.session.logged_in)
+        self.assertIn({"type": "reset_to", "screen": "initial_access"}, batch.intents)
+
+
+if __name__ == '__main__':
+    unittest.main()
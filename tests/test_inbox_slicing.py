@@ -0,0 +1,99 @@
+"""
+Aplicação do inbox em fatias (InboxCore.apply com prazo) e intenções de UI combinadas no fim do lote.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from auxiliary_classes.session_service import SessionService
+from backend.database_manager import PersistenceService
+from inbox_handler.inbox_core import InboxCore
+from outbox_handler.outbox_processor import OutboxProcessor
+
+
+def comeback(sequence, action="add_med_cback", executed=True, user="ana"):
+    return {"message_id": f"s{sequence}", "timestamp": "t", "origin_user_id": user, "server_sequence": sequence,
+            "object": "medication", "action": action,
+            "payload": {"executed": executed, "reason": f"motivo {sequence}", "request_message_id": f"q{sequence}"}}
+
+
+class InboxSlicingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        for folder in ('backend', 'inbox_handler', 'outbox_handler'):
+            os.makedirs(os.path.join(self.workspace, folder))
+        self.session = SessionService(self.workspace)
+        self.session.login("ana", "doctor")
+        outbox = OutboxProcessor(self.workspace, self.session)
+        self.core = InboxCore(self.workspace, PersistenceService(self.workspace), self.session, outbox)
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def _write_inbox(self, messages):
+        with open(self.core.inbox_path, 'w', encoding='utf-8') as f:
+            json.dump(messages, f)
+
+    def _read_inbox(self):
+        with open(self.core.inbox_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_expired_deadline_applies_one_message_per_slice(self):
+        messages = [comeback(seq) for seq in range(1, 6)]
+        self._write_inbox(messages)
+        batch = self.core.begin_batch()
+
+        slices = 1
+        while not self.core.apply(batch, deadline=0): # Prazo já vencido: uma mensagem por fatia
+            slices += 1
+            # Nada é persistido entre as fatias.
+            self.assertEqual(self._read_inbox(), messages)
+            self.assertFalse(os.path.exists(self.core.sequence_state_path))
+        self.assertEqual((slices, batch.index), (5, 5))
+
+        self.assertEqual(self.core.finish_batch(batch), 5)
+        self.assertEqual(self._read_inbox(), [])
+        self.assertEqual(self.core._sequence_watermark, 5)
+
+    def test_without_deadline_the_whole_batch_is_applied_at_once(self):
+        self._write_inbox([comeback(seq) for seq in range(1, 6)])
+        batch = self.core.begin_batch()
+        self.assertTrue(self.core.apply(batch))
+        self.assertEqual(batch.processed, 5)
+
+    def test_popups_are_coalesced_into_one_per_kind_at_the_end_of_the_batch(self):
+        self._write_inbox([comeback(1), comeback(2, executed=False), comeback(3), comeback(4), comeback(5, executed=False)])
+        batch = self.core.begin_batch()
+        while not self.core.apply(batch, deadline=0):
+            self.assertEqual(batch.take_intents(), []) # Popups nunca saem no meio do lote
+
+        self.assertEqual(list(batch.deferred.values()), [
+            {"type": "popup", "message": "Medicação adicionada! (+2)", "success": True},
+            {"type": "popup", "message": "Erro: motivo 5 (+1)", "success": False},
+        ])
+
+    def test_navigation_intents_are_returned_with_the_slice_that_produced_them(self):
+        self._write_inbox([comeback(1), comeback(2, action="change_password_cback"), comeback(3)])
+        batch = self.core.begin_batch()
+
+        self.core.apply(batch, deadline=0)
+        self.assertEqual(batch.take_intents(), [])
+        self.core.apply(batch, deadline=0)
+        self.assertEqual(batch.take_intents(), [{"type": "close_change_password"}])
+
+    def test_views_are_notified_once_per_batch(self):
+        self._write_inbox([comeback(seq) for seq in range(1, 4)])
+        with mock.patch.object(self.core.store, 'publish_changes') as publish:
+            batch = self.core.begin_batch()
+            while not self.core.apply(batch, deadline=0):
+                publish.assert_not_called()
+            self.core.finish_batch(batch)
+        publish.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+"""
+Gerador de carga do backend (backend/load_generator.py) numa execução pequena e reprodutível.
+"""
+import logging
+import shutil
+import unittest
+
+from auxiliary_classes.app_logging import ROOT_LOGGER
+from backend.load_generator import LoadGenerator, prepare_workspace
+
+
+class LoadGeneratorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = prepare_workspace()
+        level = logging.getLogger(ROOT_LOGGER).level
+        self.addCleanup(logging.getLogger(ROOT_LOGGER).setLevel, level)
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def _run(self):
+        generator = LoadGenerator(self.workspace, doctors=2, patients=4, seed=7)
+        generator.setup()
+        return generator, generator.run(cycles=3, messages_per_cycle=15)
+
+    def test_every_generated_message_is_processed_and_acknowledged(self):
+        generator, report = self._run()
+
+        self.assertEqual(report["cycles"], 3)
+        self.assertEqual(report["messages_generated"], 45)
+        self.assertEqual(report["messages_processed"], report["messages_generated"])
+        self.assertEqual(report["backlog"], 0)
+        self.assertEqual(len(generator.outbox), 0)
+        self.assertEqual(set(report["cycle_latency"]), {"p50_ms", "p95_ms", "p99_ms", "max_ms", "mean_ms"})
+        self.assertGreater(report["messages_per_second"], 0)
+
+        # Na preparação, todo paciente aceitou ao menos um convite.
+        for acc in generator.backend.db.get_accounts():
+            if acc["profile_type"] == "patient":
+                self.assertTrue(acc["patient_info"]["responsible_doctors"])
+
+    def test_backend_logs_are_silenced_by_default(self):
+        self._run()
+        self.assertEqual(logging.getLogger(ROOT_LOGGER).level, logging.ERROR)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+"""
+Snapshot do conjunto de trabalho enviado após o login e aplicado no cache do cliente.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from auxiliary_classes.session_service import SessionService
+from backend.local_backend import LocalBackend
+from inbox_handler.inbox_core import InboxCore
+from outbox_handler.outbox_processor import OutboxProcessor
+
+
+class LoginSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        for folder in ('backend', 'inbox_handler', 'outbox_handler'):
+            os.makedirs(os.path.join(self.workspace, folder))
+        with open(os.path.join(self.workspace, 'cid10.json'), 'w', encoding='utf-8') as f:
+            f.write('[{"code": "A00"}]')
+        self.backend = LocalBackend(self.workspace)
+        self.outbox = OutboxProcessor(self.workspace)
+        self._send("account", "create_account", {"profile_type": "patient", "name": "Peu", "user": "peu",
+                                                 "password": "123456", "patient_info": {"tracked_metrics": ["peso"]}}, 'peu')
+        self._send("account", "create_account", {"profile_type": "doctor", "name": "Ana", "user": "ana",
+                                                 "password": "123456", "is_also_patient": False}, 'ana')
+        ids = {acc['user']: acc['id'] for acc in self.backend.db.get_accounts()}
+        self.patient_id, doctor_id = ids['peu'], ids['ana']
+        self._send("linking_accounts", "invite_patient", {"patient_user_to_invite": "peu"}, 'ana')
+        self._send("linking_accounts", "respond_to_invitation", {"doctor_id": doctor_id, "response": "accept"}, 'peu')
+        self._send("medication", "add_med", {"patient_user": "peu", "id": "med1"}, 'ana')
+        self._send("medication", "add_med", {"patient_user": "peu", "id": "med2"}, 'ana')
+        self._clear_inbox()
+
+        self.session = SessionService(self.workspace)
+        self.core = InboxCore(self.workspace, self.backend.db, self.session, self.outbox)
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def _send(self, obj, action, payload, user):
+        self.outbox.add_to_outbox(obj, action, payload, origin_user_override=user)
+        self.outbox.flush()
+        self.backend.run_processing_cycle()
+
+    def _clear_inbox(self):
+        self.backend.db._write_db(self.backend.inbox_path, [])
+
+    @staticmethod
+    def _snapshot(inbox):
+        return [msg["payload"] for msg in inbox if msg["action"] == "snapshot"][-1]
+
+    def _login(self, user):
+        self.outbox.add_to_outbox("account", "try_login", {"user": user, "password": "123456"}, origin_user_override=user)
+        self.outbox.flush()
+        request_id = self.outbox.outbox_log.pending_messages()[-1]["message_id"]
+        self.backend.run_processing_cycle()
+        return self.backend.db._read_db(self.backend.inbox_path), request_id
+
+    def test_login_sends_the_working_set_with_versions(self):
+        inbox, _ = self._login("ana")
+        actions = [msg["action"] for msg in inbox if msg["origin_user_id"] == "ana"]
+        self.assertEqual(actions[:2], ["try_login_cback", "snapshot"])
+
+        snapshot = self._snapshot(inbox)
+        self.assertEqual(snapshot["roster"]["patients"], [{"id": self.patient_id, "name": "Peu", "user": "peu"}])
+        patient = snapshot["patients"][0]
+        self.assertEqual(patient["summary"], {"medication": 2, "event": 0, "diagnostic": 0, "evolution": 0})
+        self.assertEqual(patient["collections"]["medication"]["version"], 2)
+        self.assertEqual(list(patient["collections"]["medication"]["records"]), ["med1", "med2"])
+        self.assertEqual(patient["collections"]["tracked_metrics"]["records"], {"tracked_metrics": ["peso"]})
+        self.assertEqual(set(snapshot["reference_data_version"]), {"cid10.json"}) # O outro arquivo não existe aqui
+
+    def test_reference_data_version_follows_the_file_content(self):
+        first = self._snapshot(self._login("ana")[0])["reference_data_version"]["cid10.json"]
+        with open(os.path.join(self.workspace, 'cid10.json'), 'w', encoding='utf-8') as f:
+            f.write('[{"code": "A00"}, {"code": "I10"}]')
+        second = self._snapshot(self._login("ana")[0])["reference_data_version"]["cid10.json"]
+        self.assertNotEqual(first, second)
+
+    def test_client_continues_from_the_snapshot_with_patches(self):
+        _, request_id = self._login("ana")
+        self.core.process_all(pending_request_id=request_id)
+        self.assertEqual(self.session.user, "ana")
+        self.assertEqual(self.core.cache.version("medication", "peu"), 2)
+        self.assertEqual([s["user"] for s in self.core.cache.snapshot_info["summaries"]], ["peu"])
+
+        self._send("medication", "add_med", {"patient_user": "peu", "id": "med3"}, 'peu')
+        self.core.process_all()
+        self.assertEqual(self.core.cache.version("medication", "peu"), 3)
+        self.assertEqual(list(self.core.cache.records("medication", "peu")), ["med1", "med2", "med3"])
+        self.assertFalse(self.core.cache.snapshot_needed)
+
+
+if __name__ == '__main__':
+    unittest.main()
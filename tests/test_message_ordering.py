@@ -0,0 +1,89 @@
+"""
+Ordem de aplicação das mensagens de um dispositivo no backend.
+
+Mensagens de usuários diferentes num mesmo dispositivo (ex: um paciente registra
+uma leitura e sai, outro usuário entra) precisam ser aplicadas na ordem das
+sequências do dispositivo, e nenhuma pode ser confirmada sem ter sido aplicada.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from backend.local_backend import LocalBackend
+from backend.message_scheduler import MessageScheduler
+from outbox_handler.outbox_processor import OutboxProcessor
+
+
+class MessageOrderingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        for folder in ('backend', 'inbox_handler', 'outbox_handler'):
+            os.makedirs(os.path.join(self.workspace, folder))
+        self.backend = LocalBackend(self.workspace)
+        self.outbox = OutboxProcessor(self.workspace)
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def _send(self, obj, action, payload, user):
+        self.outbox.add_to_outbox(obj, action, payload, origin_user_override=user)
+        self.outbox.flush()
+
+    def test_auth_message_does_not_skip_earlier_messages_of_the_same_device(self):
+        for user in ('peu', 'ana'):
+            self._send("account", "create_account", {"profile_type": "patient", "name": user, "user": user,
+                                                     "password": "123456", "is_also_patient": False,
+                                                     "patient_info": {"tracked_metrics": ["peso"]}}, user)
+        self.backend.run_processing_cycle()
+        patient_id = next(acc['id'] for acc in self.backend.db.get_accounts() if acc['user'] == 'peu')
+
+        # seq N+1 e N+2 de 'peu', seq N+3 de outro usuário no mesmo aparelho (prioridade AUTH).
+        self._send("evolution", "fill_metric", {"patient_id": patient_id, "date": "2030-01-01",
+                                                "metrics": {"peso": "70"}}, 'peu')
+        self._send("account", "try_logout", {}, 'peu')
+        self._send("account", "try_login", {"user": "ana", "password": "123456"}, 'ana')
+        self.backend.run_processing_cycle()
+
+        evolution = self.backend.db.get_patient_data('patient_evolution.json')
+        self.assertEqual(evolution.get(patient_id, {}).get("2030-01-01"), {"peso": "70"})
+        self.assertEqual(self.backend._applied_sequences[self.outbox.device_id], self.outbox._next_sequence - 1)
+        self.assertEqual(self.backend._applied_above, {})
+
+    def test_scheduler_keeps_device_order_across_users(self):
+        scheduler = MessageScheduler()
+        messages = [
+            {"message_id": "m1", "origin_device_id": "d1", "origin_user_id": "peu", "sequence": 1,
+             "object": "evolution", "action": "fill_metric"},
+            {"message_id": "m2", "origin_device_id": "d1", "origin_user_id": "peu", "sequence": 2,
+             "object": "account", "action": "try_logout"},
+            {"message_id": "m3", "origin_device_id": "d1", "origin_user_id": "ana", "sequence": 3,
+             "object": "account", "action": "try_login"},
+            {"message_id": "m4", "origin_device_id": "d2", "origin_user_id": "bia", "sequence": 1,
+             "object": "account", "action": "try_login"},
+        ]
+        for msg in messages:
+            scheduler.enqueue(msg)
+        order = [msg["message_id"] for msg in scheduler.next_batch(10)]
+        # O login do outro dispositivo passa na frente; o dispositivo d1 mantém a sua ordem.
+        self.assertEqual(order[0], "m4")
+        self.assertEqual([m for m in order if m != "m4"], ["m1", "m2", "m3"])
+
+    def test_out_of_order_sequence_is_not_acknowledged_below_a_gap(self):
+        device = self.outbox.device_id
+        message = lambda seq: {"message_id": f"m{seq}", "origin_device_id": device,
+                               "origin_user_id": "peu", "sequence": seq}
+        self.backend._mark_applied(message(3))
+        self.assertFalse(self.backend._is_already_applied(message(1)))
+        ack = self.backend._build_outbox_acks([message(3)])[0]["payload"]["devices"][0]
+        self.assertEqual((ack["through_sequence"], ack["exceptions"]), (3, [1, 2]))
+
+        self.backend._mark_applied(message(1))
+        self.backend._mark_applied(message(2))
+        self.assertEqual(self.backend._applied_sequences[device], 3)
+        self.assertEqual(self.backend._applied_above, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
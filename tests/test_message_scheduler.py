@@ -0,0 +1,82 @@
+"""
+Escalonamento das mensagens ingeridas (backend/message_scheduler.py) e orçamento por ciclo.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from backend import local_backend
+from backend.local_backend import LocalBackend
+from backend.message_scheduler import MessageScheduler
+from outbox_handler.outbox_log import OutboxLog
+
+
+def message(message_id, device, obj, action, sequence=0):
+    return {"message_id": message_id, "origin_device_id": device, "origin_user_id": device,
+            "sequence": sequence, "object": obj, "action": action, "payload": {}}
+
+
+class MessageSchedulerTest(unittest.TestCase):
+
+    def test_priority_classes(self):
+        self.assertEqual(MessageScheduler.priority_of(message("m", "d", "account", "try_login")), MessageScheduler.AUTH)
+        self.assertEqual(MessageScheduler.priority_of(message("m", "d", "evolution", "fill_metric")),
+                         MessageScheduler.INTERACTIVE)
+        self.assertEqual(MessageScheduler.priority_of(message("m", "d", "medication", "add_med")),
+                         MessageScheduler.INTERACTIVE)
+        self.assertEqual(MessageScheduler.priority_of(message("m", "d", "evolution", "bulk_fill")), MessageScheduler.BULK)
+
+    def test_round_robin_between_devices_within_a_class(self):
+        scheduler = MessageScheduler()
+        for i in range(4):
+            scheduler.enqueue(message(f"a{i}", "flood", "evolution", "bulk_fill"))
+        scheduler.enqueue(message("b0", "d2", "evolution", "bulk_fill"))
+        scheduler.enqueue(message("c0", "d3", "medication", "add_med"))
+        scheduler.enqueue(message("c1", "d3", "evolution", "fill_metric"))
+
+        self.assertEqual([m["message_id"] for m in scheduler.next_batch(5)], ["c0", "c1", "a0", "b0", "a1"])
+        self.assertEqual(len(scheduler), 2)
+        self.assertEqual(scheduler.pending_by_priority(), [0, 0, 2])
+        self.assertIn("a2", scheduler)
+        self.assertEqual([m["message_id"] for m in scheduler.next_batch(5)], ["a2", "a3"])
+        self.assertEqual(scheduler.next_batch(5), [])
+
+
+class CycleBudgetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        for folder in ('backend', 'inbox_handler', 'outbox_handler'):
+            os.makedirs(os.path.join(self.workspace, folder))
+        outbox = OutboxLog(os.path.join(self.workspace, 'outbox_handler'))
+        for seq in range(1, 11):
+            outbox.append(message(f"m{seq:02d}", "d1", "account", "try_logout", sequence=seq))
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def test_message_budget_leaves_the_rest_for_the_next_cycle(self):
+        backend = LocalBackend(self.workspace, max_messages_per_cycle=4)
+        backend.run_processing_cycle()
+        self.assertEqual(backend._applied_sequences["d1"], 4)
+        self.assertEqual(len(backend.scheduler), 6)
+
+        backend.run_processing_cycle()
+        backend.run_processing_cycle()
+        self.assertEqual(backend._applied_sequences["d1"], 10)
+        self.assertEqual(len(backend.scheduler), 0)
+
+    def test_time_budget_is_checked_between_chunks(self):
+        backend = LocalBackend(self.workspace)
+        backend.SCHEDULER_CHUNK_SIZE = 3
+        clock = iter(range(100))
+        with mock.patch.object(local_backend.time, 'perf_counter', side_effect=lambda: next(clock) * backend.max_cycle_seconds):
+            backend.run_processing_cycle()
+        self.assertEqual(backend._applied_sequences["d1"], 3)
+        self.assertEqual(len(backend.scheduler), 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Confirmações cumulativas do outbox ('outbox/ack_outbox') e o ponteiro do log do cliente.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from backend.local_backend import LocalBackend
+from outbox_handler.outbox_log import OutboxLog
+
+
+def message(seq, device="d1", user="peu"):
+    return {"message_id": f"m{seq:03d}", "origin_device_id": device, "origin_user_id": user, "sequence": seq,
+            "object": "account", "action": "try_logout", "payload": {}}
+
+
+class OutboxAckTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        for folder in ('backend', 'inbox_handler', 'outbox_handler'):
+            os.makedirs(os.path.join(self.workspace, folder))
+        self.outbox_dir = os.path.join(self.workspace, 'outbox_handler')
+        self.log = OutboxLog(self.outbox_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def _acks(self, backend):
+        inbox = backend.db._read_db(backend.inbox_path)
+        backend.db._write_db(backend.inbox_path, [])
+        return [msg for msg in inbox if msg["action"] == "ack_outbox"]
+
+    def test_one_cumulative_ack_per_user_and_cycle(self):
+        for seq in range(1, 6):
+            self.log.append(message(seq))
+        self.log.append(message(1, device="d2", user="ana"))
+        backend = LocalBackend(self.workspace)
+        backend.run_processing_cycle()
+
+        acks = {ack["origin_user_id"]: ack["payload"] for ack in self._acks(backend)}
+        self.assertEqual(acks["peu"], {"devices": [{"origin_device_id": "d1", "through_sequence": 5, "exceptions": []}],
+                                       "message_ids": []})
+        self.assertEqual(acks["ana"]["devices"][0]["through_sequence"], 1)
+
+    def test_messages_left_for_the_next_cycle_are_not_acknowledged(self):
+        for seq in range(1, 5):
+            self.log.append(message(seq))
+        backend = LocalBackend(self.workspace, max_messages_per_cycle=2)
+        backend.run_processing_cycle()
+
+        entry = self._acks(backend)[0]["payload"]["devices"][0]
+        self.assertEqual(self.log.acknowledge_through("d1", entry["through_sequence"], entry["exceptions"]), 2)
+        self.assertEqual([msg["sequence"] for msg in self.log.pending_messages()], [3, 4])
+
+    def test_exceptions_and_legacy_ids_on_the_client_log(self):
+        for seq in range(1, 5):
+            self.log.append(message(seq))
+        self.log.append({"message_id": "legacy", "origin_user_id": "peu", "object": "account", "action": "try_logout"})
+
+        self.assertEqual(self.log.acknowledge_through("d1", 4, exceptions=[2]), 3)
+        self.assertEqual(self.log.acknowledge(["legacy", "unknown"]), 1)
+        self.assertEqual([msg["message_id"] for msg in self.log.pending_messages()], ["m002"])
+
+        # O ponteiro persiste: um novo leitor só vê a mensagem pendente.
+        self.assertEqual([msg["message_id"] for msg in OutboxLog(self.outbox_dir).pending_messages()], ["m002"])
+        self.assertNotIn("m001", OutboxLog(self.outbox_dir))
+
+    def test_log_is_compacted_once_enough_is_acknowledged(self):
+        log = self.log
+        log.COMPACT_THRESHOLD = 200
+        for seq in range(1, 9):
+            log.append(message(seq))
+        generation = log.generation
+
+        log.acknowledge_through("d1", 6)
+        self.assertEqual(log.generation, generation + 1)
+        with open(log.log_path, 'r', encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 2)
+        self.assertEqual([msg["sequence"] for msg in OutboxLog(self.outbox_dir).pending_messages()], [7, 8])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+Sequências do dispositivo no outbox: um save do estado por append e recuperação após queda.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from outbox_handler.outbox_processor import OutboxProcessor
+
+
+class OutboxSequenceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.workspace, 'outbox_handler'))
+        self.outbox = OutboxProcessor(self.workspace)
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def _add_meds(self, count):
+        for i in range(count):
+            self.outbox.add_to_outbox("medication", "add_med", {"patient_user": "peu", "id": f"med{i}"},
+                                      origin_user_override='peu')
+
+    def _sequences(self):
+        return [msg["sequence"] for msg in self.outbox.outbox_log.pending_messages()]
+
+    def test_device_state_is_saved_once_per_append(self):
+        with mock.patch.object(self.outbox, '_save_device_state', wraps=self.outbox._save_device_state) as save:
+            self._add_meds(5)
+            self.outbox.flush()
+            self.assertEqual(save.call_count, 1)
+
+            # Uma barreira leva as mensagens em espera e ela mesma num único append.
+            self._add_meds(3)
+            self.outbox.add_to_outbox("account", "try_logout", {}, origin_user_override='peu')
+            self.assertEqual(save.call_count, 2)
+
+        self.assertEqual(self._sequences(), list(range(1, 10)))
+        with open(self.outbox.device_state_path, 'r', encoding='utf-8') as f:
+            self.assertEqual(json.load(f)["next_sequence"], 10)
+
+    def test_sequence_resumes_after_the_log_when_the_state_is_stale(self):
+        self._add_meds(3)
+        self.outbox.flush()
+        # Queda entre o append e o save: o estado ainda aponta para a primeira sequência.
+        with open(self.outbox.device_state_path, 'w', encoding='utf-8') as f:
+            json.dump({"device_id": self.outbox.device_id, "next_sequence": 1}, f)
+
+        self.outbox = OutboxProcessor(self.workspace)
+        self._add_meds(1)
+        self.outbox.flush()
+        self.assertEqual(self._sequences(), [1, 2, 3, 4])
+
+    def test_log_entries_of_other_devices_are_ignored(self):
+        self._add_meds(2)
+        self.outbox.flush()
+        self.outbox.outbox_log.append({"message_id": "m_other", "origin_device_id": "dev_other", "sequence": 40})
+
+        self.assertEqual(self.outbox.outbox_log.max_sequence(self.outbox.device_id), 2)
+        self.assertEqual(self.outbox.outbox_log.max_sequence("dev_other"), 40)
+        self.assertEqual(self.outbox.outbox_log.max_sequence("dev_unknown"), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Coalescência na área de espera do outbox e recuperação do seu diário depois de uma queda.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from outbox_handler.outbox_processor import OutboxProcessor
+
+
+class OutboxStagingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.workspace, 'outbox_handler'))
+        self.outbox = OutboxProcessor(self.workspace)
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def _add(self, obj, action, payload, outbox=None):
+        (outbox or self.outbox).add_to_outbox(obj, action, payload, origin_user_override='peu')
+
+    def _pending(self, outbox=None):
+        return (outbox or self.outbox).outbox_log.pending_messages()
+
+    def _stage_med_history(self):
+        self._add("medication", "add_med", {"patient_user": "peu", "id": "med1", "name": "A", "dose": "1"})
+        self._add("medication", "edit_med", {"patient_user": "peu", "id": "med1", "dose": "2"})
+        self._add("medication", "edit_med", {"patient_user": "peu", "id": "med1", "name": "B"})
+        self._add("medication", "add_med", {"patient_user": "peu", "id": "med2"})
+        self._add("medication", "delete_med", {"patient_user": "peu", "med_id": "med2"})
+
+    def test_edits_merge_and_add_then_delete_sends_nothing(self):
+        self._stage_med_history()
+        self.assertEqual(self.outbox.flush(), 2)
+
+        add, edit = self._pending()
+        self.assertEqual(add["payload"], {"patient_user": "peu", "id": "med1", "name": "A", "dose": "1"})
+        self.assertEqual((edit["action"], edit["payload"]), ("edit_med", {"patient_user": "peu", "id": "med1",
+                                                                          "dose": "2", "name": "B"}))
+        self.assertFalse(os.path.exists(self.outbox.staging_path))
+
+    def test_fill_metric_for_the_same_date_merges_metrics(self):
+        self._add("evolution", "fill_metric", {"patient_id": "20000001", "date": "2030-01-01", "metrics": {"weight": "70"}})
+        self._add("evolution", "fill_metric", {"patient_id": "20000001", "date": "2030-01-01", "metrics": {"height": "180"}})
+        self._add("evolution", "fill_metric", {"patient_id": "20000001", "date": "2030-01-02", "metrics": {"weight": "71"}})
+        self.outbox.flush()
+
+        self.assertEqual([msg["payload"]["metrics"] for msg in self._pending()],
+                         [{"weight": "70", "height": "180"}, {"weight": "71"}])
+
+    def test_journal_is_append_only_with_the_original_messages(self):
+        self._stage_med_history()
+        with open(self.outbox.staging_path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertIn('"dose": "1"', lines[0]) # Gravada antes de ser combinada com as edições
+
+    def test_barrier_drains_the_staging_area_and_the_journal(self):
+        self._stage_med_history()
+        self._add("account", "try_logout", {})
+
+        self.assertEqual([msg["action"] for msg in self._pending()], ["add_med", "edit_med", "try_logout"])
+        self.assertEqual(len(self.outbox.coalescer), 0)
+        self.assertFalse(os.path.exists(self.outbox.staging_path))
+
+    def test_restart_replays_the_journal_with_the_same_messages(self):
+        self._stage_med_history()
+        expected = [dict(msg) for msg in self.outbox.coalescer.staged]
+        with open(self.outbox.staging_path, 'a', encoding='utf-8') as f:
+            f.write('{"message_id": "torn", "act') # Queda no meio de uma escrita
+
+        restarted = OutboxProcessor(self.workspace)
+        self.assertEqual([(msg["message_id"], msg["payload"]) for msg in self._pending(restarted)],
+                         [(msg["message_id"], msg["payload"]) for msg in expected])
+        self.assertFalse(os.path.exists(restarted.staging_path))
+
+    def test_crash_between_append_and_staging_cleanup_does_not_duplicate(self):
+        self._add("evolution", "fill_metric", {"patient_id": "20000001", "date": "2030-01-01", "metrics": {"weight": "70"}})
+        with open(self.outbox.staging_path, 'rb') as f:
+            staging = f.read()
+        self.assertEqual(self.outbox.flush(), 1)
+
+        # Queda antes de o diário ser removido: ele continua com a mensagem já anexada.
+        with open(self.outbox.staging_path, 'wb') as f:
+            f.write(staging)
+        restarted = OutboxProcessor(self.workspace)
+
+        self.assertEqual([msg["sequence"] for msg in self._pending(restarted)], [1])
+        self.assertFalse(os.path.exists(restarted.staging_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+Particionamento determinístico de um ciclo do backend em segmentos e partições por paciente.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from backend.local_backend import LocalBackend
+from outbox_handler.outbox_processor import OutboxProcessor
+
+
+def message(message_id, obj, action, **payload):
+    return {"message_id": message_id, "object": obj, "action": action, "payload": payload}
+
+
+class PartitioningTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        for folder in ('backend', 'inbox_handler', 'outbox_handler'):
+            os.makedirs(os.path.join(self.workspace, folder))
+        self.backend = LocalBackend(self.workspace)
+        self.outbox = OutboxProcessor(self.workspace)
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def test_barriers_split_segments_and_partitions_keep_the_batch_order(self):
+        batch = [
+            message("m0", "medication", "add_med", patient_user="peu"),
+            message("m1", "evolution", "fill_metric", patient_id="p_ana"),
+            message("m2", "event", "add_event", patient_user="peu"),
+            message("m3", "linking_accounts", "invite_patient", patient_user_to_invite="peu"),
+            message("m4", "diagnostic", "add_diagnostic", patient_user="ana"),
+        ]
+        self.backend._id_by_user = {"peu": "p_peu", "ana": "p_ana"}
+
+        segments = [([i for i, _ in segment], barrier and barrier[0])
+                    for segment, barrier in self.backend._split_segments(batch)]
+        self.assertEqual(segments, [([0, 1, 2], 3), ([4], None)])
+
+        first_segment = list(enumerate(batch[:3]))
+        partitions = [[msg["message_id"] for _, msg in items]
+                      for items in self.backend._partition_segment(first_segment)]
+        self.assertEqual(partitions, [["m0", "m2"], ["m1"]])
+
+    def test_inbox_follows_the_batch_order_across_partitions(self):
+        for user in ('peu', 'ana'):
+            self.outbox.add_to_outbox("account", "create_account", {"profile_type": "patient", "name": user, "user": user,
+                                                                    "password": "123456", "patient_info": {}},
+                                      origin_user_override=user)
+        self.outbox.flush()
+        self.backend.run_processing_cycle()
+        inbox_start = len(self.backend.db._read_db(self.backend.inbox_path))
+
+        sent = []
+        for user, med_id in (('peu', 'med1'), ('ana', 'med2'), ('peu', 'med3')):
+            self.outbox.add_to_outbox("medication", "add_med", {"patient_user": user, "id": med_id},
+                                      origin_user_override=user)
+            self.outbox.flush()
+            sent.append(self.outbox.outbox_log.pending_messages()[-1]["message_id"])
+        self.backend.run_processing_cycle()
+
+        inbox = self.backend.db._read_db(self.backend.inbox_path)[inbox_start:]
+        patches = [msg["payload"]["request_message_id"] for msg in inbox if msg["action"] == "patch"]
+        self.assertEqual(patches, sent)
+        sequences = [msg["server_sequence"] for msg in inbox]
+        self.assertEqual(sequences, sorted(sequences))
+
+
+if __name__ == '__main__':
+    unittest.main()
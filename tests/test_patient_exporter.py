@@ -0,0 +1,74 @@
+"""
+Exportação em fluxo do prontuário de pacientes (backend/patient_exporter.py).
+"""
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from backend.database_manager import PersistenceService
+from backend.patient_exporter import PatientExporter
+
+
+class PatientExporterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.workspace, 'backend'))
+        self.db = PersistenceService(self.workspace)
+        self.db.save_accounts([
+            {"id": "10000001", "user": "dr_ana", "profile_type": "doctor", "password": "x", "linked_patients": ["20000001"]},
+            {"id": "20000001", "user": "maria", "name": "Maria", "profile_type": "patient", "password": "segredo",
+             "patient_info": {"tracked_metrics": ["weight"]}},
+            {"id": "20000002", "user": "jose", "profile_type": "patient", "password": "y"},
+        ])
+        self.db.save_patient_data('patient_medications.json', {"maria": [{"id": "med1"}], "jose": [{"id": "med9"}]})
+        self.db.save_patient_data('patient_evolution.json', {"20000001": {"2030-01-02": {"weight": "71"},
+                                                                          "2030-01-01": {"weight": "70"}}})
+        self.db._write_db('placebo_transactions.json', [
+            {"message_id": "m1", "origin_user_id": "maria", "object": "event", "action": "add_event", "payload": {}},
+            {"message_id": "m2", "origin_user_id": "jose", "object": "event", "action": "add_event", "payload": {}},
+            {"message_id": "m3", "origin_user_id": "dr_ana", "object": "evolution", "action": "fill_metric",
+             "payload": {"patient_id": "20000001"}},
+        ])
+        self.exporter = PatientExporter(self.db)
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def test_ndjson_export_of_a_doctor_patients(self):
+        patients = self.exporter.patients_of_doctor("dr_ana")
+        self.assertEqual(patients, ["maria"])
+        stages = []
+        lines = list(self.exporter.iter_ndjson(patients, include_transactions=True,
+                                               progress=lambda stage, count: stages.append((stage, count))))
+        records = [json.loads(line) for line in lines]
+
+        self.assertEqual([(r["record_type"], r["key"]) for r in records],
+                         [("account", "20000001"), ("medication", "med1"), ("evolution", "2030-01-01"),
+                          ("evolution", "2030-01-02"), ("transaction", "m1"), ("transaction", "m3")])
+        self.assertNotIn("password", records[0]["data"])
+        self.assertEqual(stages[-1], ("transaction", 6))
+
+    def test_csv_export_writes_a_header_and_one_row_per_record(self):
+        output = os.path.join(self.workspace, 'maria.csv')
+        self.exporter.export_to_file(["maria"], output, fmt="csv")
+        with open(output, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ["record_type", "patient_id", "patient_user", "key", "data"])
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(json.loads(rows[2][4]), {"id": "med1"})
+
+    def test_transaction_log_is_read_in_chunks(self):
+        log = list(self.db.iter_list('placebo_transactions.json', chunk_size=8))
+        self.assertEqual([msg["message_id"] for msg in log], ["m1", "m2", "m3"])
+
+        with open(self.db._get_filepath('placebo_transactions.json'), 'w', encoding='utf-8') as f:
+            f.write('[{"message_id": "m1"}, {"message_id": "m2"') # Final truncado
+        self.assertEqual([msg["message_id"] for msg in self.db.iter_list('placebo_transactions.json', chunk_size=5)], ["m1"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+"""
+Modelos de leitura mantidos pelo backend (backend/read_models.py).
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from backend.local_backend import LocalBackend
+from backend.read_models import ACTIVE_MEDICATIONS, DOCTOR_ROSTER, PATIENT_LINKS, ReadModelProjector, load_read_model
+from outbox_handler.outbox_processor import OutboxProcessor
+
+
+class ReadModelsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        for folder in ('backend', 'inbox_handler', 'outbox_handler'):
+            os.makedirs(os.path.join(self.workspace, folder))
+        self.backend = LocalBackend(self.workspace)
+        self.outbox = OutboxProcessor(self.workspace)
+        self._send("account", "create_account", {"profile_type": "patient", "name": "Peu", "user": "peu",
+                                                 "password": "123456", "patient_info": {}}, 'peu')
+        self._send("account", "create_account", {"profile_type": "doctor", "name": "Ana", "user": "ana",
+                                                 "password": "123456", "is_also_patient": False}, 'ana')
+        ids = {acc['user']: acc['id'] for acc in self.backend.db.get_accounts()}
+        self.patient_id, self.doctor_id = ids['peu'], ids['ana']
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def _send(self, obj, action, payload, user):
+        self.outbox.add_to_outbox(obj, action, payload, origin_user_override=user)
+        self.outbox.flush()
+        self.backend.run_processing_cycle()
+
+    def _read(self, model, key):
+        return load_read_model(self.workspace, model, key)
+
+    def test_link_documents_follow_invitations_and_unlinks(self):
+        self._send("linking_accounts", "invite_patient", {"patient_user_to_invite": "peu"}, 'ana')
+        self.assertEqual(self._read(PATIENT_LINKS, "peu")["invitations"], [{"id": self.doctor_id, "name": "Ana"}])
+        self.assertEqual(self._read(DOCTOR_ROSTER, "ana")["patients"], [])
+
+        self._send("linking_accounts", "respond_to_invitation", {"doctor_id": self.doctor_id, "response": "accept"}, 'peu')
+        self.assertEqual(self._read(PATIENT_LINKS, "peu")["invitations"], [])
+        self.assertEqual(self._read(PATIENT_LINKS, "peu")["doctors"], [{"id": self.doctor_id, "name": "Ana"}])
+        self.assertEqual(self._read(DOCTOR_ROSTER, "ana")["patients"], [{"id": self.patient_id, "name": "Peu", "user": "peu"}])
+
+        self._send("linking_accounts", "unlink_accounts", {"target_user_id": self.patient_id}, 'ana')
+        self.assertEqual(self._read(DOCTOR_ROSTER, "ana")["patients"], [])
+        self.assertEqual(self._read(PATIENT_LINKS, "peu")["doctors"], [])
+
+    def test_active_medications_are_updated_and_sorted_by_time(self):
+        self._send("medication", "add_med", {"patient_user": "peu", "id": "med1", "times_of_day": ["20:00"]}, 'peu')
+        self._send("medication", "add_med", {"patient_user": "peu", "id": "med2", "times_of_day": ["08:00"]}, 'peu')
+        self._send("medication", "add_med", {"patient_user": "peu", "id": "med3", "end_date": "2000-01-01"}, 'peu')
+        self.assertEqual([med["id"] for med in self._read(ACTIVE_MEDICATIONS, "peu")["medications"]], ["med2", "med1"])
+
+        self._send("medication", "delete_med", {"patient_user": "peu", "med_id": "med2"}, 'peu')
+        self.assertEqual([med["id"] for med in self._read(ACTIVE_MEDICATIONS, "peu")["medications"]], ["med1"])
+
+    def test_stale_projection_is_recomputed_when_the_day_changes(self):
+        self._send("medication", "add_med", {"patient_user": "peu", "id": "med1", "end_date": "2999-01-05"}, 'peu')
+        projector = self.backend.read_models
+
+        projector.refresh_stale("2999-01-04")
+        document = self._read(ACTIVE_MEDICATIONS, "peu")
+        self.assertEqual((document["as_of"], [med["id"] for med in document["medications"]]), ("2999-01-04", ["med1"]))
+
+        projector.refresh_stale("2999-01-06") # A medicação terminou ontem, sem nenhuma mensagem nova
+        document = self._read(ACTIVE_MEDICATIONS, "peu")
+        self.assertEqual((document["as_of"], document["medications"]), ("2999-01-06", []))
+
+        # O dia do último cálculo é persistido: um novo backend não recalcula no mesmo dia.
+        reloaded = ReadModelProjector(self.workspace, self.backend.db)
+        with mock.patch.object(reloaded, '_write') as write:
+            reloaded.refresh_stale("2999-01-06")
+        write.assert_not_called()
+
+    def test_processing_cycle_refreshes_stale_projections(self):
+        with mock.patch.object(self.backend.read_models, 'refresh_stale') as refresh_stale:
+            self.backend.run_processing_cycle() # Sem mensagens na fila
+        refresh_stale.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+Histórico limitado dos IDs do inbox já processados (processed_inbox_ids.log).
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from inbox_handler.recent_ids import RecentIdHistory
+
+
+class RecentIdHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.inbox_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.inbox_dir)
+
+    def _log_lines(self, history):
+        with open(history.path, 'r', encoding='utf-8') as f:
+            return f.read().splitlines()
+
+    def test_memory_and_log_stay_bounded(self):
+        history = RecentIdHistory(self.inbox_dir, capacity=4)
+        for cycle in range(20):
+            history.add([f"m{cycle}a", f"m{cycle}b"])
+            self.assertLessEqual(len(history), 4)
+            self.assertLessEqual(len(self._log_lines(history)), 8)
+
+        self.assertEqual([m in history for m in ("m17b", "m18a", "m18b", "m19a", "m19b")], [False, True, True, True, True])
+
+    def test_readding_an_id_refreshes_its_position(self):
+        history = RecentIdHistory(self.inbox_dir, capacity=3)
+        history.add(["a", "b", "c"])
+        history.add(["a", "d"])
+        self.assertNotIn("b", history)
+        self.assertIn("a", history)
+
+    def test_reload_keeps_the_recent_ids_and_forgotten_ids_stay_forgotten(self):
+        history = RecentIdHistory(self.inbox_dir, capacity=3)
+        history.add(["a", "b", "c", "d"])
+        history.forget("c")
+        history.forget("unknown") # Nada a esquecer: não escreve no log
+
+        reloaded = RecentIdHistory(self.inbox_dir, capacity=3)
+        self.assertEqual([m in reloaded for m in "abcd"], [False, True, False, True])
+        self.assertEqual(self._log_lines(reloaded)[-1], "-c")
+
+    def test_legacy_json_is_imported_up_to_the_capacity_and_removed(self):
+        legacy_path = os.path.join(self.inbox_dir, 'processed_inbox_ids.json')
+        with open(legacy_path, 'w', encoding='utf-8') as f:
+            json.dump([f"id{i:02d}" for i in range(10)], f)
+
+        history = RecentIdHistory(self.inbox_dir, capacity=3)
+        self.assertEqual(len(history), 3)
+        self.assertEqual([m in history for m in ("id06", "id07", "id08", "id09")], [False, True, True, True])
+        self.assertFalse(os.path.exists(legacy_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
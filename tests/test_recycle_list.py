@@ -0,0 +1,34 @@
+"""
+Linhas das listas virtualizadas (RecycleList). Precisa do Kivy; sem ele, os testes são pulados.
+"""
+import importlib.util
+import unittest
+
+HAS_KIVY = importlib.util.find_spec('kivy') is not None
+
+
+@unittest.skipUnless(HAS_KIVY, "Kivy não instalado")
+class RecycleListRowsTest(unittest.TestCase):
+
+    def setUp(self):
+        from auxiliary_classes import recycle_list
+        self.recycle_list = recycle_list
+
+    def test_message_and_header_rows_choose_their_template_and_height(self):
+        rl = self.recycle_list
+        self.assertEqual(rl.message_row('Nenhuma medicação cadastrada.'),
+                         {'viewclass': 'ListMessage', 'text': 'Nenhuma medicação cadastrada.', 'height': rl.MESSAGE_ROW_HEIGHT})
+        self.assertEqual(rl.header_row('Médicos vinculados'),
+                         {'viewclass': 'ListHeader', 'text': 'Médicos vinculados', 'height': rl.HEADER_ROW_HEIGHT})
+
+    def test_rows_are_plain_data_not_widgets(self):
+        # Uma lista longa vira só uma lista de dicionários; os widgets são criados pela RecycleView.
+        rows = [self.recycle_list.header_row('Eventos')] + [self.recycle_list.message_row(str(i)) for i in range(500)]
+        self.assertTrue(all(type(row) is dict and row['height'] > 0 for row in rows))
+
+    def test_detail_block_fits_two_detail_lines_of_text(self):
+        self.assertGreater(self.recycle_list.DETAIL_BLOCK_HEIGHT, self.recycle_list.DETAIL_LINE_HEIGHT)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+Reconstrução do estado a partir do log de transações (backend/replay_engine.py).
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import unittest
+
+from auxiliary_classes.app_logging import ROOT_LOGGER
+from backend.local_backend import LocalBackend
+from backend.replay_engine import ReplayEngine, STATE_FILES
+from outbox_handler.outbox_processor import OutboxProcessor
+
+
+class ReplayEngineTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        for folder in ('backend', 'inbox_handler', 'outbox_handler'):
+            os.makedirs(os.path.join(self.workspace, folder))
+        self.backend = LocalBackend(self.workspace)
+        self.outbox = OutboxProcessor(self.workspace)
+        self._send("account", "create_account", {"profile_type": "patient", "name": "peu", "user": "peu",
+                                                 "password": "123456", "patient_info": {"tracked_metrics": ["peso"]}})
+        self._send("medication", "add_med", {"patient_user": "peu", "id": "med1", "generic_name": "Dipirona"})
+        self.engine = ReplayEngine(self.workspace)
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def _send(self, obj, action, payload):
+        self.outbox.add_to_outbox(obj, action, payload, origin_user_override='peu')
+        self.outbox.flush()
+        self.backend.run_processing_cycle()
+
+    def _rebuild_and_verify(self):
+        report = self.engine.rebuild(batch_size=1)
+        self.addCleanup(shutil.rmtree, report["workspace"], True)
+        return report, self.engine.verify(report)
+
+    def test_rebuild_reproduces_the_live_files(self):
+        report, results = self._rebuild_and_verify()
+        self.assertEqual((report["checkpoint_position"], report["records_applied"], report["legacy_records"]), (0, 2, 0))
+        self.assertEqual(results, {name: "ok" for name in STATE_FILES})
+
+    def test_corrupted_file_is_restored(self):
+        with open(self.engine.db._get_filepath('account.json'), 'w', encoding='utf-8') as f:
+            f.write('[{"id": ')
+        report, results = self._rebuild_and_verify()
+        self.assertEqual(results['account.json'], "corrompido")
+
+        self.engine.restore(report, ['account.json'])
+        self.assertEqual(self._rebuild_and_verify()[1]['account.json'], "ok")
+
+    def test_replay_starts_from_the_latest_checkpoint(self):
+        self.engine.create_checkpoint()
+        self._send("event", "add_event", {"patient_user": "peu", "id": "evt1", "name": "Consulta"})
+
+        report, results = self._rebuild_and_verify()
+        self.assertEqual((report["checkpoint_position"], report["records_applied"]), (2, 1))
+        self.assertEqual(results, {name: "ok" for name in STATE_FILES})
+
+    def test_legacy_accounts_are_reported_as_not_reproducible(self):
+        log_path = self.engine.db._get_filepath('placebo_transactions.json')
+        with open(log_path, 'r', encoding='utf-8') as f:
+            log = json.load(f)
+        del log[0]["assigned_ids"] # Registro gravado antes dos IDs atribuídos, com ID aleatório
+        with open(log_path, 'w', encoding='utf-8') as f:
+            json.dump(log, f)
+        accounts = self.engine.db.get_accounts()
+        accounts[0]["id"] = "12345678"
+        self.engine.db.save_accounts(accounts)
+
+        report, results = self._rebuild_and_verify()
+        self.assertEqual(report["legacy_records"], 1)
+        self.assertEqual(results['account.json'], "não reproduzível")
+        self.assertNotIn("divergente", results.values())
+
+    def test_quiet_rebuild_silences_the_backend_and_restores_the_level(self):
+        root_logger = logging.getLogger(ROOT_LOGGER)
+        self.addCleanup(root_logger.setLevel, root_logger.level)
+        root_logger.setLevel(logging.DEBUG)
+
+        with self.assertNoLogs(ROOT_LOGGER, level=logging.DEBUG):
+            self._rebuild_and_verify()
+        self.assertEqual(root_logger.level, logging.DEBUG)
+
+
+if __name__ == '__main__':
+    unittest.main()
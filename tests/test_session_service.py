@@ -0,0 +1,71 @@
+"""
+SessionService: sessão em memória, persistida só no login e no logout.
+"""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from auxiliary_classes.session_service import SessionService
+from outbox_handler.outbox_processor import OutboxProcessor
+
+
+class SessionServiceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.workspace, 'outbox_handler'))
+        self.session_path = os.path.join(self.workspace, 'session.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def test_login_persists_and_logout_removes_the_file(self):
+        session = SessionService(self.workspace)
+        self.assertFalse(session.logged_in)
+
+        session.login("peu", "patient")
+        with open(self.session_path, 'r', encoding='utf-8') as f:
+            self.assertEqual(json.load(f), {"logged_in": True, "user": "peu", "profile_type": "patient"})
+        self.assertEqual(SessionService(self.workspace).user, "peu") # Restaurada ao reabrir o app
+
+        session.logout()
+        self.assertFalse(os.path.exists(self.session_path))
+        self.assertIsNone(session.user)
+
+    def test_unreadable_or_logged_out_file_gives_an_empty_session(self):
+        for content in ('{"user": "peu', '{"logged_in": false, "user": "peu"}', '[]'):
+            with open(self.session_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            self.assertEqual(SessionService(self.workspace).get(), {})
+
+    def test_subscribers_are_notified_on_login_and_logout(self):
+        session = SessionService(self.workspace)
+        seen, other = [], []
+        session.subscribe(seen.append)
+        session.subscribe(seen.append) # Inscrever duas vezes não duplica a notificação
+        session.subscribe(other.append)
+        session.login("ana", "doctor")
+        session.unsubscribe(other.append)
+        session.logout()
+
+        self.assertEqual(seen, [{"logged_in": True, "user": "ana", "profile_type": "doctor"}, {}])
+        self.assertEqual(len(other), 1)
+
+    def test_hot_paths_do_not_read_the_session_file(self):
+        session = SessionService(self.workspace)
+        session.login("peu", "patient")
+        outbox = OutboxProcessor(self.workspace, session)
+
+        os.remove(self.session_path) # Se o arquivo fosse relido, a origem das mensagens se perderia
+        for _ in range(3):
+            outbox.add_to_outbox("account", "try_logout", {})
+        self.assertEqual({msg["origin_user_id"] for msg in outbox.outbox_log.pending_messages()}, {"peu"})
+
+        session.logout() # A troca de sessão é vista sem reler o arquivo
+        self.assertIsNone(outbox._get_origin_user_id())
+
+
+if __name__ == '__main__':
+    unittest.main()
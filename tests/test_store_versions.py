@@ -0,0 +1,78 @@
+"""
+Versões dos tópicos do ClientStore, usadas pelas telas para só refazer os widgets quando os dados mudaram.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from auxiliary_classes.session_service import SessionService
+from backend.database_manager import PersistenceService
+from backend.read_models import read_model_path
+from inbox_handler.client_store import ClientStore
+
+MEDICATIONS = ("medication", "maria")
+EVENTS = ("event", "maria")
+ACTIVE = ("active_medications", "maria")
+
+
+def patch(collection, version):
+    return {"collection": collection, "patient_id": "20000001", "patient_user": "maria", "version": version,
+            "changes": [{"op": "upsert", "id": f"id{version}", "record": {"id": f"id{version}"}}]}
+
+
+class StoreVersionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        self.db = PersistenceService(self.workspace)
+        session = SessionService(self.workspace)
+        session.login("maria", "patient")
+        self.store = ClientStore(self.workspace, self.db, session)
+        self.store.load_snapshot({"user": "maria", "patients": [{"id": "20000001", "user": "maria", "collections": {
+            "medication": {"version": 1, "records": {}}, "event": {"version": 1, "records": {}}}}]})
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def test_version_only_changes_with_the_topics_data(self):
+        medications = self.store.version([MEDICATIONS])
+        events = self.store.version([EVENTS])
+        self.store.medications("maria") # Ler não altera a versão
+        self.assertEqual(self.store.version([MEDICATIONS]), medications)
+
+        self.assertTrue(self.store.apply_patch(patch("medication", 2)))
+        self.assertNotEqual(self.store.version([MEDICATIONS]), medications)
+        self.assertEqual(self.store.version([EVENTS]), events)
+
+    def test_rejected_patch_keeps_the_version_and_revision(self):
+        version, revision = self.store.version([MEDICATIONS]), self.store.revision
+        self.assertFalse(self.store.apply_patch(patch("medication", 1))) # Já conhecido
+        self.assertEqual((self.store.version([MEDICATIONS]), self.store.revision), (version, revision))
+
+    def test_different_topics_never_share_a_version(self):
+        # Trocar de paciente com a mesma contagem de alterações também exige redesenhar.
+        self.assertNotEqual(self.store.version([MEDICATIONS]), self.store.version([("medication", "joao")]))
+
+    def test_snapshot_changes_every_version(self):
+        versions = self.store.version([MEDICATIONS]), self.store.version([("medication", "joao")])
+        self.store.load_snapshot({"user": "maria", "patients": []})
+        self.assertNotEqual(self.store.version([MEDICATIONS]), versions[0])
+        self.assertNotEqual(self.store.version([("medication", "joao")]), versions[1])
+
+    def test_read_model_rewrite_bumps_the_version_when_read(self):
+        path = read_model_path(self.workspace, *ACTIVE)
+        os.makedirs(os.path.dirname(path))
+        self.db._write_db(path, {"medications": []})
+        self.store.read_model(*ACTIVE)
+        version = self.store.version([ACTIVE])
+        self.store.read_model(*ACTIVE)
+        self.assertEqual(self.store.version([ACTIVE]), version)
+
+        self.db._write_db(path, {"medications": [{"id": "med1"}]})
+        self.assertEqual(self.store.read_model(*ACTIVE), {"medications": [{"id": "med1"}]})
+        self.assertNotEqual(self.store.version([ACTIVE]), version)
+
+
+if __name__ == '__main__':
+    unittest.main()
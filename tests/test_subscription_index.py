@@ -0,0 +1,68 @@
+"""
+Índice de inscrições do backend: quem recebe os patches de dados de cada paciente.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from backend.local_backend import LocalBackend
+from outbox_handler.outbox_processor import OutboxProcessor
+
+
+class SubscriptionIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workspace = tempfile.mkdtemp()
+        for folder in ('backend', 'inbox_handler', 'outbox_handler'):
+            os.makedirs(os.path.join(self.workspace, folder))
+        self.backend = LocalBackend(self.workspace)
+        self.outbox = OutboxProcessor(self.workspace)
+
+        self._send("account", "create_account", {"profile_type": "patient", "name": "peu", "user": "peu",
+                                                 "password": "123456", "patient_info": {}}, 'peu')
+        self._send("account", "create_account", {"profile_type": "doctor", "name": "ana", "user": "ana",
+                                                 "password": "123456", "is_also_patient": False}, 'ana')
+        self.backend.run_processing_cycle()
+        ids = {acc['user']: acc['id'] for acc in self.backend.db.get_accounts()}
+        self.patient_id, self.doctor_id = ids['peu'], ids['ana']
+
+    def tearDown(self):
+        shutil.rmtree(self.workspace)
+
+    def _send(self, obj, action, payload, user):
+        self.outbox.add_to_outbox(obj, action, payload, origin_user_override=user)
+        self.outbox.flush()
+
+    def _add_med_and_collect_patches(self, med_id):
+        before = len(self.backend.db._read_db(self.backend.inbox_path))
+        self._send("medication", "add_med", {"patient_user": "peu", "id": med_id, "name": "dipirona"}, 'peu')
+        self.backend.run_processing_cycle()
+        inbox = self.backend.db._read_db(self.backend.inbox_path)[before:]
+        return {msg['origin_user_id'] for msg in inbox if (msg['object'], msg['action']) == ("sync", "patch")}
+
+    def test_patches_follow_links_and_unlinks(self):
+        self.assertEqual(self._add_med_and_collect_patches("med1"), {"peu"})
+
+        self._send("linking_accounts", "invite_patient", {"patient_user_to_invite": "peu"}, 'ana')
+        self.backend.run_processing_cycle()
+        self._send("linking_accounts", "respond_to_invitation", {"doctor_id": self.doctor_id, "response": "accept"}, 'peu')
+        self.backend.run_processing_cycle()
+        self.assertEqual(self._add_med_and_collect_patches("med2"), {"peu", "ana"})
+
+        self._send("linking_accounts", "unlink_accounts", {"target_user_id": self.patient_id}, 'ana')
+        self.backend.run_processing_cycle()
+        self.assertEqual(self._add_med_and_collect_patches("med3"), {"peu"})
+
+    def test_index_rebuilt_from_files_matches_the_incremental_one(self):
+        self._send("linking_accounts", "invite_patient", {"patient_user_to_invite": "peu"}, 'ana')
+        self._send("linking_accounts", "respond_to_invitation", {"doctor_id": self.doctor_id, "response": "accept"}, 'peu')
+        self._send("account", "delete_account", {}, 'ana')
+        self.backend.run_processing_cycle()
+
+        self.assertEqual(self.backend._subscribers, {self.patient_id: {"peu"}})
+        self.assertEqual(LocalBackend(self.workspace)._subscribers, self.backend._subscribers)
+
+
+if __name__ == '__main__':
+    unittest.main()